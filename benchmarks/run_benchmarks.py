@@ -0,0 +1,356 @@
+"""
+Benchmarks do robô contra um terminal MT5 simulado (daytrade_bot.fake_mt5).
+
+Gera livros sintéticos de 10 a 50.000 posições e séries de 1k a 1M barras,
+mede as funções do ciclo e grava o resultado em JSON.
+
+Uso:
+  python benchmarks/run_benchmarks.py                       # tudo, grava bench_results.json
+  python benchmarks/run_benchmarks.py --quick -o atual.json # tamanhos pequenos
+  python benchmarks/run_benchmarks.py --compare base.json atual.json --threshold 0.15
+
+No modo --compare o script termina com código 1 se algum caso ficou mais
+lento que a base além do limite (mediana nova > mediana base * (1 + threshold)).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from daytrade_bot import fake_mt5  # noqa: E402
+
+# O fake precisa estar instalado antes dos módulos do robô (import MetaTrader5 as mt5)
+FAKE = fake_mt5.install(fake_mt5.FakeMT5(balance=1_000_000.0))
+
+from daytrade_bot.config_loader import load_json_config  # noqa: E402
+from daytrade_bot.deal_analytics import position_lifecycles  # noqa: E402
+from daytrade_bot.drawdown_manager import get_worst_positions_to_close  # noqa: E402
+from daytrade_bot.hedge_manager import calculate_buy_metrics, check_hedge_trigger  # noqa: E402
+from daytrade_bot.indicator_panel import add_panel_indicators  # noqa: E402
+from daytrade_bot.manager_margin import manager_positions  # noqa: E402
+from daytrade_bot.pandas_aux import add_indicators  # noqa: E402
+from daytrade_bot.service_add_sells import distribute_tp_sl  # noqa: E402
+from daytrade_bot.service_position import check_positions_condition  # noqa: E402
+
+BOOK_SIZES = [10, 100, 1_000, 10_000, 50_000]
+BAR_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_BOOK_SIZES = [10, 1_000]
+QUICK_BAR_SIZES = [1_000, 10_000]
+HISTORY_SIZES = [1_000, 30_000]  # posições fechadas (30k ~ um trimestre de grid)
+QUICK_HISTORY_SIZES = [1_000]
+PANEL_SYMBOLS = [1, 5, 20]
+QUICK_PANEL_SYMBOLS = [1, 20]
+
+PRICE = 2400.0
+
+
+def quiet_logger():
+    logger = logging.getLogger("benchmarks")
+    logger.handlers[:] = [logging.NullHandler()]
+    logger.propagate = False
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+def bench_config():
+    config = load_json_config("config_buy")
+    config.update({
+        "export_to_excel": False,
+        "send_email": False,
+        "send_telegram": False,
+        "alarm_sound": False,
+        "hedge_manager_enabled": False,
+        "bar_archive_enabled": False,
+        "market_feed_enabled": False,
+        "indicators_ema_adx_active": True,
+    })
+    return config
+
+
+def build_book(fake, size, config, seed=0):
+    """Preenche o terminal simulado com 'size' posições (70% BUY do robô)."""
+    rng = random.Random(seed)
+    fake.positions.clear()
+    fake.orders.clear()
+    fake.deals.clear()
+    fake.history_orders.clear()
+    fake.set_price(PRICE)
+    now = int(fake.clock())
+    for _ in range(size):
+        order_type = fake.ORDER_TYPE_BUY if rng.random() < 0.7 else fake.ORDER_TYPE_SELL
+        fake.open_position(
+            order_type,
+            volume=rng.choice([0.01, 0.02, 0.05]),
+            price_open=round(PRICE + rng.uniform(-30.0, 30.0), 2),
+            magic=config["magic_number"] if rng.random() < 0.9 else config["hedge_magic_number"],
+            open_time=now - rng.randint(60, 86_400),
+        )
+
+
+def trim_book(size):
+    """Remove as posições abertas depois do livro sintético (ex.: hedges do benchmark)."""
+    for ticket in list(FAKE.positions)[size:]:
+        del FAKE.positions[ticket]
+
+
+def measure(fn, setup=None, repeat=5, min_time=0.2, max_number=10_000):
+    """
+    Mede 'fn' em 'repeat' rodadas. Cada rodada executa 'fn' quantas vezes for
+    preciso para somar pelo menos 'min_time' segundos. 'setup' roda antes de
+    cada chamada e fica fora da medição.
+    """
+    samples = []
+    for _ in range(repeat):
+        total = 0.0
+        calls = 0
+        while calls < max_number and (total < min_time or calls == 0):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            fn()
+            total += time.perf_counter() - start
+            calls += 1
+        samples.append(total / calls)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "mean_s": statistics.fmean(samples),
+        "repeat": repeat,
+    }
+
+
+def book_benchmarks(config, logger, sizes):
+    results = {}
+    for size in sizes:
+        build_book(FAKE, size, config)
+        positions = FAKE.positions_get(symbol=config["symbol"])
+        buy_positions = [p for p in positions if p.type == FAKE.ORDER_TYPE_BUY]
+        repeat = 5 if size <= 10_000 else 3
+
+        results[f"manager_positions[{size}]"] = measure(
+            lambda: manager_positions(config, FAKE.ORDER_TYPE_BUY), repeat=repeat)
+
+        results[f"check_positions_condition[{size}]"] = measure(
+            lambda: check_positions_condition(
+                positions, FAKE.ORDER_TYPE_BUY, config["target_up_dollars"],
+                config["target_down_dollars"], logger, 0, config["target_down_interval_seconds"]),
+            repeat=repeat)
+
+        results[f"get_worst_positions_to_close[{size}]"] = measure(
+            lambda: get_worst_positions_to_close(positions, 5), repeat=repeat)
+
+        results[f"distribute_tp_sl[{size}]"] = measure(
+            lambda: distribute_tp_sl(size, 900, 1500, 1500, 3000, mode="linear", logger=logger),
+            repeat=repeat)
+
+        # Trigger atendido: inclui a abertura do hedge no terminal simulado
+        buy_metrics = calculate_buy_metrics(buy_positions)
+        buy_metrics = {**buy_metrics, "profit_buy": -1_000.0, "open_buy": 0}
+        hedge_config = {**config, "margin_preflight_enabled": False}
+        now = datetime.now(timezone.utc)
+
+        def fresh_state():
+            return {"hedge_manager_active": False, "hedge_manager_cooldown_until": None}
+
+        results[f"check_hedge_trigger[{size}]"] = measure(
+            lambda: check_hedge_trigger(fresh_state(), buy_metrics, positions, PRICE, now,
+                                        hedge_config, logger, config["symbol"]),
+            setup=lambda: trim_book(size),
+            repeat=repeat, max_number=200)
+    return results
+
+
+def bar_benchmarks(config, sizes):
+    import pandas as pd
+
+    results = {}
+    for size in sizes:
+        rates = FAKE.make_rates(size, timeframe=config["timeframe"])
+        base = pd.DataFrame(rates)
+        frame = {}
+
+        def setup():
+            frame["df"] = base.copy()
+
+        results[f"add_indicators[{size}]"] = measure(
+            lambda: add_indicators(frame["df"], config), setup=setup,
+            repeat=3 if size < 1_000_000 else 1, min_time=0.0 if size >= 100_000 else 0.2)
+    return results
+
+
+def panel_benchmarks(config, symbol_counts, bars=600):
+    """add_indicators símbolo a símbolo x painel (indicator_panel) com N símbolos."""
+    import pandas as pd
+
+    config = dict(config, indicators_ema_adx_active=True)
+    results = {}
+    for count in symbol_counts:
+        base = {f"S{i}": pd.DataFrame(FAKE.make_rates(bars, timeframe=config["timeframe"], seed=i)) for i in range(count)}
+        frames = {}
+
+        def setup():
+            frames.clear()
+            frames.update({symbol: df.copy() for symbol, df in base.items()})
+
+        def per_symbol():
+            for df in frames.values():
+                add_indicators(df, config)
+
+        results[f"add_indicators_per_symbol[{count}]"] = measure(per_symbol, setup=setup, repeat=3)
+        results[f"add_panel_indicators[{count}]"] = measure(
+            lambda: add_panel_indicators(frames, config), setup=setup, repeat=3)
+    return results
+
+
+def cycle_benchmarks(config, logger, sizes):
+    """Ciclo completo de process_positions (novas ordens, margem, análise)."""
+    try:
+        from daytrade_bot.main_manager_fm_buy_sell import build_services, process_positions
+    except ImportError as e:
+        return {f"process_positions[{size}]": {"skipped": str(e)} for size in sizes}
+
+    FAKE.make_rates(2_000, timeframe=config["timeframe"])
+    services = build_services(config, logger)
+    results = {}
+    for size in sizes:
+        results[f"process_positions[{size}]"] = measure(
+            lambda: process_positions(config, FAKE.ORDER_TYPE_BUY, logger, config["symbol"],
+                                      0, 0, 0, os.devnull, services),
+            setup=lambda: build_book(FAKE, size, config),
+            repeat=3, min_time=0.0 if size >= 10_000 else 0.2, max_number=50)
+    return results
+
+
+def build_history(size, seed=0):
+    """Deals (entrada + saída por SL/TP/robô), ordens de abertura e barras M10 de 'size' posições."""
+    rng = np.random.default_rng(seed)
+    start = 1_700_000_000
+    deals, orders = [], []
+    for i in range(size):
+        position = 10_000_000 + i
+        opened = start + i * 250
+        side = int(rng.integers(0, 2))
+        price = round(PRICE + rng.normal(0.0, 10.0), 2)
+        sl, tp = (price - 15.0, price + 9.0) if side == 0 else (price + 15.0, price - 9.0)
+        reason = int(rng.choice([fake_mt5.DEAL_REASON_SL, fake_mt5.DEAL_REASON_TP, fake_mt5.DEAL_REASON_EXPERT]))
+        exit_price = {fake_mt5.DEAL_REASON_SL: sl, fake_mt5.DEAL_REASON_TP: tp}.get(reason, price)
+        comment = {fake_mt5.DEAL_REASON_SL: f"[sl {sl:.2f}]", fake_mt5.DEAL_REASON_TP: f"[tp {tp:.2f}]"}.get(reason, "")
+        profit = round((exit_price - price) * (1 if side == 0 else -1), 2)
+        closed = opened + int(rng.integers(60, 7200))
+        orders.append(fake_mt5.TradeOrder(
+            position, opened, opened * 1000, opened, opened * 1000, 0, side, 0, 0, fake_mt5.ORDER_STATE_FILLED,
+            1, position, 0, fake_mt5.DEAL_REASON_EXPERT, 0.01, 0.01, price, sl, tp, price, 0.0, "XAUUSD",
+            "9.0x15.0", ""))
+        deals.append(fake_mt5.TradeDeal(
+            2 * position, position, opened, opened * 1000, side, fake_mt5.DEAL_ENTRY_IN, 1, position,
+            fake_mt5.DEAL_REASON_EXPERT, 0.01, price, 0.0, 0.0, 0.0, 0.0, "XAUUSD", "9.0x15.0", ""))
+        deals.append(fake_mt5.TradeDeal(
+            2 * position + 1, position + 1, closed, closed * 1000, 1 - side, fake_mt5.DEAL_ENTRY_OUT, 1, position,
+            reason, 0.01, exit_price, -0.05, 0.0, profit, 0.0, "XAUUSD", comment, ""))
+    FAKE.make_rates(size * 250 // 600 + 20, end_time=start + size * 250 + 7200)
+    bars = FAKE.rates[(FAKE.symbol, fake_mt5.TIMEFRAME_M10)]
+    return deals, orders, bars
+
+
+def history_benchmarks(sizes):
+    """Reconstrução dos ciclos de vida das posições a partir do histórico (deal_analytics)."""
+    results = {}
+    for size in sizes:
+        deals, orders, bars = build_history(size)
+        results[f"position_lifecycles[{size}]"] = measure(
+            lambda: position_lifecycles(deals, orders, bars, contract_size=100.0), repeat=3, min_time=0.0)
+    return results
+
+
+def run(quick=False):
+    config = bench_config()
+    logger = quiet_logger()
+    book_sizes = QUICK_BOOK_SIZES if quick else BOOK_SIZES
+    bar_sizes = QUICK_BAR_SIZES if quick else BAR_SIZES
+    history_sizes = QUICK_HISTORY_SIZES if quick else HISTORY_SIZES
+    panel_symbols = QUICK_PANEL_SYMBOLS if quick else PANEL_SYMBOLS
+
+    results = {}
+    results.update(book_benchmarks(config, logger, book_sizes))
+    results.update(bar_benchmarks(config, bar_sizes))
+    results.update(cycle_benchmarks(config, logger, book_sizes))
+    results.update(history_benchmarks(history_sizes))
+    results.update(panel_benchmarks(config, panel_symbols))
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compara dois resultados. Retorna a lista de regressões:
+    [(caso, mediana base, mediana atual, variação)].
+    """
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or "median_s" not in old or "median_s" not in new:
+            continue
+        change = new["median_s"] / old["median_s"] - 1 if old["median_s"] else 0.0
+        if change > threshold:
+            regressions.append((name, old["median_s"], new["median_s"], change))
+    return regressions
+
+
+def print_results(data):
+    for name, result in data["results"].items():
+        if "skipped" in result:
+            print(f"{name:<45} ignorado: {result['skipped']}")
+        else:
+            print(f"{name:<45} mediana {result['median_s'] * 1e3:>12.4f} ms  mín {result['min_s'] * 1e3:>12.4f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do daytrade_bot contra MT5 simulado.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="Arquivo JSON de saída.")
+    parser.add_argument("--quick", action="store_true", help="Só os tamanhos pequenos.")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "ATUAL"),
+                        help="Compara dois JSON em vez de medir.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Variação máxima aceita da mediana (0.10 = 10%%).")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for name, old, new, change in regressions:
+            print(f"REGRESSÃO {name}: {old * 1e3:.4f} ms -> {new * 1e3:.4f} ms ({change:+.1%})")
+        if not regressions:
+            print(f"Nenhuma regressão acima de {args.threshold:.0%}.")
+        return 1 if regressions else 0
+
+    data = run(quick=args.quick)
+    print_results(data)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"Resultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
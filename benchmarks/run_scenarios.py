@@ -0,0 +1,319 @@
+"""
+Cenários de resiliência: o loop real do robô (run_bot) contra o MT5 simulado
+com latência e falhas injetadas (daytrade_bot.mt5_faults).
+
+Cada cenário roda algumas horas de mercado sintético em tempo simulado
+(SimulatedClock + replay de ticks): a latência injetada avança o relógio e
+o preço, como no terminal real. Para cada cenário o relatório traz:
+
+  - latência do ciclo (tempo simulado, p50/p95/p99/máx) e CPU por ciclo
+  - prazos perdidos: ciclos mais longos que o intervalo do loop
+  - reconexões e se o robô parou antes do fim
+  - order_send por resultado, ordens perdidas (executadas no servidor sem
+    o robô saber) e entradas duplicadas (nova entrada do mesmo lado a menos
+    de meio passo do grid de uma posição aberta)
+
+Uso:
+  python benchmarks/run_scenarios.py                     # todos, 4h cada
+  python benchmarks/run_scenarios.py --hours 1 --only baseline requotes
+  python benchmarks/run_scenarios.py --scenarios meus.json -o cenarios.json
+
+O JSON de --scenarios tem o mesmo formato de SCENARIOS:
+  {"nome": {"faults": {...}, "disconnects": [...]}}
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from daytrade_bot import clock, fake_mt5  # noqa: E402
+
+# O fake precisa estar instalado antes dos módulos do robô (import MetaTrader5 as mt5)
+fake_mt5.install(fake_mt5.FakeMT5())
+
+from daytrade_bot.config_loader import load_json_config  # noqa: E402
+from daytrade_bot.main_manager_fm_buy_sell import run_bot  # noqa: E402
+from daytrade_bot.mt5_faults import DONE, FAILED, LOST_REPLY, REJECTED, FaultyMT5  # noqa: E402
+
+START = 1_767_261_600.0  # 2026-01-01 10:00 UTC
+TICK_SECONDS = 5
+HISTORY_HOURS = 60       # barras antes do início (backtest_hours do robô)
+
+SCENARIOS = {
+    "baseline": {},
+    "order_send_lento": {
+        "faults": {"order_send": {"latency": {"dist": "lognormal", "median": 2.0, "sigma": 0.6}}},
+    },
+    "positions_get_none": {
+        "faults": {"positions_get": {"error_rate": 0.2}},
+    },
+    "requotes": {
+        "faults": {"order_send": {"requote_rate": 0.3}},
+    },
+    "respostas_perdidas": {
+        "faults": {"order_send": {"lost_reply_rate": 0.2}},
+    },
+    "desconexao": {
+        "disconnects": [{"start": 3600, "duration": 120}],
+    },
+    "misto": {
+        "faults": {
+            "order_send": {"latency": {"dist": "spike", "base": 0.2, "spike": 5.0, "prob": 0.05},
+                           "requote_rate": 0.05, "lost_reply_rate": 0.05},
+            "positions_get": {"error_rate": 0.05},
+            "*": {"latency": {"dist": "uniform", "low": 0.005, "high": 0.05}, "error_rate": 0.01},
+        },
+        "disconnects": [{"start": 5400, "duration": 20}],
+    },
+    # Terminal lento em todas as chamadas, com o orçamento de ciclo ligado (cycle_budget)
+    "lento_com_orcamento": {
+        "faults": {"*": {"latency": {"dist": "lognormal", "median": 0.4, "sigma": 0.8}}},
+        "config": {"cycle_budget_enabled": True, "cycle_budget_seconds": 3},
+    },
+}
+
+
+class ScenarioClock(clock.SimulatedClock):
+    """SimulatedClock que mede o ciclo: cada clock.sleep() do loop fecha um ciclo."""
+
+    def __init__(self, start, on_advance=None):
+        super().__init__(start=start, on_advance=on_advance)
+        self.cycle_seconds = []
+        self.cycle_cpu = []
+        self._cycle_start = start
+        self._cpu_start = time.perf_counter()
+
+    def sleep(self, seconds):
+        self.cycle_seconds.append(self.time() - self._cycle_start)
+        self.cycle_cpu.append(time.perf_counter() - self._cpu_start)
+        super().sleep(seconds)
+        self._cycle_start = self.time()
+        self._cpu_start = time.perf_counter()
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.errors = 0
+        self.reconnects = 0
+        self.shed_cycles = 0
+
+    def emit(self, record):
+        if record.levelno >= logging.ERROR:
+            self.errors += 1
+        if record.getMessage().startswith("Conexão perdida"):
+            self.reconnects += 1
+        if record.getMessage().startswith("[BUDGET]"):
+            self.shed_cycles += 1
+
+
+def scenario_config():
+    config = load_json_config("config_buy")
+    config.update({
+        "export_to_excel": False,
+        "send_email": False,
+        "send_telegram": False,
+        "alarm_sound": False,
+        "hedge_manager_enabled": False,
+        "market_feed_enabled": False,
+        "bar_archive_enabled": False,
+        "tick_recorder_enabled": False,
+        "mt5_record_enabled": False,
+        "config_reload_enabled": False,
+        "order_thresholds_enabled": False,
+        "risk_sim_enabled": False,
+        "profiler_enabled": False,
+        "indicators_ema_adx_active": True,
+        "shutdown_hour": 99,
+    })
+    return config
+
+
+def market(hours, seed, timeframe_seconds):
+    """
+    Preço sintético: oscilação de 3h (alterna tendência, aciona o grid para
+    cima e para baixo) + passeio aleatório. Devolve (barras, ticks a partir de START).
+    """
+    rng = np.random.default_rng(seed)
+    count = int((HISTORY_HOURS + hours) * 3600 / TICK_SECONDS)
+    times = START - HISTORY_HOURS * 3600 + np.arange(count) * TICK_SECONDS
+    bids = 2400.0 + 25.0 * np.sin(2 * np.pi * (times - times[0]) / (3 * 3600)) \
+        + np.cumsum(rng.normal(0.0, 0.15, count))
+    bids = np.round(bids, 2)
+
+    bins = (times // timeframe_seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    rates = np.zeros(len(starts), dtype=fake_mt5.RATES_DTYPE)
+    rates["time"] = bins[starts] * timeframe_seconds
+    rates["open"] = bids[starts]
+    rates["close"] = bids[np.r_[starts[1:] - 1, count - 1]]
+    rates["high"] = np.maximum.reduceat(bids, starts)
+    rates["low"] = np.minimum.reduceat(bids, starts)
+    rates["tick_volume"] = np.diff(np.r_[starts, count])
+    rates["spread"] = 20
+
+    live = times >= START
+    ticks = np.zeros(int(live.sum()), dtype=[("time_msc", "<i8"), ("bid", "<f8"), ("ask", "<f8")])
+    ticks["time_msc"] = (times[live] * 1000).astype(np.int64)
+    ticks["bid"] = bids[live]
+    ticks["ask"] = bids[live] + 0.20
+    return rates, ticks
+
+
+def count_duplicates(deals, order_type, magic, spacing):
+    """
+    Entradas do robô abertas a menos de meio passo do grid de uma posição
+    do mesmo lado ainda aberta (o grid nunca faz isso de propósito).
+    """
+    open_prices = {}
+    duplicates = 0
+    for deal in deals:
+        if deal.magic != magic:
+            continue
+        if deal.entry == fake_mt5.DEAL_ENTRY_IN and deal.type == order_type:
+            if any(abs(deal.price - price) < spacing / 2 for price in open_prices.values()):
+                duplicates += 1
+            open_prices[deal.position_id] = deal.price
+        elif deal.entry != fake_mt5.DEAL_ENTRY_IN:
+            open_prices.pop(deal.position_id, None)
+    return duplicates
+
+
+def percentiles(values, scale=1.0):
+    if not values:
+        return {}
+    data = np.asarray(values) * scale
+    return {
+        "p50": float(np.percentile(data, 50)),
+        "p95": float(np.percentile(data, 95)),
+        "p99": float(np.percentile(data, 99)),
+        "max": float(data.max()),
+    }
+
+
+def run_scenario(name, spec, hours, seed):
+    config = scenario_config()
+    config.update(spec.get("config", {}))
+    logger = logging.getLogger(f"scenario.{name}")
+    logger.handlers[:] = []
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    counter = CountingHandler()
+    logger.addHandler(counter)
+
+    sim = ScenarioClock(start=START)
+    fake = fake_mt5.FakeMT5(balance=100_000.0, clock=sim.time)
+    timeframe_seconds = fake_mt5._TIMEFRAME_SECONDS[config["timeframe"]]
+    rates, ticks = market(hours, seed, timeframe_seconds)
+    fake.add_rates(config["symbol"], config["timeframe"], rates)
+    fake.set_price(ticks["bid"][0], spread=0.20)
+    sim.on_advance = fake.replay_ticks(ticks)
+
+    # Latência avança o relógio simulado sem fechar ciclo
+    faulty = FaultyMT5(fake, spec.get("faults"), spec.get("disconnects"), seed=seed,
+                       clock=sim.time, delay=sim.advance)
+    fake_mt5.install(faulty)
+
+    account = {"login": 1, "password": "", "server": "Fake-Server"}
+    finished = False
+    started = time.perf_counter()
+    with clock.use(sim):
+        try:
+            run_bot("BUY", config, logger, account)
+        except clock.ReplayFinished:
+            finished = True
+    elapsed = time.perf_counter() - started
+
+    outcomes = {DONE: 0, REJECTED: 0, FAILED: 0, LOST_REPLY: 0}
+    for event in faulty.order_events:
+        outcomes[event["outcome"]] += 1
+    interval = config["check_interval_seconds"]
+    spacing = min(config["target_up_dollars"], config["target_down_dollars"])
+
+    return {
+        "cycles": len(sim.cycle_seconds),
+        "cycle_latency_s": percentiles(sim.cycle_seconds),
+        "cycle_cpu_ms": percentiles(sim.cycle_cpu, 1e3),
+        "missed_deadlines": int(sum(s > interval for s in sim.cycle_seconds)),
+        "errors_logged": counter.errors,
+        "reconnects": counter.reconnects,
+        "shed_cycles": counter.shed_cycles,
+        "stopped_early": not finished,
+        "simulated_hours": round((sim.time() - START) / 3600, 2),
+        "order_send": outcomes,
+        "lost_orders": outcomes[LOST_REPLY],
+        "duplicate_entries": count_duplicates(fake.deals, fake.ORDER_TYPE_BUY, config["magic_number"], spacing),
+        "open_positions": len(fake.positions),
+        "injected": {f"{fn}:{kind}": n for (fn, kind), n in sorted(faulty.injected.items())},
+        "wall_s": round(elapsed, 2),
+    }
+
+
+def run(scenarios, hours, seed):
+    results = {}
+    for name, spec in scenarios.items():
+        results[name] = run_scenario(name, spec, hours, seed)
+        print_scenario(name, results[name])
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "hours": hours,
+            "seed": seed,
+        },
+        "scenarios": scenarios,
+        "results": results,
+    }
+
+
+def print_scenario(name, result):
+    latency = result["cycle_latency_s"]
+    orders = result["order_send"]
+    status = "parou antes do fim" if result["stopped_early"] else "ok"
+    print(f"{name:<20} ciclos {result['cycles']:>5}  "
+          f"latência p50 {latency.get('p50', 0):>7.2f}s p99 {latency.get('p99', 0):>7.2f}s "
+          f"máx {latency.get('max', 0):>7.2f}s  prazos perdidos {result['missed_deadlines']:>3}  "
+          f"reconexões {result['reconnects']:>3}  descartes {result['shed_cycles']:>3}  [{status} em {result['simulated_hours']}h]")
+    print(f"{'':<20} order_send ok {orders[DONE]} rejeitadas {orders[REJECTED]} falhas {orders[FAILED]}  "
+          f"perdidas {result['lost_orders']}  duplicadas {result['duplicate_entries']}  "
+          f"(CPU p95 {result['cycle_cpu_ms'].get('p95', 0):.1f} ms/ciclo, {result['wall_s']}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cenários de falha do MT5 contra o loop do daytrade_bot.")
+    parser.add_argument("-o", "--output", default="scenario_results.json", help="Arquivo JSON de saída.")
+    parser.add_argument("--hours", type=float, default=4.0, help="Horas simuladas por cenário.")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do mercado e das falhas.")
+    parser.add_argument("--only", nargs="+", metavar="NOME", help="Roda só estes cenários.")
+    parser.add_argument("--scenarios", help="JSON com cenários próprios (substitui os padrões).")
+    args = parser.parse_args(argv)
+
+    scenarios = SCENARIOS
+    if args.scenarios:
+        with open(args.scenarios, encoding="utf-8") as f:
+            scenarios = json.load(f)
+    if args.only:
+        missing = [name for name in args.only if name not in scenarios]
+        if missing:
+            parser.error(f"cenário(s) desconhecido(s): {', '.join(missing)}")
+        scenarios = {name: scenarios[name] for name in args.only}
+
+    data = run(scenarios, args.hours, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nResultado gravado em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import smtplib
 import requests
-import winsound
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -70,6 +69,7 @@ def send_telegram_alert(settings, message, logger):
 def play_alarm_sound():
     """Reproduz som local de alerta."""
     try:
+        import winsound  # Só existe no Windows
         winsound.Beep(1000, 3000)  # Frequência 1000Hz, duração 3s
         winsound.Beep(1200, 2000)
         winsound.Beep(1400, 1000)
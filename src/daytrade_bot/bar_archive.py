@@ -0,0 +1,201 @@
+# bar_archive.py
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import MetaTrader5 as mt5
+
+from .mmap_store import MmapTable
+
+# Mesmo layout retornado por mt5.copy_rates_range (60 bytes por barra)
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+# Instâncias abertas neste processo: {(pasta, símbolo, timeframe): BarArchive}
+_archives = {}
+
+
+def bar_file_path(folder, symbol, timeframe):
+    return os.path.join(folder, f"{symbol}_{timeframe}.bars")
+
+
+def open_bar_file(folder, symbol, timeframe):
+    """Abre o arquivo de barras somente para leitura (backtests, outros processos)."""
+    return MmapTable(bar_file_path(folder, symbol, timeframe), RATES_DTYPE, readonly=True)
+
+
+def rates_to_dataframe(rates):
+    """Converte barras (array estruturado) no DataFrame usado pelo robô."""
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s').dt.tz_localize('UTC')
+    return df
+
+
+def _to_ts(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+class _WriterLock:
+    """
+    Lock de escrita entre processos via arquivo criado com O_EXCL.
+    Os bots BUY e SELL do mesmo símbolo compartilham o arquivo de barras;
+    só um atualiza por vez, o outro espera e apenas lê.
+    """
+
+    def __init__(self, path, timeout=2.0, stale_seconds=30.0):
+        self.path = path + ".lock"
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.acquired = False
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                self.acquired = True
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_seconds:
+                        os.remove(self.path)  # Lock abandonado por processo que caiu
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() >= deadline:
+                    return self
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        if self.acquired:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.acquired = False
+
+
+class BarArchive:
+    """
+    Arquivo persistente de barras OHLC por (símbolo, timeframe) em np.memmap.
+
+    A primeira sincronização baixa 'backfill_hours' de histórico; as seguintes
+    buscam só o delta desde a última barra gravada (reescrevendo a última barra,
+    que pode ainda estar em formação). Qualquer número de processos pode ler o
+    mesmo arquivo sem cópia.
+    """
+
+    def __init__(self, symbol, timeframe, folder="bars", initial_capacity=65536, backfill_hours=55, logger=None):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.backfill_hours = backfill_hours
+        self.logger = logger
+        self.path = bar_file_path(folder, symbol, timeframe)
+        self.table = MmapTable(self.path, RATES_DTYPE, initial_capacity=initial_capacity)
+
+    def sync(self, end_time):
+        """
+        Atualiza o arquivo até 'end_time' (datetime UTC ou timestamp).
+        Retorna o número de barras novas gravadas.
+        """
+        end_ts = _to_ts(end_time)
+
+        with _WriterLock(self.path) as lock:
+            if not lock.acquired:
+                # Outro processo está atualizando o mesmo arquivo; só lemos.
+                return 0
+
+            last_time = self.table.last("time")
+            if last_time is None:
+                start_ts = end_ts - int(self.backfill_hours * 3600)
+                # Guarda no cabeçalho o início pedido no backfill (visível a todos os processos)
+                self.table.origin = start_ts
+            else:
+                start_ts = int(last_time)
+
+            if start_ts > end_ts:
+                return 0
+
+            rates = mt5.copy_rates_range(self.symbol, self.timeframe, start_ts, end_ts)
+            if rates is None or len(rates) == 0:
+                return 0
+
+            if last_time is not None:
+                rates = rates[rates["time"] >= last_time]
+                if len(rates) and rates["time"][0] == last_time:
+                    self.table.replace_last(rates[0])
+                    rates = rates[1:]
+
+            written = self.table.append(rates)
+
+        if written and self.logger:
+            self.logger.debug(f"[BARS] {written} barra(s) nova(s) para {self.symbol} tf={self.timeframe}.")
+        return written
+
+    def covers(self, start_time):
+        """True se o arquivo já contém barras desde 'start_time'."""
+        start_ts = _to_ts(start_time)
+        first = self.table.view()["time"][:1]
+        if len(first) == 0:
+            return False
+        origin = self.table.origin or int(first[0])
+        return min(int(first[0]), origin) <= start_ts
+
+    def read(self, start_time=None, end_time=None):
+        """Barras com start_time <= time <= end_time, sem cópia (fatia do memmap)."""
+        start = None if start_time is None else _to_ts(start_time)
+        end = None if end_time is None else _to_ts(end_time) + 1
+        return self.table.slice_by("time", start, end)
+
+    def close(self):
+        self.table.close()
+
+
+def get_bar_archive(config, timeframe, logger=None):
+    """Retorna (criando se preciso) o arquivo de barras deste processo para o timeframe."""
+    folder = config.get("bar_archive_folder", "bars")
+    key = (folder, config["symbol"], timeframe)
+    archive = _archives.get(key)
+    if archive is None:
+        archive = BarArchive(
+            config["symbol"],
+            timeframe,
+            folder=folder,
+            initial_capacity=config.get("bar_archive_initial_capacity", 65536),
+            backfill_hours=max(config.get("bar_archive_backfill_hours", 0), config.get("backtest_hours", 55)),
+            logger=logger,
+        )
+        _archives[key] = archive
+    return archive
+
+
+def get_archived_history(config, timeframe, start_time, end_time, logger):
+    """
+    Versão de get_historical_data servida pelo arquivo de barras.
+    Retorna None se o arquivo não cobre o período (o chamador usa o MT5 direto).
+    """
+    archive = get_bar_archive(config, timeframe, logger)
+    archive.sync(end_time)
+
+    if not archive.covers(start_time):
+        return None
+
+    rates = archive.read(start_time, end_time)
+    if len(rates) == 0:
+        return None
+    return rates_to_dataframe(rates)
@@ -0,0 +1,327 @@
+# bot_config.py
+"""
+Configuração tipada, validada e imutável do robô.
+
+O JSON (config/config_<tipo>.local.json ou .sample.json) é lido uma vez e
+vira um BotConfig: os campos conhecidos ficam em __slots__, com tipo
+verificado e valor padrão definido num único lugar (FIELDS). Chaves extras
+do JSON continuam acessíveis.
+
+O objeto se comporta como um dict somente leitura (config['x'],
+config.get('x', padrão), 'x' in config), então os módulos existentes não
+precisam mudar. Para variações (ex.: a config da ordem de hedge), use
+with_overrides(), que devolve um novo objeto.
+
+ConfigWatcher faz o hot reload: compara mtime/tamanho do arquivo (um stat
+por verificação) e, se mudou, devolve um novo BotConfig já validado para ser
+trocado entre dois ciclos.
+"""
+import json
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from . import clock as bot_clock
+from .config_loader import config_path
+
+_REQUIRED = object()
+_NUMBER = (int, float)
+
+# (nome, tipos aceitos, padrão). _REQUIRED: precisa estar no JSON. None: opcional sem padrão.
+FIELDS = (
+    ("symbol", str, _REQUIRED),
+    ("type_order", str, None),
+    ("mt5_path", str, None),
+    ("magic_number", int, _REQUIRED),
+    ("hedge_magic_number", int, None),
+    ("point", _NUMBER, _REQUIRED),
+    ("volume", _NUMBER, _REQUIRED),
+    ("profit_points", _NUMBER, _REQUIRED),
+    ("stop_points", _NUMBER, _REQUIRED),
+    ("timeframe", int, _REQUIRED),
+    ("backtest_hours", _NUMBER, 55),
+    ("history_minutes_interval", _NUMBER, 60),
+    ("history_service_enabled", bool, False),
+    ("history_cache_seconds", _NUMBER, 5),
+    ("history_prefetch_minutes", _NUMBER, 120),
+    ("history_max_span_minutes", _NUMBER, 1440),
+    ("all_positions", bool, False),
+    ("shutdown_hour", int, 99),
+    ("check_interval_seconds", _NUMBER, 60),
+    ("excel_save_interval_seconds", _NUMBER, 120),
+    ("manager_margin_interval_seconds", _NUMBER, 600),
+    ("target_down_interval_seconds", _NUMBER, 600),
+    ("drawdown_check_interval_seconds", _NUMBER, 180),
+    ("target_up_pts", _NUMBER, None),
+    ("target_down_pts", _NUMBER, None),
+    ("target_up_dollars", _NUMBER, None),
+    ("target_down_dollars", _NUMBER, None),
+    ("trigger_profit_dollars", _NUMBER, None),
+    ("margin_free_perc", _NUMBER, 0.5),
+    ("equity_target", _NUMBER, 0),
+    ("send_email", bool, False),
+    ("send_telegram", bool, False),
+    ("alarm_sound", bool, False),
+    ("email_settings", dict, None),
+    ("telegram_settings", dict, None),
+    ("export_to_excel", bool, False),
+    ("export_folder", str, "results"),
+    ("indicators_ema_adx_active", bool, False),
+    ("ema_period", int, 20),
+    ("adx_period", int, 14),
+    ("enable_floating_dd_stop", bool, False),
+    ("floating_dd_stop_threshold", _NUMBER, 0.0),
+    ("num_worst_to_close_on_dd_stop", int, 0),
+    ("hedge_manager_enabled", bool, False),
+    ("hedge_check_interval_seconds", _NUMBER, 180),
+    ("hedge_state_file", str, "hedge_state.json"),
+    ("hedge_trigger_profit_buy", _NUMBER, -80.0),
+    ("hedge_sell_volume", _NUMBER, 0.01),
+    ("hedge_sell_sl_pts", _NUMBER, 1400),
+    ("hedge_close_drawdown_cash", _NUMBER, 10.0),
+    ("hedge_cooldown_minutes", _NUMBER, 60),
+    ("hedge_trigger_max_open_buys", int, 2),
+    ("hedge_trigger_prearm", bool, False),
+    ("hedge_prearm_tolerance_points", _NUMBER, 10),
+    ("hedge_trailing_enabled", bool, False),
+    ("hedge_trailing_step_points", _NUMBER, 50),
+    ("close_by_enabled", bool, False),
+    ("close_positions_by_time_enabled", bool, False),
+    ("max_position_duration_minutes", _NUMBER, None),
+    ("order_thresholds_enabled", bool, False),
+    ("order_thresholds_close_worst", bool, False),
+    ("threshold_state_file", str, None),
+    ("order_thresholds", list, None),
+    ("margin_preflight_enabled", bool, False),
+    ("margin_preflight_min_free_perc", _NUMBER, 0.0),
+    ("margin_preflight_price_bucket", _NUMBER, 1.0),
+    ("margin_recovery_planner_enabled", bool, False),
+    ("ladder_enabled", bool, False),
+    ("ladder_reprice_tolerance_points", _NUMBER, 10),
+    ("market_feed_enabled", bool, False),
+    ("market_feed_name", str, None),
+    ("market_feed_interval_seconds", _NUMBER, 0.5),
+    ("market_feed_max_age_seconds", _NUMBER, 5.0),
+    ("market_feed_max_positions", int, 512),
+    ("bar_archive_enabled", bool, False),
+    ("bar_archive_folder", str, "bars"),
+    ("bar_archive_initial_capacity", int, 65536),
+    ("bar_archive_backfill_hours", _NUMBER, 0),
+    ("tick_recorder_enabled", bool, False),
+    ("tick_recorder_folder", str, "ticks"),
+    ("tick_recorder_initial_capacity", int, 262144),
+    ("tick_recorder_batch_size", int, 100000),
+    ("mt5_record_enabled", bool, False),
+    ("mt5_record_folder", str, "mt5_records"),
+    ("mt5_record_flush_every", int, 200),
+    ("pnl_ledger_enabled", bool, False),
+    ("pnl_ledger_path", str, "pnl_ledger.sqlite"),
+    ("pnl_ledger_backfill_days", _NUMBER, 30),
+    ("pnl_ledger_sync_seconds", _NUMBER, 60),
+    ("cycle_budget_enabled", bool, False),
+    ("cycle_budget_seconds", _NUMBER, 10),
+    ("cycle_budget_entry_share", _NUMBER, 0.7),
+    ("cycle_budget_reporting_share", _NUMBER, 0.5),
+    ("cycle_budget_max_defer_cycles", int, 10),
+    ("profiler_enabled", bool, False),
+    ("profiler_folder", str, "profiles"),
+    ("profiler_every_n_cycles", int, 100),
+    ("profiler_slow_cycle_ms", _NUMBER, 5000),
+    ("profiler_sample_interval_ms", _NUMBER, 10),
+    ("profiler_top_n", int, 15),
+    ("profiler_max_files", int, 50),
+    ("risk_sim_enabled", bool, False),
+    ("risk_sim_interval_seconds", _NUMBER, 60),
+    ("risk_sim_paths", int, 100_000),
+    ("risk_sim_batch_size", int, 25_000),
+    ("risk_sim_workers", int, 0),
+    ("risk_sim_horizon_minutes", _NUMBER, 240),
+    ("risk_sim_steps_per_bar", int, 1),
+    ("risk_sim_stop_out_level", _NUMBER, 50.0),
+    ("risk_sim_seed", int, None),
+    ("dynamic_mf_strategy", dict, None),
+    ("config_reload_enabled", bool, False),
+    ("config_reload_interval_seconds", _NUMBER, 5),
+)
+
+# Campos que não podem mudar com o robô rodando (exigem reinício)
+NOT_RELOADABLE = frozenset({"symbol", "type_order", "mt5_path", "magic_number", "hedge_magic_number"})
+
+_FIELD_TYPES = {name: types for name, types, _ in FIELDS}
+DEFAULTS = {name: default for name, _, default in FIELDS if default is not _REQUIRED and default is not None}
+
+
+class ConfigError(ValueError):
+    """Configuração inválida (campos obrigatórios ausentes ou com tipo errado)."""
+
+
+def _type_ok(value, types):
+    if isinstance(value, bool) and types is not bool:
+        return False  # True/False não valem como número
+    return isinstance(value, types)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class BotConfig(Mapping):
+    """Configuração imutável. Acesso por atributo (config.symbol) ou como dict (config['symbol'])."""
+
+    __slots__ = tuple(name for name, _, _ in FIELDS) + ("_extra", "source")
+
+    def __init__(self, values, source=None):
+        errors = []
+        for name, types, default in FIELDS:
+            if name in values:
+                value = values[name]
+                if value is not None and not _type_ok(value, types):
+                    errors.append(f"'{name}' deveria ser {_type_name(types)}, recebido {type(value).__name__}")
+                    continue
+                object.__setattr__(self, name, _freeze(value))
+            elif default is _REQUIRED:
+                errors.append(f"'{name}' é obrigatório")
+            elif default is not None:
+                object.__setattr__(self, name, default)
+            # Sem padrão: o slot fica vazio e config.get('x', padrão_local) continua valendo
+
+        if errors:
+            raise ConfigError(f"Configuração inválida ({source or 'dict'}): " + "; ".join(errors))
+
+        extra = {k: _freeze(v) for k, v in values.items() if k not in _FIELD_TYPES}
+        object.__setattr__(self, "_extra", MappingProxyType(extra))
+        object.__setattr__(self, "source", source)
+
+    @classmethod
+    def load(cls, base_name):
+        """Lê e valida config/<base_name>.local.json (ou .sample.json)."""
+        path = config_path(base_name)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), source=str(path))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BotConfig é imutável; use with_overrides() para criar uma variação.")
+
+    def __delattr__(self, name):
+        raise AttributeError("BotConfig é imutável.")
+
+    # ------------------------------------------------------------ Mapping
+    def __getitem__(self, key):
+        if key in _FIELD_TYPES:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return self._extra[key]
+
+    def __iter__(self):
+        for name, _, _ in FIELDS:
+            if hasattr(self, name):
+                yield name
+        yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"BotConfig(symbol={getattr(self, 'symbol', None)!r}, source={self.source!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    __hash__ = None
+
+    def copy(self):
+        """Cópia mutável (dict comum, inclusive listas/dicts aninhados)."""
+        return _thaw(self)
+
+    def replace(self, **changes):
+        """Novo BotConfig com os campos alterados (validados)."""
+        return BotConfig({**self.copy(), **changes}, source=self.source)
+
+    def changed_fields(self, other):
+        """Nomes dos campos cujo valor difere entre as duas configs."""
+        keys = set(self) | set(other)
+        return sorted(k for k in keys if self.get(k) != other.get(k))
+
+
+def _type_name(types):
+    if isinstance(types, tuple):
+        return "número"
+    return types.__name__
+
+
+def with_overrides(config, **changes):
+    """Variação da config sem alterar a original (funciona com BotConfig ou dict)."""
+    if isinstance(config, BotConfig):
+        return config.replace(**changes)
+    return {**config, **changes}
+
+
+class ConfigWatcher:
+    """
+    Hot reload por polling de mtime: um os.stat a cada 'interval_seconds'.
+    poll() devolve o novo BotConfig quando o arquivo mudou e é válido; senão None.
+    """
+
+    def __init__(self, base_name, current, logger, interval_seconds=5, clock=bot_clock.monotonic):
+        self.base_name = base_name
+        self.current = current
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self._clock = clock
+        self._next_check = 0.0
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(config_path(self.base_name))
+            return (st.st_mtime_ns, st.st_size)
+        except (FileNotFoundError, OSError):
+            return None
+
+    def poll(self):
+        now = self._clock()
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.interval_seconds
+
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+
+        try:
+            new = BotConfig.load(self.base_name)
+        except (ConfigError, ValueError, OSError) as e:
+            self.logger.error(f"[CONFIG] Alteração ignorada, arquivo inválido: {e}")
+            return None
+
+        changed = self.current.changed_fields(new)
+        if not changed:
+            return None
+
+        blocked = sorted(NOT_RELOADABLE.intersection(changed))
+        if blocked:
+            self.logger.error(
+                f"[CONFIG] Alteração ignorada: {', '.join(blocked)} só muda(m) com reinício do robô."
+            )
+            return None
+
+        self.logger.info(f"[CONFIG] Configuração recarregada. Campos alterados: {', '.join(changed)}")
+        self.current = new
+        return new
@@ -0,0 +1,127 @@
+# clock.py
+"""
+Relógio único do robô.
+
+Os módulos do loop não chamam time.time(), time.sleep() nem datetime.now()
+diretamente: usam clock.time(), clock.sleep(), clock.now() etc., que
+delegam ao relógio instalado.
+
+  WallClock       relógio real (padrão)
+  SimulatedClock  tempo virtual: sleep() só avança o relógio (opcionalmente
+                  dormindo seconds/speed de verdade) e avisa a fonte de replay,
+                  que atualiza o terminal simulado até o novo instante.
+
+Assim o loop de produção, sem alterações, roda sobre ticks gravados
+(tick_recorder + fake_mt5) muito mais rápido que o tempo real:
+
+    sim = clock.SimulatedClock(start=ticks["time_msc"][0] / 1000,
+                               on_advance=fake.replay_ticks(ticks))
+    fake = FakeMT5(clock=sim.time); fake_mt5.install(fake)
+    with clock.use(sim):
+        main_manager_fm_buy_sell.main("BUY")   # termina com ReplayFinished
+"""
+import time as _time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class ReplayFinished(BaseException):
+    """
+    A fonte de replay não tem mais dados: encerra o loop simulado.
+    Como KeyboardInterrupt, não é engolida pelos 'except Exception' do loop.
+    """
+
+
+class WallClock:
+    """Relógio real."""
+
+    def time(self):
+        return _time.time()
+
+    def monotonic(self):
+        return _time.monotonic()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+
+class SimulatedClock:
+    """
+    Relógio virtual. time() e monotonic() devolvem o instante simulado;
+    sleep() avança o instante e chama on_advance(novo_instante).
+
+    Args:
+        start (float): Instante inicial (epoch em segundos).
+        on_advance (callable): Fonte de replay; pode levantar ReplayFinished.
+        speed (float): Se informado, sleep() dorme seconds/speed de verdade
+            (ex.: 1000 = mil vezes mais rápido). None = sem espera.
+    """
+
+    def __init__(self, start=0.0, on_advance=None, speed=None):
+        self._now = float(start)
+        self.on_advance = on_advance
+        self.speed = speed
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed:
+            _time.sleep(seconds / self.speed)
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        self._now += seconds
+        if self.on_advance is not None:
+            self.on_advance(self._now)
+
+
+_current = WallClock()
+
+
+def get_clock():
+    return _current
+
+
+def install(new_clock):
+    """Instala o relógio e devolve o anterior."""
+    global _current
+    previous, _current = _current, new_clock
+    return previous
+
+
+@contextmanager
+def use(new_clock):
+    """Instala o relógio só dentro do bloco 'with'."""
+    previous = install(new_clock)
+    try:
+        yield new_clock
+    finally:
+        install(previous)
+
+
+def time():
+    return _current.time()
+
+
+def monotonic():
+    return _current.monotonic()
+
+
+def sleep(seconds):
+    _current.sleep(seconds)
+
+
+def now(tz=None):
+    """datetime do instante atual do relógio (hora local se tz for None)."""
+    return datetime.fromtimestamp(_current.time(), tz)
+
+
+def fromtimestamp(timestamp, tz=None):
+    """Conversão de timestamps do servidor (tick.time, position.time) para datetime."""
+    return datetime.fromtimestamp(timestamp, tz)
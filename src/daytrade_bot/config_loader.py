@@ -7,10 +7,10 @@ import json
 ROOT = Path(__file__).resolve().parents[2]  # .../daytrade_bot_vitrine
 CONFIG_DIR = ROOT / "config"
 
-def load_json_config(base_name: str) -> dict:
+def config_path(base_name: str) -> Path:
     """
-    Procura primeiro por config local (não versionada) e depois pelo sample.
-    Ex:
+    Caminho do arquivo de configuração: primeiro o local (não versionado),
+    depois o sample. Ex:
       - config/config_buy.local.json
       - config/config_buy.sample.json
     """
@@ -22,6 +22,14 @@ def load_json_config(base_name: str) -> dict:
         raise FileNotFoundError(
             f"Arquivo de configuração não encontrado. Esperado: {local.name} ou {sample.name}"
         )
+    return path
 
-    with open(path, "r", encoding="utf-8") as f:
+def load_json_config(base_name: str) -> dict:
+    """
+    Procura primeiro por config local (não versionada) e depois pelo sample.
+    Ex:
+      - config/config_buy.local.json
+      - config/config_buy.sample.json
+    """
+    with open(config_path(base_name), "r", encoding="utf-8") as f:
         return json.load(f)
@@ -0,0 +1,141 @@
+# cycle_budget.py
+"""
+-----------------------------------------------------------------------------
+ ORÇAMENTO DE TEMPO DO CICLO E DESCARTE DE TAREFAS NÃO CRÍTICAS
+
+ Com o terminal lento, process_positions fazia tudo em ordem (histórico,
+ indicadores, entradas, análise, Excel, sells do MF dinâmico, margem,
+ alertas) e um Excel ou alerta demorado atrasava a proteção de margem.
+
+ Cada ciclo recebe um orçamento (cycle_budget_seconds) e cada tarefa uma
+ classe de prioridade:
+
+   RISK       margem, hedge, fechamento por tempo: sempre roda
+   ENTRY      histórico/indicadores, escada, novas ordens, sells do MF
+              dinâmico: roda enquanto o ciclo usou menos que
+              cycle_budget_entry_share do orçamento
+   REPORTING  Excel, alertas, risco simulado: roda enquanto o ciclo usou
+              menos que cycle_budget_reporting_share do orçamento
+
+ Tarefa descartada fica "adiada": as que dependem de intervalo (Excel,
+ novas entradas) naturalmente tentam de novo no ciclo seguinte, e o
+ chamador pode consultar pending() para as demais. Para não deixar uma
+ tarefa de fora para sempre, depois de cycle_budget_max_defer_cycles
+ ciclos seguidos descartada ela roda mesmo sem orçamento.
+
+ Contadores (shed, forced, overruns) ficam no objeto e vão para o log a
+ cada ciclo com descarte.
+-----------------------------------------------------------------------------
+"""
+from collections import Counter
+
+from . import clock as bot_clock
+
+RISK = "risk"
+ENTRY = "entry"
+REPORTING = "reporting"
+
+
+class CycleBudget:
+    """
+    Orçamento de tempo por ciclo com prioridade por tarefa.
+
+    Args:
+        budget_seconds (float): Tempo total do ciclo.
+        entry_share (float): Fração do orçamento até a qual tarefas ENTRY rodam.
+        reporting_share (float): Fração do orçamento até a qual tarefas REPORTING rodam.
+        max_defer_cycles (int): Ciclos seguidos de descarte antes de forçar a tarefa
+            (0 = nunca força).
+        clock (callable): Fonte de tempo (segue o relógio do robô).
+        logger: Logger opcional.
+    """
+
+    def __init__(self, budget_seconds=10.0, entry_share=0.7, reporting_share=0.5, max_defer_cycles=10,
+                 clock=bot_clock.monotonic, logger=None):
+        self.budget_seconds = budget_seconds
+        self.limits = {RISK: None, ENTRY: budget_seconds * entry_share, REPORTING: budget_seconds * reporting_share}
+        self.max_defer_cycles = max_defer_cycles
+        self._clock = clock
+        self.logger = logger
+
+        self._started = None
+        self.cycles = 0
+        self.overruns = 0        # Ciclos que passaram do orçamento
+        self.shed = Counter()    # {tarefa: vezes descartada}
+        self.forced = Counter()  # {tarefa: vezes executada à força (adiada demais)}
+        self.deferred = {}       # {tarefa: ciclos seguidos descartada}
+        self._shed_this_cycle = []
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        return cls(
+            budget_seconds=config.get('cycle_budget_seconds', 10),
+            entry_share=config.get('cycle_budget_entry_share', 0.7),
+            reporting_share=config.get('cycle_budget_reporting_share', 0.5),
+            max_defer_cycles=config.get('cycle_budget_max_defer_cycles', 10),
+            logger=logger,
+        )
+
+    def start(self):
+        self._started = self._clock()
+        self._shed_this_cycle = []
+        self.cycles += 1
+
+    def elapsed(self):
+        return 0.0 if self._started is None else self._clock() - self._started
+
+    def remaining(self):
+        return self.budget_seconds - self.elapsed()
+
+    def admit(self, name, priority):
+        """True se a tarefa 'name' deve rodar agora; registra o descarte caso contrário."""
+        limit = self.limits[priority]
+        if limit is None or self.elapsed() < limit:
+            self.deferred.pop(name, None)
+            return True
+
+        waited = self.deferred.get(name, 0)
+        if self.max_defer_cycles and waited >= self.max_defer_cycles:
+            self.forced[name] += 1
+            self.deferred.pop(name, None)
+            return True
+
+        self.shed[name] += 1
+        self.deferred[name] = waited + 1
+        self._shed_this_cycle.append(name)
+        return False
+
+    def pending(self, name):
+        """A tarefa foi descartada e ainda não rodou."""
+        return name in self.deferred
+
+    def finish(self):
+        """Fecha o ciclo: conta estouro e registra no log o que foi descartado."""
+        elapsed = self.elapsed()
+        if elapsed > self.budget_seconds:
+            self.overruns += 1
+        if self._shed_this_cycle and self.logger:
+            self.logger.warning(
+                f"[BUDGET] Ciclo {self.cycles} em {elapsed:.2f}s (orçamento {self.budget_seconds:.2f}s). "
+                f"Adiadas: {', '.join(self._shed_this_cycle)} | total descartado: {dict(self.shed)}"
+            )
+        self._started = None
+        return elapsed
+
+    def stats(self):
+        return {
+            "cycles": self.cycles,
+            "overruns": self.overruns,
+            "shed": dict(self.shed),
+            "forced": dict(self.forced),
+            "pending": sorted(self.deferred),
+        }
+
+
+def admit(budget, name, priority):
+    """budget.admit(...), ou sempre True com o orçamento desligado (None)."""
+    return True if budget is None else budget.admit(name, priority)
+
+
+def pending(budget, name):
+    return budget is not None and budget.pending(name)
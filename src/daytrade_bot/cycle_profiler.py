@@ -0,0 +1,204 @@
+# cycle_profiler.py
+"""
+Profiler de ciclos do loop principal, ligado por config ou variável de ambiente.
+
+Dois modos, que podem ser usados juntos:
+  - A cada N ciclos (profiler_every_n_cycles) o ciclo roda sob cProfile e o
+    resultado vai para um arquivo .pstats.
+  - Com profiler_slow_cycle_ms, todo ciclo é amostrado por uma thread leve
+    (pilha da thread principal a cada profiler_sample_interval_ms). Se o ciclo
+    passar do limite, as pilhas são gravadas em formato "collapsed"
+    (uma linha "f1;f2;f3 contagem", compatível com flamegraph.pl/speedscope).
+
+Os arquivos levam o número do ciclo e o horário, a pasta é rotacionada
+(profiler_max_files) e um resumo top-N sai no log.
+
+Para ligar sem editar o config:  DAYTRADE_PROFILE=1 python run.py
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+_ENV_VAR = "DAYTRADE_PROFILE"
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread (por padrão, a que o criou)."""
+
+    def __init__(self, interval_seconds=0.01, thread_id=None):
+        self.interval_seconds = interval_seconds
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self._sample()
+
+    def start(self):
+        self.stacks.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cycle-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def top_functions(self, n):
+        """As n funções com mais amostras próprias (topo da pilha)."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+
+class CycleProfiler:
+    """
+    Envolve cada ciclo do loop principal.
+
+    Args:
+        folder (str): Pasta dos arquivos gerados.
+        every_n_cycles (int): Perfil completo (cProfile) a cada N ciclos; 0 desliga.
+        slow_cycle_ms (float): Grava as pilhas amostradas de ciclos mais lentos que isso; 0 desliga.
+        sample_interval_ms (float): Intervalo de amostragem da pilha.
+        top_n (int): Linhas do resumo no log.
+        max_files (int): Quantidade máxima de arquivos mantidos na pasta.
+    """
+
+    def __init__(self, folder="profiles", every_n_cycles=100, slow_cycle_ms=5000,
+                 sample_interval_ms=10, top_n=15, max_files=50, logger=None):
+        self.folder = folder
+        self.every_n_cycles = every_n_cycles
+        self.slow_cycle_ms = slow_cycle_ms
+        self.sample_interval_ms = sample_interval_ms
+        self.top_n = top_n
+        self.max_files = max_files
+        self.logger = logger
+        self.cycle_id = 0
+        os.makedirs(folder, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config, logger):
+        """Retorna o profiler se habilitado (config 'profiler_enabled' ou DAYTRADE_PROFILE=1), senão None."""
+        env = os.environ.get(_ENV_VAR, "").strip().lower()
+        if not config.get("profiler_enabled", False) and env not in ("1", "true", "yes", "on"):
+            return None
+        profiler = cls(
+            folder=config.get("profiler_folder", "profiles"),
+            every_n_cycles=config.get("profiler_every_n_cycles", 100),
+            slow_cycle_ms=config.get("profiler_slow_cycle_ms", 5000),
+            sample_interval_ms=config.get("profiler_sample_interval_ms", 10),
+            top_n=config.get("profiler_top_n", 15),
+            max_files=config.get("profiler_max_files", 50),
+            logger=logger,
+        )
+        logger.info(
+            f"[PROFILER] Ativo: cProfile a cada {profiler.every_n_cycles} ciclo(s), "
+            f"amostragem de ciclos acima de {profiler.slow_cycle_ms} ms. Arquivos em '{profiler.folder}'."
+        )
+        return profiler
+
+    def _file_path(self, extension):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.folder, f"cycle_{self.cycle_id:06d}_{stamp}.{extension}")
+
+    def _rotate(self):
+        files = [
+            os.path.join(self.folder, name) for name in os.listdir(self.folder)
+            if name.startswith("cycle_") and name.endswith((".pstats", ".collapsed"))
+        ]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[: len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def run(self, cycle_fn, *args, **kwargs):
+        """Executa um ciclo, perfilando-o se for a vez (N-ésimo) ou se ficar lento."""
+        self.cycle_id += 1
+        full = self.every_n_cycles > 0 and self.cycle_id % self.every_n_cycles == 0
+
+        profile = cProfile.Profile() if full else None
+        sampler = None
+        if not full and self.slow_cycle_ms > 0:
+            sampler = StackSampler(self.sample_interval_ms / 1000)
+            sampler.start()
+
+        started = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            return cycle_fn(*args, **kwargs)
+        finally:
+            if profile:
+                profile.disable()
+            if sampler:
+                sampler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                if profile:
+                    self._dump_profile(profile, elapsed_ms)
+                elif sampler and elapsed_ms >= self.slow_cycle_ms:
+                    self._dump_samples(sampler, elapsed_ms)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"[PROFILER] Falha ao gravar o perfil do ciclo {self.cycle_id}: {e}")
+
+    def _dump_profile(self, profile, elapsed_ms):
+        path = self._file_path("pstats")
+        profile.dump_stats(path)
+        self._rotate()
+
+        if self.logger:
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(self.top_n)
+            self.logger.info(
+                f"[PROFILER] Ciclo {self.cycle_id} ({elapsed_ms:.0f} ms) perfilado em {path}\n{stream.getvalue()}"
+            )
+
+    def _dump_samples(self, sampler, elapsed_ms):
+        path = self._file_path("collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._rotate()
+
+        if self.logger:
+            total = sum(sampler.stacks.values()) or 1
+            lines = "\n".join(
+                f"  {count / total:6.1%}  {function}" for function, count in sampler.top_functions(self.top_n)
+            )
+            self.logger.warning(
+                f"[PROFILER] Ciclo {self.cycle_id} lento: {elapsed_ms:.0f} ms "
+                f"(limite {self.slow_cycle_ms} ms). Pilhas em {path}\n{lines}"
+            )
+
+
+def run_cycle(profiler, cycle_fn, *args, **kwargs):
+    """Executa o ciclo sob o profiler, ou diretamente se ele estiver desligado (None)."""
+    if profiler is None:
+        return cycle_fn(*args, **kwargs)
+    return profiler.run(cycle_fn, *args, **kwargs)
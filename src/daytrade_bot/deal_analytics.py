@@ -0,0 +1,214 @@
+# deal_analytics.py
+"""
+-----------------------------------------------------------------------------
+ CICLO DE VIDA DAS POSIÇÕES A PARTIR DO HISTÓRICO (DEALS / ORDENS)
+
+ O MT5 guarda o resultado realizado espalhado em deals: a entrada (IN), as
+ saídas (OUT, parciais ou não, e OUT_BY no close-by) e a ordem de abertura
+ (com SL/TP iniciais). Aqui tudo é carregado em DataFrames colunares e
+ juntado por position_id com groupby/join vetorizados, sem laço por deal:
+
+   open_time, close_time, holding_seconds, side, volume, open_price,
+   exit_price, realized_pl (lucro + comissão + swap + taxa de todos os
+   deals da posição), n_closes, status, exit_reason, initial_sl/tp,
+   exit_level, sl_tp_modified e, se houver barras, MAE/MFE.
+
+ O histórico do MT5 não registra as modificações de SL/TP em si; o que
+ existe é o SL/TP da ordem de abertura e o nível que executou a saída
+ (comentário "[sl X]" / "[tp X]" do deal). sl_tp_modified compara os dois.
+
+ MAE/MFE (excursão adversa/favorável máxima, em preço) vêm das barras do
+ arquivo local (bar_archive): máximo/mínimo das barras que se sobrepõem à
+ vida da posição, via sparse table (consulta O(1) por posição). Como a
+ barra de abertura inteira entra, é uma cota superior na resolução do
+ timeframe.
+
+ Funções puras sobre listas de namedtuples (mt5.history_deals_get /
+ history_orders_get) ou DataFrames já montados.
+-----------------------------------------------------------------------------
+"""
+import numpy as np
+import pandas as pd
+
+from .bar_archive import open_bar_file
+
+_BUY = 0  # mt5.ORDER_TYPE_BUY / DEAL_TYPE_BUY
+_ENTRY_IN, _ENTRY_OUT, _ENTRY_INOUT, _ENTRY_OUT_BY = 0, 1, 2, 3
+
+# mt5.DEAL_REASON_*
+EXIT_REASONS = {
+    0: "client", 1: "mobile", 2: "web", 3: "expert", 4: "sl", 5: "tp", 6: "so",
+    7: "rollover", 8: "vmargin", 9: "split",
+}
+
+DEAL_COLUMNS = [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason",
+    "volume", "price", "commission", "swap", "profit", "fee", "symbol", "comment",
+]
+ORDER_COLUMNS = ["ticket", "sl", "tp"]
+
+
+def records_frame(records, columns):
+    """DataFrame colunar a partir de namedtuples do MT5 (ou DataFrame pronto)."""
+    if isinstance(records, pd.DataFrame):
+        return records
+    if records is None or len(records) == 0:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame.from_records(list(records), columns=records[0]._fields)
+
+
+def deals_frame(deals):
+    return records_frame(deals, DEAL_COLUMNS)
+
+
+def orders_frame(orders):
+    return records_frame(orders, ORDER_COLUMNS)
+
+
+def _range_extreme(values, lo, hi, reduce):
+    """
+    reduce(values[lo:hi+1]) para cada par (lo, hi), vetorizado com sparse table.
+    lo/hi são arrays de índices válidos (lo <= hi).
+    """
+    table = [values]
+    span = 1
+    while span * 2 <= len(values):
+        prev = table[-1]
+        table.append(reduce(prev[:-span], prev[span:]))
+        span *= 2
+    length = hi - lo + 1
+    level = np.floor(np.log2(length)).astype(np.intp)
+    out = np.empty(len(lo), dtype=np.float64)
+    for k in np.unique(level):
+        mask = level == k
+        row = table[k]
+        out[mask] = reduce(row[lo[mask]], row[hi[mask] - (1 << k) + 1])
+    return out
+
+
+def excursions(open_time, end_time, side, open_price, bars):
+    """
+    MAE e MFE em preço de cada posição a partir das barras (time, high, low).
+    Posições sem barras no período ficam com NaN.
+    """
+    mae = np.full(len(open_time), np.nan)
+    mfe = np.full(len(open_time), np.nan)
+    if bars is None or len(bars) == 0 or len(open_time) == 0:
+        return mae, mfe
+
+    times = np.asarray(bars["time"], dtype=np.float64)
+    highs = np.asarray(bars["high"], dtype=np.float64)
+    lows = np.asarray(bars["low"], dtype=np.float64)
+
+    lo = np.searchsorted(times, open_time, side="right") - 1  # Barra que contém a abertura
+    hi = np.searchsorted(times, end_time, side="right") - 1
+    lo = np.maximum(lo, 0)
+    valid = (hi >= lo) & (hi >= 0) & ~np.isnan(end_time)
+    if not valid.any():
+        return mae, mfe
+
+    max_high = _range_extreme(highs, lo[valid], hi[valid], np.maximum)
+    min_low = _range_extreme(lows, lo[valid], hi[valid], np.minimum)
+    is_buy = side[valid] == _BUY
+    price = open_price[valid]
+    mfe[valid] = np.maximum(np.where(is_buy, max_high - price, price - min_low), 0.0)
+    mae[valid] = np.maximum(np.where(is_buy, price - min_low, max_high - price), 0.0)
+    return mae, mfe
+
+
+def position_lifecycles(deals, orders=None, bars=None, contract_size=None, now=None):
+    """
+    Uma linha por posição (índice position_id) com o ciclo de vida completo.
+
+    Args:
+        deals: Deals do histórico (namedtuples ou DataFrame).
+        orders: Ordens do histórico (para SL/TP iniciais). Opcional.
+        bars: Barras do símbolo (array com time/high/low). Opcional.
+        contract_size (float): Se informado, MAE/MFE também em dinheiro.
+        now (float): Fim das posições ainda abertas no cálculo de MAE/MFE.
+
+    Returns:
+        pd.DataFrame
+    """
+    df = deals_frame(deals)
+    df = df[df["position_id"] != 0]  # Depósitos/saques não têm posição
+    if df.empty:
+        return pd.DataFrame()
+
+    df = df.assign(
+        net=df["profit"] + df["commission"] + df["swap"] + df["fee"],
+        value=df["price"] * df["volume"],
+    ).sort_values("time_msc", kind="stable")
+    is_in = df["entry"] == _ENTRY_IN
+
+    opens = df[is_in].groupby("position_id").agg(
+        open_time=("time", "first"),
+        side=("type", "first"),
+        magic=("magic", "first"),
+        symbol=("symbol", "first"),
+        comment=("comment", "first"),
+        open_order=("order", "first"),
+        volume=("volume", "sum"),
+        open_value=("value", "sum"),
+    )
+    closes = df[~is_in].groupby("position_id").agg(
+        close_time=("time", "last"),
+        close_volume=("volume", "sum"),
+        close_value=("value", "sum"),
+        exit_code=("reason", "last"),
+        exit_entry=("entry", "last"),
+        exit_comment=("comment", "last"),
+        n_closes=("ticket", "size"),
+    )
+    life = opens.join(closes, how="left").join(df.groupby("position_id")["net"].sum().rename("realized_pl"))
+
+    life["open_price"] = life["open_value"] / life["volume"]
+    life["exit_price"] = life["close_value"] / life["close_volume"]
+    life["n_closes"] = life["n_closes"].fillna(0).astype(int)
+    closed = life["close_volume"].fillna(0) >= life["volume"] - 1e-9
+    life["status"] = np.where(closed, "closed", np.where(life["n_closes"] > 0, "partial", "open"))
+    life["holding_seconds"] = np.where(closed, life["close_time"] - life["open_time"], np.nan)
+
+    life["exit_reason"] = life["exit_code"].map(EXIT_REASONS)
+    life.loc[life["exit_entry"] == _ENTRY_OUT_BY, "exit_reason"] = "close_by"
+    life.loc[~closed, "exit_reason"] = None
+
+    # SL/TP: iniciais pela ordem de abertura, nível de saída pelo comentário do deal
+    if orders is not None:
+        initial = orders_frame(orders)[["ticket", "sl", "tp"]].drop_duplicates("ticket").set_index("ticket")
+        initial.columns = ["initial_sl", "initial_tp"]
+        life = life.join(initial, on="open_order")
+    else:
+        life["initial_sl"] = np.nan
+        life["initial_tp"] = np.nan
+    extracted = life["exit_comment"].fillna("").str.extract(r"\[(sl|tp) (\d+)\.?(\d*)\]")
+    life["exit_level"] = pd.to_numeric(extracted[1] + "." + extracted[2].fillna(""), errors="coerce")
+    planned = np.where(extracted[0] == "sl", life["initial_sl"], np.where(extracted[0] == "tp", life["initial_tp"], np.nan))
+    # O comentário vem arredondado aos dígitos do símbolo
+    tolerance = 0.5 * 10.0 ** -extracted[2].fillna("").str.len() + 1e-9
+    life["sl_tp_modified"] = (np.abs(life["exit_level"] - planned) > tolerance) & (planned > 0)
+
+    end_time = life["close_time"].to_numpy(dtype=np.float64).copy()
+    if now is not None:
+        end_time[~closed.to_numpy()] = now
+    mae, mfe = excursions(
+        life["open_time"].to_numpy(dtype=np.float64), end_time, life["side"].to_numpy(),
+        life["open_price"].to_numpy(dtype=np.float64), bars,
+    )
+    life["mae"] = mae
+    life["mfe"] = mfe
+    if contract_size:
+        life["mae_cash"] = mae * life["volume"].to_numpy() * contract_size
+        life["mfe_cash"] = mfe * life["volume"].to_numpy() * contract_size
+
+    return life.drop(columns=["open_value", "close_value", "close_volume", "exit_code", "exit_entry", "exit_comment"])
+
+
+def archived_bars(config, timeframe=None):
+    """Barras do arquivo local (bar_archive) para MAE/MFE, ou None se não existir."""
+    timeframe = config["timeframe"] if timeframe is None else timeframe
+    try:
+        table = open_bar_file(config.get("bar_archive_folder", "bars"), config["symbol"], timeframe)
+    except (FileNotFoundError, OSError):
+        return None
+    return table.view()
@@ -1,7 +1,7 @@
 # drawdown_manager.py
 import MetaTrader5 as mt5
 import logging # Usar o 'logging' padrão para type hinting do logger
-from .mt5_order import get_all_open_positions, close_position
+from .mt5_order import get_all_open_positions, close_position, close_positions_netted
 
 """
 -----------------------------------------------------------------------------
@@ -177,4 +177,8 @@ def check_and_manage_floating_drawdown(config: dict, logger: logging.Logger, sym
         return
 
     # 5. Executar Fechamento (I/O - Escrita)
-    _execute_close_positions(positions_to_close, logger)
\ No newline at end of file
+    if config.get("close_by_enabled", False):
+        # BUYs e SELLs opostas entre as piores se fecham por CLOSE_BY
+        close_positions_netted(positions_to_close, logger, tag="[DRAWDOWN]")
+    else:
+        _execute_close_positions(positions_to_close, logger)
\ No newline at end of file
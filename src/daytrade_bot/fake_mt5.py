@@ -0,0 +1,614 @@
+# fake_mt5.py
+"""
+Terminal MetaTrader 5 simulado, em memória.
+
+Implementa o subconjunto da API do pacote MetaTrader5 usado pelo robô
+(posições, ordens pendentes, conta, ticks, barras, histórico e order_send),
+com os mesmos valores de constantes. Serve para benchmarks, replays e testes
+no Linux, sem terminal.
+
+Uso:
+    from daytrade_bot import fake_mt5
+    fake = fake_mt5.install(fake_mt5.FakeMT5())   # antes ou depois dos imports do robô
+    fake.set_price(2400.0)
+"""
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .clock import ReplayFinished
+
+# ---------------------------------------------------------------- constantes
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+ORDER_TYPE_CLOSE_BY = 8
+
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_PENDING = 5
+TRADE_ACTION_SLTP = 6
+TRADE_ACTION_MODIFY = 7
+TRADE_ACTION_REMOVE = 8
+TRADE_ACTION_CLOSE_BY = 10
+
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+ORDER_FILLING_RETURN = 2
+ORDER_TIME_GTC = 0
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_PRICE = 10015
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_INVALID_ORDER = 10035
+TRADE_RETCODE_POSITION_CLOSED = 10036
+TRADE_RETCODE_CONNECTION = 10031
+
+SYMBOL_TRADE_MODE_DISABLED = 0
+SYMBOL_TRADE_MODE_FULL = 4
+
+COPY_TICKS_ALL = -1
+COPY_TICKS_INFO = 1
+COPY_TICKS_TRADE = 2
+
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_ENTRY_INOUT = 2
+DEAL_ENTRY_OUT_BY = 3
+
+DEAL_REASON_CLIENT = 0
+DEAL_REASON_EXPERT = 3
+DEAL_REASON_SL = 4
+DEAL_REASON_TP = 5
+DEAL_REASON_SO = 6
+
+ORDER_STATE_STARTED = 0
+ORDER_STATE_PLACED = 1
+ORDER_STATE_CANCELED = 2
+ORDER_STATE_PARTIAL = 3
+ORDER_STATE_FILLED = 4
+ORDER_STATE_REJECTED = 5
+ORDER_STATE_EXPIRED = 6
+ORDER_STATE_REQUEST_ADD = 7
+ORDER_STATE_REQUEST_MODIFY = 8
+ORDER_STATE_REQUEST_CANCEL = 9
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M10 = 10
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+_TIMEFRAME_SECONDS = {1: 60, 5: 300, 10: 600, 15: 900, 30: 1800, 16385: 3600, 16388: 14400, 16408: 86400}
+
+RES_E_INTERNAL_FAIL_CONNECT = -10003
+RES_E_INTERNAL_FAIL_TIMEOUT = -10005
+
+# ------------------------------------------------------------------ registros
+TradePosition = namedtuple("TradePosition", [
+    "ticket", "time", "time_msc", "time_update", "time_update_msc", "type", "magic",
+    "identifier", "reason", "volume", "price_open", "sl", "tp", "price_current",
+    "swap", "profit", "symbol", "comment", "external_id",
+])
+TradeOrder = namedtuple("TradeOrder", [
+    "ticket", "time_setup", "time_setup_msc", "time_done", "time_done_msc", "time_expiration",
+    "type", "type_time", "type_filling", "state", "magic", "position_id", "position_by_id",
+    "reason", "volume_initial", "volume_current", "price_open", "sl", "tp", "price_current",
+    "price_stoplimit", "symbol", "comment", "external_id",
+])
+TradeDeal = namedtuple("TradeDeal", [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason",
+    "volume", "price", "commission", "swap", "profit", "fee", "symbol", "comment", "external_id",
+])
+Tick = namedtuple("Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"])
+SymbolInfo = namedtuple("SymbolInfo", [
+    "name", "visible", "trade_mode", "point", "digits", "trade_contract_size",
+    "volume_min", "volume_max", "volume_step", "trade_stops_level", "bid", "ask", "time",
+])
+AccountInfo = namedtuple("AccountInfo", [
+    "login", "leverage", "balance", "credit", "profit", "equity", "margin",
+    "margin_free", "margin_level", "margin_so_so", "currency", "server",
+])
+OrderSendResult = namedtuple("OrderSendResult", [
+    "retcode", "deal", "order", "volume", "price", "bid", "ask", "comment", "request_id",
+    "retcode_external", "request",
+])
+TradeRequest = namedtuple("TradeRequest", [
+    "action", "magic", "order", "symbol", "volume", "price", "stoplimit", "sl", "tp",
+    "deviation", "type", "type_filling", "type_time", "expiration", "comment",
+    "position", "position_by",
+])
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8"),
+])
+TICKS_DTYPE = np.dtype([
+    ("time", "<i8"), ("bid", "<f8"), ("ask", "<f8"), ("last", "<f8"), ("volume", "<u8"),
+    ("time_msc", "<i8"), ("flags", "<u4"), ("volume_real", "<f8"),
+])
+
+
+def _to_ts(value):
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return float(value)
+
+
+class FakeMT5:
+    """
+    Terminal simulado para um ou mais símbolos.
+
+    Args:
+        symbol (str): Símbolo padrão.
+        balance (float): Saldo inicial da conta.
+        leverage (int): Alavancagem (margem = volume * contrato * preço / alavancagem).
+        contract_size (float): Tamanho do contrato (XAUUSD = 100).
+        clock (callable): Fonte de tempo (epoch em segundos) do servidor simulado.
+    """
+
+    def __init__(self, symbol="XAUUSD", balance=10000.0, leverage=100, contract_size=100.0,
+                 point=0.01, digits=2, spread=0.20, clock=time.time):
+        self.clock = clock
+        self.symbol = symbol
+        self.spread = spread
+        self.symbols = {
+            symbol: dict(point=point, digits=digits, contract_size=contract_size,
+                         volume_min=0.01, volume_max=100.0, volume_step=0.01, stops_level=0),
+        }
+        self.balance = balance
+        self.leverage = leverage
+        self.account_login = 1
+        self.connected = True
+
+        self.bid = 0.0
+        self.ask = 0.0
+        self.positions = {}   # {ticket: dict}
+        self.orders = {}      # {ticket: dict} pendentes
+        self.deals = []       # TradeDeal
+        self.history_orders = []  # TradeOrder
+        self.rates = {}       # {(symbol, timeframe): array RATES_DTYPE}
+        self.ticks = {}       # {symbol: array TICKS_DTYPE}
+        self.requests = []    # todas as requisições recebidas por order_send
+        self._next_ticket = 1000
+        self._last_error = (1, "Success")
+
+        for name, value in globals().items():
+            if name.isupper() and isinstance(value, int):
+                setattr(self, name, value)
+
+    # ------------------------------------------------------------ utilidades
+    def _ticket(self):
+        self._next_ticket += 1
+        return self._next_ticket
+
+    def _now(self):
+        return self.clock()
+
+    def _spec(self, symbol):
+        return self.symbols[symbol]
+
+    def _profit(self, pos):
+        spec = self._spec(pos["symbol"])
+        if pos["type"] == ORDER_TYPE_BUY:
+            diff = self.bid - pos["price_open"]
+        else:
+            diff = pos["price_open"] - self.ask
+        return round(diff * pos["volume"] * spec["contract_size"], 2)
+
+    def _margin(self, symbol, volume, price):
+        return volume * self._spec(symbol)["contract_size"] * price / self.leverage
+
+    def _result(self, retcode, request, order=0, deal=0, volume=0.0, price=0.0, comment=""):
+        fields = {name: request.get(name, 0) for name in TradeRequest._fields}
+        return OrderSendResult(
+            retcode=retcode, deal=deal, order=order, volume=volume, price=price,
+            bid=self.bid, ask=self.ask, comment=comment, request_id=len(self.requests),
+            retcode_external=0, request=TradeRequest(**fields),
+        )
+
+    # --------------------------------------------------------------- mercado
+    def set_price(self, bid, spread=None, when=None):
+        """Move o preço, atualiza o P/L e dispara pendentes, SL e TP."""
+        self.bid = round(bid, 5)
+        self.ask = round(bid + (self.spread if spread is None else spread), 5)
+        self._trigger_pending()
+        self._trigger_stops()
+
+    def replay_ticks(self, ticks):
+        """
+        Fonte de replay para clock.SimulatedClock: devolve advance(agora), que
+        aplica em ordem os ticks gravados (tick_recorder.TICK_DTYPE) até 'agora',
+        disparando pendentes, SL e TP tick a tick. Depois do último tick
+        levanta clock.ReplayFinished.
+        """
+        times = np.asarray(ticks["time_msc"], dtype=np.int64)
+        bids = np.asarray(ticks["bid"], dtype=np.float64)
+        asks = np.asarray(ticks["ask"], dtype=np.float64)
+        cursor = 0
+
+        def advance(now):
+            nonlocal cursor
+            if cursor >= len(times):
+                raise ReplayFinished(f"Replay terminou no tick {cursor}")
+            end = int(np.searchsorted(times, int(now * 1000), side="right"))
+            for i in range(cursor, end):
+                self.set_price(bids[i], spread=asks[i] - bids[i])
+            cursor = max(cursor, end)
+
+        return advance
+
+    def add_rates(self, symbol, timeframe, rates):
+        self.rates[(symbol, timeframe)] = rates
+
+    def make_rates(self, count, timeframe=TIMEFRAME_M10, start_price=2400.0, seed=0, end_time=None):
+        """Gera uma série de barras (passeio aleatório) terminando em end_time."""
+        rng = np.random.default_rng(seed)
+        step = _TIMEFRAME_SECONDS.get(timeframe, 60)
+        end_time = int(self._now() if end_time is None else end_time) // step * step
+        closes = start_price + np.cumsum(rng.normal(0.0, 0.5, count))
+        opens = np.concatenate([[start_price], closes[:-1]])
+        noise = np.abs(rng.normal(0.0, 0.3, count))
+        rates = np.zeros(count, dtype=RATES_DTYPE)
+        rates["time"] = end_time - step * np.arange(count - 1, -1, -1)
+        rates["open"] = opens
+        rates["close"] = closes
+        rates["high"] = np.maximum(opens, closes) + noise
+        rates["low"] = np.minimum(opens, closes) - noise
+        rates["tick_volume"] = rng.integers(1, 500, count)
+        rates["spread"] = 20
+        self.add_rates(self.symbol, timeframe, rates)
+        return rates
+
+    def open_position(self, order_type, volume, price_open, magic=0, sl=0.0, tp=0.0,
+                      comment="", open_time=None, symbol=None):
+        """Cria uma posição diretamente (livros sintéticos)."""
+        ticket = self._ticket()
+        open_time = int(self._now() if open_time is None else open_time)
+        self.positions[ticket] = dict(
+            ticket=ticket, time=open_time, time_msc=open_time * 1000, type=order_type,
+            magic=magic, identifier=ticket, reason=DEAL_REASON_EXPERT, volume=volume,
+            price_open=price_open, sl=sl, tp=tp, swap=0.0, symbol=symbol or self.symbol,
+            comment=comment, time_update=open_time,
+        )
+        return ticket
+
+    # ------------------------------------------------------------ conexão
+    def initialize(self, *args, **kwargs):
+        self.connected = True
+        return True
+
+    def login(self, *args, **kwargs):
+        return True
+
+    def shutdown(self):
+        self.connected = False
+        return True
+
+    def last_error(self):
+        return self._last_error
+
+    def version(self):
+        return (500, 4000, "01 Jan 2025")
+
+    # ------------------------------------------------------------ consultas
+    def symbol_info(self, symbol):
+        if symbol not in self.symbols:
+            return None
+        spec = self._spec(symbol)
+        return SymbolInfo(
+            name=symbol, visible=True, trade_mode=SYMBOL_TRADE_MODE_FULL, point=spec["point"],
+            digits=spec["digits"], trade_contract_size=spec["contract_size"],
+            volume_min=spec["volume_min"], volume_max=spec["volume_max"],
+            volume_step=spec["volume_step"], trade_stops_level=spec["stops_level"],
+            bid=self.bid, ask=self.ask, time=int(self._now()),
+        )
+
+    def symbol_select(self, symbol, enable=True):
+        return symbol in self.symbols
+
+    def symbol_info_tick(self, symbol):
+        if symbol not in self.symbols:
+            return None
+        now = self._now()
+        return Tick(time=int(now), bid=self.bid, ask=self.ask, last=0.0, volume=0,
+                    time_msc=int(now * 1000), flags=6, volume_real=0.0)
+
+    def _position_tuple(self, pos):
+        price_current = self.bid if pos["type"] == ORDER_TYPE_BUY else self.ask
+        return TradePosition(
+            ticket=pos["ticket"], time=pos["time"], time_msc=pos["time_msc"],
+            time_update=pos["time_update"], time_update_msc=pos["time_update"] * 1000,
+            type=pos["type"], magic=pos["magic"], identifier=pos["identifier"],
+            reason=pos["reason"], volume=pos["volume"], price_open=pos["price_open"],
+            sl=pos["sl"], tp=pos["tp"], price_current=price_current, swap=pos["swap"],
+            profit=self._profit(pos), symbol=pos["symbol"], comment=pos["comment"], external_id="",
+        )
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        positions = self.positions.values()
+        if ticket is not None:
+            positions = [p for p in positions if p["ticket"] == ticket]
+        elif symbol is not None:
+            positions = [p for p in positions if p["symbol"] == symbol]
+        return tuple(self._position_tuple(p) for p in positions)
+
+    def positions_total(self):
+        return len(self.positions)
+
+    def _order_tuple(self, order, state=ORDER_STATE_PLACED, time_done=0):
+        return TradeOrder(
+            ticket=order["ticket"], time_setup=order["time"], time_setup_msc=order["time"] * 1000,
+            time_done=time_done, time_done_msc=time_done * 1000, time_expiration=0,
+            type=order["type"], type_time=ORDER_TIME_GTC, type_filling=ORDER_FILLING_RETURN,
+            state=state, magic=order["magic"], position_id=order.get("position_id", 0),
+            position_by_id=0, reason=DEAL_REASON_EXPERT, volume_initial=order["volume"],
+            volume_current=order["volume"], price_open=order["price"], sl=order["sl"],
+            tp=order["tp"], price_current=self.bid, price_stoplimit=0.0,
+            symbol=order["symbol"], comment=order["comment"], external_id="",
+        )
+
+    def orders_get(self, symbol=None, ticket=None, group=None):
+        orders = self.orders.values()
+        if ticket is not None:
+            orders = [o for o in orders if o["ticket"] == ticket]
+        elif symbol is not None:
+            orders = [o for o in orders if o["symbol"] == symbol]
+        return tuple(self._order_tuple(o) for o in orders)
+
+    def orders_total(self):
+        return len(self.orders)
+
+    def account_info(self):
+        profit = sum(self._profit(p) for p in self.positions.values())
+        margin = sum(self._margin(p["symbol"], p["volume"], p["price_open"]) for p in self.positions.values())
+        equity = self.balance + profit
+        return AccountInfo(
+            login=self.account_login, leverage=self.leverage, balance=round(self.balance, 2), credit=0.0,
+            profit=round(profit, 2), equity=round(equity, 2), margin=round(margin, 2),
+            margin_free=round(equity - margin, 2),
+            margin_level=round(equity / margin * 100, 2) if margin else 0.0,
+            margin_so_so=50.0, currency="USD", server="Fake-Server",
+        )
+
+    def order_calc_margin(self, action, symbol, volume, price):
+        if symbol not in self.symbols:
+            return None
+        return round(self._margin(symbol, volume, price), 2)
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        rates = self.rates.get((symbol, timeframe))
+        if rates is None:
+            return None
+        times = rates["time"]
+        lo = np.searchsorted(times, _to_ts(date_from), side="left")
+        hi = np.searchsorted(times, _to_ts(date_to), side="right")
+        return rates[lo:hi]
+
+    def copy_ticks_from(self, symbol, date_from, count, flags):
+        ticks = self.ticks.get(symbol)
+        if ticks is None:
+            return None
+        lo = np.searchsorted(ticks["time_msc"], int(_to_ts(date_from) * 1000), side="left")
+        return ticks[lo:lo + count]
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, position=None, ticket=None):
+        deals = self.deals
+        if position is not None:
+            return tuple(d for d in deals if d.position_id == position)
+        if ticket is not None:
+            return tuple(d for d in deals if d.ticket == ticket)
+        start, end = _to_ts(date_from), _to_ts(date_to)
+        return tuple(
+            d for d in deals
+            if start <= d.time <= end and (group is None or d.symbol == group)
+        )
+
+    def history_deals_total(self, date_from, date_to):
+        return len(self.history_deals_get(date_from, date_to))
+
+    def history_orders_get(self, date_from=None, date_to=None, group=None, position=None, ticket=None):
+        orders = self.history_orders
+        if position is not None:
+            return tuple(o for o in orders if o.position_id == position)
+        if ticket is not None:
+            return tuple(o for o in orders if o.ticket == ticket)
+        start, end = _to_ts(date_from), _to_ts(date_to)
+        return tuple(
+            o for o in orders
+            if start <= o.time_done <= end and (group is None or o.symbol == group)
+        )
+
+    def history_orders_total(self, date_from, date_to):
+        return len(self.history_orders_get(date_from, date_to))
+
+    # --------------------------------------------------------------- ordens
+    def _add_deal(self, order_ticket, pos, deal_type, entry, volume, price, profit, reason, comment):
+        now = self._now()
+        deal = TradeDeal(
+            ticket=self._ticket(), order=order_ticket, time=int(now), time_msc=int(now * 1000),
+            type=deal_type, entry=entry, magic=pos["magic"], position_id=pos["identifier"],
+            reason=reason, volume=volume, price=price, commission=0.0, swap=0.0,
+            profit=profit, fee=0.0, symbol=pos["symbol"], comment=comment, external_id="",
+        )
+        self.deals.append(deal)
+        return deal
+
+    def _add_history_order(self, ticket, order_type, volume, price, magic, symbol, comment, position_id, sl=0.0, tp=0.0):
+        now = int(self._now())
+        order = dict(ticket=ticket, time=now, type=order_type, magic=magic, volume=volume,
+                     price=price, sl=sl, tp=tp, symbol=symbol, comment=comment, position_id=position_id)
+        self.history_orders.append(self._order_tuple(order, state=ORDER_STATE_FILLED, time_done=now))
+
+    def _open(self, order_type, volume, price, magic, sl, tp, comment, symbol, reason=DEAL_REASON_EXPERT, ticket=None):
+        ticket = ticket or self._ticket()
+        now = int(self._now())
+        pos = dict(
+            ticket=ticket, time=now, time_msc=int(self._now() * 1000), type=order_type, magic=magic,
+            identifier=ticket, reason=reason, volume=volume, price_open=price, sl=sl or 0.0,
+            tp=tp or 0.0, swap=0.0, symbol=symbol, comment=comment or "", time_update=now,
+        )
+        self.positions[ticket] = pos
+        self._add_history_order(ticket, order_type, volume, price, magic, symbol, comment, ticket, sl, tp)
+        deal = self._add_deal(ticket, pos, order_type, DEAL_ENTRY_IN, volume, price, 0.0, reason, comment or "")
+        return ticket, deal
+
+    def _close(self, pos, volume, reason=DEAL_REASON_EXPERT, comment="", entry=DEAL_ENTRY_OUT, price=None):
+        volume = min(volume, pos["volume"])
+        if price is None:
+            price = self.bid if pos["type"] == ORDER_TYPE_BUY else self.ask
+        spec = self._spec(pos["symbol"])
+        sign = 1 if pos["type"] == ORDER_TYPE_BUY else -1
+        profit = round(sign * (price - pos["price_open"]) * volume * spec["contract_size"], 2)
+        self.balance += profit
+
+        close_type = ORDER_TYPE_SELL if pos["type"] == ORDER_TYPE_BUY else ORDER_TYPE_BUY
+        order_ticket = self._ticket()
+        self._add_history_order(order_ticket, close_type, volume, price, pos["magic"], pos["symbol"], comment, pos["identifier"])
+        deal = self._add_deal(order_ticket, pos, close_type, entry, volume, price, profit, reason, comment)
+
+        pos["volume"] = round(pos["volume"] - volume, 8)
+        if pos["volume"] <= 1e-9:
+            del self.positions[pos["ticket"]]
+        return order_ticket, deal
+
+    def _trigger_pending(self):
+        for order in list(self.orders.values()):
+            t, p = order["type"], order["price"]
+            hit = (
+                (t == ORDER_TYPE_BUY_STOP and self.ask >= p) or
+                (t == ORDER_TYPE_BUY_LIMIT and self.ask <= p) or
+                (t == ORDER_TYPE_SELL_STOP and self.bid <= p) or
+                (t == ORDER_TYPE_SELL_LIMIT and self.bid >= p)
+            )
+            if hit:
+                del self.orders[order["ticket"]]
+                side = ORDER_TYPE_BUY if t in (ORDER_TYPE_BUY_STOP, ORDER_TYPE_BUY_LIMIT) else ORDER_TYPE_SELL
+                price = self.ask if side == ORDER_TYPE_BUY else self.bid
+                self._open(side, order["volume"], price, order["magic"], order["sl"], order["tp"],
+                           order["comment"], order["symbol"], ticket=order["ticket"])
+
+    def _trigger_stops(self):
+        for pos in list(self.positions.values()):
+            if pos["type"] == ORDER_TYPE_BUY:
+                price = self.bid
+                sl_hit = pos["sl"] and price <= pos["sl"]
+                tp_hit = pos["tp"] and price >= pos["tp"]
+            else:
+                price = self.ask
+                sl_hit = pos["sl"] and price >= pos["sl"]
+                tp_hit = pos["tp"] and price <= pos["tp"]
+            if sl_hit:
+                self._close(pos, pos["volume"], reason=DEAL_REASON_SL, comment=f"[sl {pos['sl']}]")
+            elif tp_hit:
+                self._close(pos, pos["volume"], reason=DEAL_REASON_TP, comment=f"[tp {pos['tp']}]")
+
+    def order_send(self, request):
+        self.requests.append(dict(request))
+        action = request.get("action")
+
+        if action == TRADE_ACTION_DEAL:
+            return self._send_deal(request)
+        if action == TRADE_ACTION_SLTP:
+            pos = self.positions.get(request.get("position"))
+            if pos is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment="Position doesn't exist")
+            pos["sl"] = request.get("sl", pos["sl"])
+            pos["tp"] = request.get("tp", pos["tp"])
+            pos["time_update"] = int(self._now())
+            return self._result(TRADE_RETCODE_DONE, request, comment="Request executed")
+        if action == TRADE_ACTION_PENDING:
+            ticket = self._ticket()
+            self.orders[ticket] = dict(
+                ticket=ticket, time=int(self._now()), type=request["type"], magic=request.get("magic", 0),
+                volume=request["volume"], price=request["price"], sl=request.get("sl", 0.0),
+                tp=request.get("tp", 0.0), symbol=request["symbol"], comment=request.get("comment", ""),
+            )
+            return self._result(TRADE_RETCODE_DONE, request, order=ticket, volume=request["volume"],
+                                price=request["price"], comment="Request executed")
+        if action == TRADE_ACTION_MODIFY:
+            order = self.orders.get(request.get("order"))
+            if order is None:
+                return self._result(TRADE_RETCODE_INVALID_ORDER, request, comment="Invalid order")
+            for key in ("price", "sl", "tp"):
+                if key in request:
+                    order[key] = request[key]
+            return self._result(TRADE_RETCODE_DONE, request, order=order["ticket"], comment="Request executed")
+        if action == TRADE_ACTION_REMOVE:
+            if self.orders.pop(request.get("order"), None) is None:
+                return self._result(TRADE_RETCODE_INVALID_ORDER, request, comment="Invalid order")
+            return self._result(TRADE_RETCODE_DONE, request, order=request["order"], comment="Request executed")
+        if action == TRADE_ACTION_CLOSE_BY:
+            return self._send_close_by(request)
+
+        return self._result(TRADE_RETCODE_INVALID, request, comment="Invalid request")
+
+    def _send_deal(self, request):
+        symbol = request.get("symbol", self.symbol)
+        volume = request["volume"]
+        order_type = request["type"]
+        price = self.ask if order_type == ORDER_TYPE_BUY else self.bid
+
+        ticket = request.get("position")
+        if ticket:
+            pos = self.positions.get(ticket)
+            if pos is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, comment="Position doesn't exist")
+            order_ticket, deal = self._close(pos, volume, comment=request.get("comment", ""))
+            return self._result(TRADE_RETCODE_DONE, request, order=order_ticket, deal=deal.ticket,
+                                volume=deal.volume, price=deal.price, comment="Request executed")
+
+        account = self.account_info()
+        if self._margin(symbol, volume, price) > account.margin_free:
+            return self._result(TRADE_RETCODE_NO_MONEY, request, comment="No money")
+
+        ticket, deal = self._open(order_type, volume, price, request.get("magic", 0), request.get("sl", 0.0),
+                                  request.get("tp", 0.0), request.get("comment", ""), symbol)
+        return self._result(TRADE_RETCODE_DONE, request, order=ticket, deal=deal.ticket,
+                            volume=volume, price=price, comment="Request executed")
+
+    def _send_close_by(self, request):
+        pos = self.positions.get(request.get("position"))
+        pos_by = self.positions.get(request.get("position_by"))
+        if pos is None or pos_by is None or pos["type"] == pos_by["type"]:
+            return self._result(TRADE_RETCODE_INVALID, request, comment="Invalid close by")
+
+        volume = min(pos["volume"], pos_by["volume"])
+        # As duas pernas fecham ao preço de abertura da outra: o lucro travado é preservado
+        order_ticket, _ = self._close(pos, volume, entry=DEAL_ENTRY_OUT_BY, price=pos_by["price_open"],
+                                      comment=request.get("comment", ""))
+        self._close(pos_by, volume, entry=DEAL_ENTRY_OUT_BY, price=pos_by["price_open"],
+                    comment=request.get("comment", ""))
+        return self._result(TRADE_RETCODE_DONE, request, order=order_ticket, volume=volume,
+                            comment="Request executed")
+
+
+def install(fake=None):
+    """
+    Instala o terminal simulado no lugar do pacote MetaTrader5, inclusive nos
+    módulos do robô que já foram importados.
+    """
+    fake = fake or FakeMT5()
+    sys.modules["MetaTrader5"] = fake
+    for name, module in list(sys.modules.items()):
+        if name.startswith("daytrade_bot") and hasattr(module, "mt5"):
+            module.mt5 = fake
+    return fake
@@ -5,7 +5,18 @@ import os
 from datetime import datetime, timezone, timedelta
 
 # Importar as funções do seu projeto
-from .mt5_order import open_order_hedge, close_position, get_all_open_positions
+from .mt5_order import (
+    open_order_hedge, close_position, get_all_open_positions, set_position_sl,
+    place_pending_order, modify_pending_order, cancel_pending_order, get_pending_orders, pending_sl_tp,
+)
+from . import clock
+from . import market_feed
+from .bot_config import DEFAULTS, with_overrides
+from .position_events import CLOSED, OPENED, VOLUME_CHANGED
+from .risk_simulator import barrier_price
+
+HEDGE_STOP_COMMENT = "hedge stop"
+HEDGE_TP_POINTS = 90000  # TP "inatingível" (o hedge do backtest não tinha Take Profit)
 
 def load_hedge_state(config, logger):
     """Carrega o estado do gerenciador de hedge de um arquivo JSON."""
@@ -59,11 +70,52 @@ def calculate_buy_metrics(buy_positions):
     Substitui o 'initial_metrics' do backtest.
     """
     if not buy_positions:
-        return {'profit_buy': 0.0, 'open_buy': 0}
+        return {'profit_buy': 0.0, 'open_buy': 0, 'volume_buy': 0.0}
     
     total_profit = sum(p.profit for p in buy_positions)
     count = len(buy_positions)
-    return {'profit_buy': total_profit, 'open_buy': count}
+    volume = sum(p.volume for p in buy_positions)
+    return {'profit_buy': total_profit, 'open_buy': count, 'volume_buy': volume}
+
+def trailing_stop_price(hedge_trade, contract_size, drawdown_cash):
+    """
+    SL de trailing do hedge (SELL) equivalente à regra de drawdown de lucro.
+
+    O lucro muda contract_size * volume por unidade de preço, então
+    'drawdown_cash' vira uma distância de preço acima do ask atual
+    (price_current). Retorna None enquanto esse SL fecharia sem lucro: a regra
+    original só fecha com lucro positivo.
+    """
+    distance = drawdown_cash / (contract_size * hedge_trade.volume)
+    sl = hedge_trade.price_current + distance
+    if sl >= hedge_trade.price_open:
+        return None
+    return sl
+
+def trail_hedge_stop(hedge_trade, config, logger):
+    """
+    Modo 'hedge_trailing_enabled': move o SL do hedge no servidor para que a
+    saída por drawdown de lucro seja executada pela corretora, mesmo com o
+    robô parado. O SL só desce (nunca afrouxa) e só é movido em passos de
+    'hedge_trailing_step_points'; o SL da corretora é o próprio "lucro máximo".
+    Retorna True se o SL foi movido.
+    """
+    symbol_info = mt5.symbol_info(hedge_trade.symbol)
+    if symbol_info is None:
+        return False
+
+    sl = trailing_stop_price(hedge_trade, symbol_info.trade_contract_size, config.get('hedge_close_drawdown_cash', 10.0))
+    if sl is None:
+        return False
+
+    step = config.get('hedge_trailing_step_points', 50) * symbol_info.point
+    if hedge_trade.sl and sl > hedge_trade.sl - step + 1e-9:
+        return False
+
+    if set_position_sl(hedge_trade, sl, logger):
+        logger.info(f"[HEDGE] Trailing: SL do ticket {hedge_trade.ticket} movido de {hedge_trade.sl:.2f} para {sl:.2f}.")
+        return True
+    return False
 
 def manage_active_hedge(state, hedge_trade, current_bid, current_time, config, logger):
     """
@@ -72,7 +124,7 @@ def manage_active_hedge(state, hedge_trade, current_bid, current_time, config, l
     """
     
     hedge_drawdown_cash = config.get('hedge_close_drawdown_cash', 10.0)
-    hedge_cooldown_min = config.get('hedge_cooldown_minutes', 600)
+    hedge_cooldown_min = config.get('hedge_cooldown_minutes', DEFAULTS['hedge_cooldown_minutes'])
 
     # O objeto 'hedge_trade' é uma Posição MT5.
     # O campo 'profit' já é o lucro flutuante atualizado.
@@ -89,12 +141,16 @@ def manage_active_hedge(state, hedge_trade, current_bid, current_time, config, l
     )
     
     # Log (opcional, mas mantido do backtest)
-    trade_open_time = datetime.fromtimestamp(hedge_trade.time, tz=timezone.utc)
+    trade_open_time = clock.fromtimestamp(hedge_trade.time, tz=timezone.utc)
     duration_min = (current_time - trade_open_time).total_seconds() / 60
     
     # (Opcional) Adicionar ao log - CUIDADO: isso pode fazer o JSON crescer muito.
     # state['hedge_log'].append({ ... }) 
 
+    # Trailing no servidor: a corretora executa a saída entre os polls
+    if config.get('hedge_trailing_enabled', False):
+        trail_hedge_stop(hedge_trade, config, logger)
+
     # --- VERIFICAR REGRA DE SAÍDA (DRAWDOWN DE LUCRO) ---
     if current_profit > 0:
         profit_drawdown = state['active_hedge_profit_max'] - current_profit
@@ -161,15 +217,16 @@ def check_hedge_trigger(state, buy_metrics, all_positions, current_bid, current_
         )
         logger.info(f"[HEDGE] Tentando abrir ordem SELL [HEDGE] de {hedge_volume} lotes com SL de {hedge_sl_pts} pts.")
 
-        # Prepara uma 'config' temporária para a ordem de hedge
-        hedge_config = config.copy()
-        hedge_config['volume'] = hedge_volume
-        hedge_config['stop_points'] = hedge_sl_pts
-        hedge_config['magic_number'] = hedge_magic
-        
+        # Prepara uma 'config' temporária para a ordem de hedge (a original não é alterada).
         # O hedge do backtest não tinha Take Profit.
         # Para "sem TP", passamos um valor muito alto de 'profit_points'
-        hedge_config['profit_points'] = 90000 # TP "inatingível"
+        hedge_config = with_overrides(
+            config,
+            volume=hedge_volume,
+            stop_points=hedge_sl_pts,
+            magic_number=hedge_magic,
+            profit_points=HEDGE_TP_POINTS, # TP "inatingível"
+        )
         
         # Chamamos sua função 'open_new_order'
         # Ela precisa da lista de posições para a lógica de 'NO_MONEY'
@@ -211,10 +268,145 @@ def check_hedge_trigger(state, buy_metrics, all_positions, current_bid, current_
 
     return state
 
-def check_and_manage_hedge(config, logger, symbol):
+def hedge_trigger_price(buy_metrics, current_bid, contract_size, config):
+    """
+    Bid em que o lucro flutuante dos BUYs cruza 'hedge_trigger_profit_buy'.
+    O P/L é linear no preço: lucro(bid) = lucro_atual + contrato * volume * (bid - bid_atual).
+    Retorna (preço, direção) como risk_simulator.barrier_price (direção 0: já cruzou).
+    """
+    return barrier_price(
+        buy_metrics['profit_buy'],
+        contract_size * buy_metrics.get('volume_buy', 0.0),
+        config.get('hedge_trigger_profit_buy', -80.0),
+        current_bid,
+    )
+
+def _cancel_armed_hedge_stop(state, logger):
+    ticket = state.get('armed_hedge_order')
+    if ticket:
+        cancel_pending_order(ticket, logger)
+        state['armed_hedge_order'] = None
+    return state
+
+def arm_hedge_stop(state, buy_metrics, current_bid, current_time, config, logger, symbol):
+    """
+    Modo pré-armado ('hedge_trigger_prearm'): mantém um SELL STOP do hedge no
+    bid em que o lucro dos BUYs cruza o trigger, movido quando o livro muda.
+    A corretora executa o hedge no nível, sem esperar o próximo poll.
+
+    Returns:
+        tuple: (state, crossed). 'crossed' indica que o trigger já foi
+        ultrapassado e o hedge deve ser aberto a mercado (check_hedge_trigger).
+    """
+    cooldown_time = state.get('hedge_manager_cooldown_until')
+    in_cooldown = cooldown_time and current_time < cooldown_time
+    open_buys = buy_metrics['open_buy']
+    if in_cooldown or open_buys == 0 or open_buys > config.get('hedge_trigger_max_open_buys', 2):
+        return _cancel_armed_hedge_stop(state, logger), False
+
+    symbol_info = mt5.symbol_info(symbol)
+    if symbol_info is None:
+        logger.error(f"[HEDGE] Símbolo {symbol} não encontrado para armar o SELL STOP.")
+        return state, False
+
+    price, direction = hedge_trigger_price(buy_metrics, current_bid, symbol_info.trade_contract_size, config)
+    if price is None or direction != -1:
+        return _cancel_armed_hedge_stop(state, logger), direction == 0
+
+    main_magic = config['magic_number']
+    hedge_magic = config.get('hedge_magic_number', main_magic + 1)
+    point = symbol_info.point
+    sl, tp = pending_sl_tp(mt5.ORDER_TYPE_SELL_STOP, price, config.get('hedge_sell_sl_pts', 1400), HEDGE_TP_POINTS, point)
+    tp = max(tp, 0.0)
+
+    orders = get_pending_orders(symbol, hedge_magic, HEDGE_STOP_COMMENT)
+    if orders is None:
+        logger.warning("[HEDGE] Não foi possível ler as ordens pendentes.")
+        return state, False
+    armed = next((o for o in orders if o.ticket == state.get('armed_hedge_order')), None)
+    for order in orders:
+        if order is not armed:
+            cancel_pending_order(order.ticket, logger)  # Restos de execuções anteriores
+
+    tolerance = config.get('hedge_prearm_tolerance_points', 10) * point
+    if armed is None:
+        ticket = place_pending_order(
+            symbol, mt5.ORDER_TYPE_SELL_STOP, price, config.get('hedge_sell_volume', 0.01), hedge_magic, logger,
+            sl=sl, tp=tp, comment=HEDGE_STOP_COMMENT,
+        )
+        state['armed_hedge_order'] = ticket
+        if ticket:
+            logger.info(f"[HEDGE] SELL STOP armado em {price:.2f} (trigger {config.get('hedge_trigger_profit_buy', -80.0)}).")
+    elif abs(armed.price_open - price) > tolerance + 1e-9:
+        modify_pending_order(armed.ticket, price, logger, sl=sl, tp=tp)
+    return state, False
+
+def activate_filled_hedge_stop(state, all_positions, logger):
+    """Se o SELL STOP armado virou posição, ativa o hedge com ela."""
+    ticket = state.get('armed_hedge_order')
+    if not ticket:
+        return state
+    position = next((p for p in all_positions if p.identifier == ticket and p.type == mt5.ORDER_TYPE_SELL), None)
+    if position is None:
+        return state
+
+    logger.warning(f"[HEDGE] SELL STOP {ticket} executado a {position.price_open:.2f}. Hedge ATIVO (Ticket {position.ticket}).")
+    state['hedge_manager_active'] = True
+    state['active_hedge_trade_id'] = position.ticket
+    state['active_hedge_profit_max'] = 0.0
+    state['active_hedge_profit_min'] = 0.0
+    state['hedge_log'] = []
+    state['armed_hedge_order'] = None
+    return state
+
+class HedgeStopWatcher:
+    """
+    Assinante do PositionTracker: sinaliza quando uma SELL do hedge é aberta
+    (execução do SELL STOP) ou quando o livro de BUYs do robô muda (aberta,
+    fechada, volume alterado), para o loop rodar a verificação do hedge no
+    mesmo ciclo em vez de esperar 'hedge_check_interval_seconds'. Assim o
+    SELL STOP é reprecificado assim que o nível do trigger se move.
+    """
+
+    def __init__(self):
+        self.filled = False
+        self.book_changed = False
+
+    def on_position_event(self, event):
+        self.filled = True
+
+    def on_buy_event(self, event):
+        self.book_changed = True
+
+    def pop_due(self):
+        """True se houve execução do hedge ou mudança nos BUYs desde a última chamada."""
+        due = self.filled or self.book_changed
+        self.filled = self.book_changed = False
+        return due
+
+    @staticmethod
+    def predicate(config):
+        hedge_magic = config.get('hedge_magic_number', config['magic_number'] + 1)
+        return lambda p: p.magic == hedge_magic and p.type == mt5.ORDER_TYPE_SELL
+
+    @staticmethod
+    def buy_predicate(config):
+        main_magic = config['magic_number']
+        return lambda p: p.magic == main_magic and p.type == mt5.ORDER_TYPE_BUY
+
+    def subscribe(self, tracker, config):
+        tracker.subscribe(self.on_position_event, kinds=[OPENED], predicate=self.predicate(config))
+        tracker.subscribe(self.on_buy_event, kinds=[OPENED, CLOSED, VOLUME_CHANGED],
+                          predicate=self.buy_predicate(config))
+
+def check_and_manage_hedge(config, logger, symbol, tracker=None):
     """
     Função principal para gerenciar a lógica do Hedge Defensivo.
     Esta função deve ser chamada dentro do seu loop principal (main).
+
+    Com 'tracker' (PositionTracker do ciclo), as posições, o ticket do hedge e
+    as métricas dos BUYs vêm do snapshot já processado, sem nova consulta
+    ao terminal nem varredura do livro.
     """
     
     # 1. Verificar se o gerenciador está habilitado no config
@@ -226,19 +418,19 @@ def check_and_manage_hedge(config, logger, symbol):
         state = load_hedge_state(config, logger)
         
         # Pegar TODAS as posições abertas para este símbolo
-        all_positions = get_all_open_positions(symbol)
+        all_positions = tracker.positions() if tracker is not None else get_all_open_positions(symbol)
         if all_positions is None:
             logger.error("[HEDGE] Não foi possível obter posições do MT5.")
             return
 
-        tick = mt5.symbol_info_tick(symbol)
+        tick = market_feed.symbol_info_tick(symbol)
         if not tick:
             logger.error(f"[HEDGE] Não foi possível obter o tick para {symbol}.")
             return
         
         current_bid = tick.bid
         # Usar o tempo do servidor MT5 é mais robusto que o tempo local
-        current_time = datetime.fromtimestamp(tick.time, tz=timezone.utc)
+        current_time = clock.fromtimestamp(tick.time, tz=timezone.utc)
 
     except Exception as e:
         logger.error(f"[HEDGE] Erro ao carregar dados iniciais: {e}", exc_info=True)
@@ -248,16 +440,17 @@ def check_and_manage_hedge(config, logger, symbol):
     main_magic = config['magic_number']
     hedge_magic = config.get('hedge_magic_number', main_magic + 1)
 
-    # Posições BUY do robô principal (que estamos monitorando)
-    buy_positions = [p for p in all_positions if p.magic == main_magic and p.type == mt5.ORDER_TYPE_BUY]
-    
     # O trade de hedge (SELL) ativo, se houver
     hedge_sell_position = None
     if state['hedge_manager_active']:
         ticket_id = state['active_hedge_trade_id']
         # Encontra o trade de hedge pelo TICKET salvo no estado E pelo magic de hedge
+        if tracker is not None:
+            candidates = [tracker.get(ticket_id)] if ticket_id in tracker else []
+        else:
+            candidates = all_positions
         hedge_sell_position = next((
-            p for p in all_positions 
+            p for p in candidates 
             if p.ticket == ticket_id and 
                p.magic == hedge_magic and 
                p.type == mt5.ORDER_TYPE_SELL
@@ -277,15 +470,30 @@ def check_and_manage_hedge(config, logger, symbol):
             )
             state['hedge_manager_active'] = False
             state['active_hedge_trade_id'] = None
-            hedge_cooldown_min = config.get('hedge_cooldown_minutes', 600)
+            hedge_cooldown_min = config.get('hedge_cooldown_minutes', DEFAULTS['hedge_cooldown_minutes'])
             state['hedge_manager_cooldown_until'] = current_time + timedelta(minutes=hedge_cooldown_min)
             logger.info(f"[HEDGE] Cooldown de {hedge_cooldown_min} min ativado até {state['hedge_manager_cooldown_until']}.")
     
     else:
         # --- ESTADO INATIVO: Monitorando o trigger para abrir um hedge ---
         # logger.info("[HEDGE] Gerenciador INATIVO. Monitorando trigger...")
-        buy_metrics = calculate_buy_metrics(buy_positions)
-        state = check_hedge_trigger(state, buy_metrics, all_positions, current_bid, current_time, config, logger, symbol)
+        # Posições BUY do robô principal (que estamos monitorando)
+        if tracker is not None:
+            buys = tracker.aggregate(main_magic, mt5.ORDER_TYPE_BUY)
+            buy_metrics = {'profit_buy': buys['profit'], 'open_buy': buys['count'], 'volume_buy': buys['volume']}
+        else:
+            buy_positions = [p for p in all_positions if p.magic == main_magic and p.type == mt5.ORDER_TYPE_BUY]
+            buy_metrics = calculate_buy_metrics(buy_positions)
+
+        if config.get('hedge_trigger_prearm', False):
+            # SELL STOP pré-armado: a execução ativa o hedge; a mercado só se o trigger já passou
+            state = activate_filled_hedge_stop(state, all_positions, logger)
+            if not state['hedge_manager_active']:
+                state, crossed = arm_hedge_stop(state, buy_metrics, current_bid, current_time, config, logger, symbol)
+                if crossed:
+                    state = check_hedge_trigger(state, buy_metrics, all_positions, current_bid, current_time, config, logger, symbol)
+        else:
+            state = check_hedge_trigger(state, buy_metrics, all_positions, current_bid, current_time, config, logger, symbol)
 
     # 5. Salvar o estado no arquivo JSON
     save_hedge_state(state, config, logger)
\ No newline at end of file
@@ -0,0 +1,238 @@
+# history_service.py
+"""
+-----------------------------------------------------------------------------
+ SERVIÇO DE CONSULTA AO HISTÓRICO (DEALS / ORDENS)
+
+ As funções de mt5_history pedem ao terminal janelas sobrepostas do mesmo
+ histórico (últimos 60, 90 minutos...) várias vezes por ciclo. O serviço
+ mantém em memória um snapshot do histórico, do início mais antigo já
+ pedido até o instante da última atualização, e atende qualquer janela
+ contida nele com uma busca binária, sem ir ao terminal.
+
+   - A primeira busca já cobre 'prefetch_seconds' para trás, de modo que
+     as janelas usuais do ciclo saem todas dela. Uma janela que começa
+     antes do snapshot amplia o início com uma única busca (só o trecho
+     que falta).
+   - Snapshot com mais de 'max_age_seconds' (relógio do robô) é
+     atualizado só pelo final: busca a partir do último deal/ordem
+     conhecido e acrescenta os novos (O(novos), sem reler a janela toda).
+   - O snapshot guarda no máximo 'max_span_seconds' antes do seu final:
+     registros mais antigos (e fora da janela pedida) são descartados,
+     então um robô que roda por semanas não acumula o histórico inteiro.
+   - Resultados filtrados são memorizados por (tipo, janela, filtro) até a
+     versão do snapshot mudar, ou seja, até chegarem deals/ordens novos.
+   - Chamadas simultâneas (várias estratégias/threads) esperam a busca em
+     andamento: o terminal vê uma só requisição.
+-----------------------------------------------------------------------------
+"""
+import heapq
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import MetaTrader5 as mt5
+
+from . import clock as bot_clock
+
+DEALS = "deals"
+ORDERS = "orders"
+
+
+def _to_ts(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _to_datetime(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+class _Snapshot:
+    """Registros de um tipo ordenados por tempo, com a coluna de tempo em numpy."""
+
+    def __init__(self, time_field):
+        self.time_field = time_field
+        self.records = []
+        self.times = np.empty(0, dtype=np.float64)
+        self.tickets = set()
+        self.start = None  # Intervalo coberto [start, end]
+        self.end = None
+
+    def _time(self, record):
+        return getattr(record, self.time_field)
+
+    def merge(self, records):
+        """
+        Acrescenta os registros ainda não vistos; retorna quantos eram novos.
+        Só os novos são ordenados: no caso comum (atualização do final ou do
+        início) eles entram como um bloco, sem reordenar o snapshot.
+        """
+        fresh = sorted((r for r in records if r.ticket not in self.tickets), key=self._time)
+        if not fresh:
+            return 0
+        self.tickets.update(r.ticket for r in fresh)
+        fresh_times = np.fromiter((self._time(r) for r in fresh), dtype=np.float64, count=len(fresh))
+
+        if not self.records or fresh_times[0] >= self.times[-1]:
+            self.records.extend(fresh)
+            self.times = np.concatenate([self.times, fresh_times])
+        elif fresh_times[-1] <= self.times[0]:
+            self.records[:0] = fresh
+            self.times = np.concatenate([fresh_times, self.times])
+        else:
+            self.records = list(heapq.merge(self.records, fresh, key=self._time))
+            self.times = np.fromiter((self._time(r) for r in self.records),
+                                     dtype=np.float64, count=len(self.records))
+        return len(fresh)
+
+    def trim(self, cutoff):
+        """Descarta os registros anteriores a 'cutoff'; retorna quantos saíram."""
+        if self.start is None or cutoff <= self.start:
+            return 0
+        lo = int(np.searchsorted(self.times, cutoff, side="left"))
+        self.tickets.difference_update(r.ticket for r in self.records[:lo])
+        del self.records[:lo]
+        self.times = self.times[lo:]
+        self.start = cutoff
+        return lo
+
+    def between(self, start, end):
+        lo = int(np.searchsorted(self.times, start, side="left"))
+        hi = int(np.searchsorted(self.times, end, side="right"))
+        return self.records[lo:hi]
+
+
+class HistoryService:
+    """
+    Cache do histórico de deals e ordens compartilhado pelas consultas do ciclo.
+
+    Args:
+        max_age_seconds (float): Idade máxima do snapshot antes de buscar o final.
+        prefetch_seconds (float): Alcance mínimo da primeira busca.
+        max_span_seconds (float): Alcance máximo mantido antes do final do
+            snapshot (None = sem limite).
+        clock (callable): Relógio do robô (idade do snapshot).
+    """
+
+    def __init__(self, max_age_seconds=5.0, prefetch_seconds=0.0, max_span_seconds=None, clock=bot_clock.time):
+        self.max_age_seconds = max_age_seconds
+        self.prefetch_seconds = prefetch_seconds
+        self.max_span_seconds = max_span_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._snapshots = {DEALS: _Snapshot("time"), ORDERS: _Snapshot("time_done")}
+        self._refreshed_at = {DEALS: None, ORDERS: None}
+        self._memo = {}
+        self.version = 0
+        self.requests = 0  # Chamadas feitas ao terminal (diagnóstico)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_age_seconds=config.get('history_cache_seconds', 5),
+            prefetch_seconds=config.get('history_prefetch_minutes', 120) * 60,
+            max_span_seconds=config.get('history_max_span_minutes', 1440) * 60,
+        )
+
+    def _fetch(self, kind, start, end):
+        # Lido a cada busca: segue o mt5 instalado (terminal real, fake ou gateway)
+        fetch = mt5.history_deals_get if kind == DEALS else mt5.history_orders_get
+        self.requests += 1
+        return fetch(_to_datetime(start), _to_datetime(end))
+
+    def _ensure(self, kind, start, end):
+        """Garante que o snapshot cobre [start, end]. Retorna False se o terminal falhou."""
+        snapshot = self._snapshots[kind]
+        now = self._clock()
+
+        if snapshot.start is None:
+            start = min(start, end - self.prefetch_seconds)
+            records = self._fetch(kind, start, end)
+            if records is None:
+                return False
+            snapshot.start, snapshot.end = start, end
+            snapshot.merge(records)
+            self._refreshed_at[kind] = now
+            self.version += 1
+            return True
+
+        if start < snapshot.start:
+            # Amplia o início: só o trecho que falta
+            records = self._fetch(kind, start, snapshot.start)
+            if records is None:
+                return False
+            snapshot.start = start
+            if snapshot.merge(records):
+                self.version += 1
+
+        stale = now - self._refreshed_at[kind] > self.max_age_seconds
+        if end > snapshot.end and stale:
+            # Atualiza o final a partir do último registro conhecido
+            tail_start = snapshot.times[-1] if len(snapshot.times) else snapshot.end
+            records = self._fetch(kind, tail_start, end)
+            if records is None:
+                return False
+            snapshot.end = end
+            self._refreshed_at[kind] = now
+            if snapshot.merge(records):
+                self.version += 1
+
+        # Limite de idade: nunca corta a janela pedida agora
+        if self.max_span_seconds is not None:
+            if snapshot.trim(min(snapshot.end - self.max_span_seconds, start)):
+                self.version += 1
+        return True
+
+    def query(self, kind, start, end, predicate=None, key=None):
+        """
+        Registros de 'kind' (DEALS/ORDERS) com start <= tempo <= end.
+
+        Args:
+            predicate (callable): Filtro opcional aplicado aos registros.
+            key: Identifica o filtro na memorização (sem key, não memoriza).
+
+        Returns:
+            list | None: None se o terminal não respondeu.
+        """
+        start, end = _to_ts(start), _to_ts(end)
+        with self._lock:
+            if not self._ensure(kind, start, end):
+                return None
+            snapshot = self._snapshots[kind]
+            end = min(end, snapshot.end)
+            memo_key = (kind, start, end, key)
+            if key is not None:
+                cached = self._memo.get(memo_key)
+                if cached is not None and cached[0] == self.version:
+                    return cached[1]
+            records = snapshot.between(start, end)
+            if predicate is not None:
+                records = [r for r in records if predicate(r)]
+            if key is not None:
+                if len(self._memo) > 256:
+                    self._memo.clear()
+                self._memo[memo_key] = (self.version, records)
+            return records
+
+    def deals(self, start, end, predicate=None, key=None):
+        return self.query(DEALS, start, end, predicate, key)
+
+    def orders(self, start, end, predicate=None, key=None):
+        return self.query(ORDERS, start, end, predicate, key)
+
+
+# Instância compartilhada pelas funções de mt5_history neste processo
+_service = None
+
+
+def get_service(config):
+    global _service
+    if _service is None:
+        _service = HistoryService.from_config(config)
+    return _service
+
+
+def reset_service():
+    global _service
+    _service = None
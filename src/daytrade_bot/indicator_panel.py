@@ -0,0 +1,255 @@
+# indicator_panel.py
+"""
+-----------------------------------------------------------------------------
+ PAINEL DE INDICADORES MULTI-SÍMBOLO
+
+ add_indicators (pandas_aux) roda pandas-ta em um DataFrame por símbolo e
+ timeframe: com 20 símbolos são 20+ chamadas por ciclo, cada uma com seu
+ custo fixo de pandas. Aqui as barras de todos os símbolos são alinhadas em
+ matrizes NumPy (tempo x símbolo) e EMA, ADX e as classificações de
+ tendência saem de uma única passada para todas as colunas:
+
+   - operações elemento a elemento (true range, movimento direcional, DX,
+     sinais) são feitas na matriz inteira;
+   - as recursões (EMA, suavização de Wilder) andam no tempo com um passo
+     vetorizado sobre os símbolos, então o laço Python tem T iterações,
+     não T x S. Acrescentar símbolos só alarga a linha do passo.
+
+ Os valores seguem a mesma definição de pandas-ta usada em add_indicators
+ (EMA semeada pela SMA, +DI/-DI com a suavização de Wilder do TA-Lib, ADX
+ como RMA do DX), e as colunas geradas por add_panel_indicators têm os mesmos
+ nomes (EMA_n, ADX_n, trend_signal, trend_strength).
+
+ Barras ausentes de um símbolo em um tempo da grade comum viram uma barra
+ parada no último fechamento (open = high = low = close anterior).
+-----------------------------------------------------------------------------
+"""
+import numpy as np
+import pandas as pd
+import MetaTrader5 as mt5
+
+FIELDS = ("open", "high", "low", "close")
+
+_EPSILON = np.finfo(float).eps  # Mesmo epsilon de pandas-ta (non_zero_range / zero)
+
+
+def align_bars(bars_by_symbol):
+    """
+    Alinha as barras de cada símbolo numa grade de tempo comum.
+
+    Args:
+        bars_by_symbol (dict): {símbolo: barras com time/open/high/low/close}
+            (array do copy_rates_* ou DataFrame).
+
+    Returns:
+        tuple: (times (T,), símbolos, {campo: matriz (T, S)}). Antes da
+        primeira barra de um símbolo, a coluna fica NaN.
+    """
+    symbols = list(bars_by_symbol)
+    columns = [
+        {name: np.asarray(bars[name], dtype=np.float64) for name in ("time",) + FIELDS}
+        for bars in bars_by_symbol.values()
+    ]
+    if not columns:
+        return np.empty(0), symbols, {name: np.empty((0, 0)) for name in FIELDS}
+    times = np.unique(np.concatenate([c["time"] for c in columns]))
+
+    panel = {name: np.full((len(times), len(symbols)), np.nan) for name in FIELDS}
+    present = np.zeros((len(times), len(symbols)), dtype=bool)
+    for j, c in enumerate(columns):
+        rows = np.searchsorted(times, c["time"])
+        present[rows, j] = True
+        for name in FIELDS:
+            panel[name][rows, j] = c[name]
+
+    # Buracos: barra parada no último fechamento
+    close = pd.DataFrame(panel["close"]).ffill().to_numpy()
+    gaps = ~present & ~np.isnan(close)
+    for name in FIELDS:
+        panel[name][gaps] = close[gaps]
+    return times, symbols, panel
+
+
+def _first_valid(values):
+    """Primeira linha finita de cada coluna (len(values) se não houver)."""
+    finite = np.isfinite(values)
+    return np.where(finite.any(axis=0), finite.argmax(axis=0), len(values))
+
+
+def _seeded_recursion(values, seed_row, seed, step):
+    """
+    Recursão no tempo para todas as colunas: out[seed_row] = seed e, depois,
+    out[t] = step(out[t-1], values[t]). Antes da semente, NaN; entrada NaN
+    repete o valor anterior.
+    """
+    out = np.full(values.shape, np.nan)
+    if values.size == 0:
+        return out
+    prev = np.full(values.shape[1], np.nan)
+    for t in range(int(seed_row.min()), len(values)):
+        stepped = step(prev, values[t])
+        stepped = np.where(np.isnan(values[t]), prev, stepped)
+        prev = np.where(seed_row == t, seed, np.where(seed_row < t, stepped, np.nan))
+        out[t] = prev
+    return out
+
+
+def _window_mean(values, first, length, nan_sum=False):
+    """Média (ou soma) de values[first:first+length] por coluna."""
+    rows = first[:, None] + np.arange(length)[None, :]
+    valid = rows < len(values)
+    picked = values[np.minimum(rows, len(values) - 1), np.arange(values.shape[1])[:, None]]
+    picked = np.where(valid, picked, np.nan)
+    with np.errstate(invalid="ignore"):
+        return np.nansum(picked, axis=1) if nan_sum else np.nanmean(picked, axis=1)
+
+
+def ema_panel(values, length):
+    """EMA de cada coluna, semeada pela SMA dos primeiros 'length' valores (pandas-ta)."""
+    alpha = 2.0 / (length + 1)
+    first = _first_valid(values)
+    seed_row = np.where(first + length <= len(values), first + length - 1, len(values))
+    seed = _window_mean(values, first, length)
+    return _seeded_recursion(values, seed_row, seed, lambda prev, x: prev + alpha * (x - prev))
+
+
+def rma_panel(values, length):
+    """Média de Wilder (RMA) de cada coluna, semeada pela SMA (pandas-ta)."""
+    alpha = 1.0 / length
+    first = _first_valid(values)
+    seed_row = np.where(first + length <= len(values), first + length - 1, len(values))
+    seed = _window_mean(values, first, length)
+    return _seeded_recursion(values, seed_row, seed, lambda prev, x: prev + alpha * (x - prev))
+
+
+def wilder_smooth_panel(values, length):
+    """Suavização cumulativa de Wilder (TA-Lib): semente = soma de length-1 valores."""
+    start = np.maximum(_first_valid(values), 1)
+    seed_row = np.where(start + length - 1 <= len(values), start + length - 2, len(values))
+    seed = _window_mean(values, start, length - 1, nan_sum=True)
+    return _seeded_recursion(values, seed_row, seed, lambda prev, x: prev - prev / length + x)
+
+
+def adx_panel(high, low, close, length):
+    """ADX (Wilder) de cada coluna."""
+    nan_row = np.full((1, high.shape[1]), np.nan)
+    prev_high = np.vstack([nan_row, high[:-1]])
+    prev_low = np.vstack([nan_row, low[:-1]])
+    prev_close = np.vstack([nan_row, close[:-1]])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        up = high - prev_high
+        dn = prev_low - low
+        undefined = np.isnan(up) | np.isnan(dn)
+        pos = np.where(undefined, np.nan, np.where((up > dn) & (up > 0), up, 0.0))
+        neg = np.where(undefined, np.nan, np.where((dn > up) & (dn > 0), dn, 0.0))
+        pos[np.abs(pos) < _EPSILON] = 0.0
+        neg[np.abs(neg) < _EPSILON] = 0.0
+
+        high_low = high - low
+        high_low[high_low == 0] = _EPSILON
+        tr = np.maximum(np.abs(high_low), np.maximum(np.abs(high - prev_close), np.abs(prev_close - low)))
+
+        tr_s = wilder_smooth_panel(tr, length)
+        dmp = 100.0 * wilder_smooth_panel(pos, length) / tr_s
+        dmn = 100.0 * wilder_smooth_panel(neg, length) / tr_s
+        # A linha da semente não é reportada (lookback do PLUS_DI/MINUS_DI)
+        seed = _first_valid(tr_s)
+        has_seed = seed < len(tr_s)
+        dmp[seed[has_seed], np.flatnonzero(has_seed)] = np.nan
+        dmn[seed[has_seed], np.flatnonzero(has_seed)] = np.nan
+
+        dx = 100.0 * np.abs(dmp - dmn) / (dmp + dmn)
+    return rma_panel(dx, length)
+
+
+def classify_trend_strength(adx):
+    """Mesma classificação de add_indicators, vetorizada."""
+    return np.select(
+        [np.isnan(adx), adx > 25, adx < 20],
+        ["UNKNOWN", "STRONG", "WEAK"],
+        default="SIDEWAYS",
+    )
+
+
+def compute_panel(bars_by_symbol, ema_period=20, adx_period=14):
+    """
+    Alinha as barras e calcula EMA, ADX e classificações de todos os símbolos.
+
+    Returns:
+        dict: times, symbols, close, ema, adx (matrizes T x S), trend_signal
+        e trend_strength (matrizes de str).
+    """
+    times, symbols, panel = align_bars(bars_by_symbol)
+    close = panel["close"]
+    ema = ema_panel(close, ema_period)
+    adx = adx_panel(panel["high"], panel["low"], close, adx_period)
+    with np.errstate(invalid="ignore"):
+        trend_signal = np.where(close > ema, "UP", "DOWN")
+    return {
+        "times": times,
+        "symbols": symbols,
+        "close": close,
+        "ema": ema,
+        "adx": adx,
+        "trend_signal": trend_signal,
+        "trend_strength": classify_trend_strength(adx),
+        "ema_period": ema_period,
+        "adx_period": adx_period,
+    }
+
+
+def panel_signals(panel):
+    """
+    Sinal mais recente de cada símbolo:
+        {símbolo: {time, close, EMA_n, ADX_n, trend_signal, trend_strength}}
+    """
+    signals = {}
+    for j, symbol in enumerate(panel["symbols"]):
+        if len(panel["times"]) == 0:
+            continue
+        signals[symbol] = {
+            "time": int(panel["times"][-1]),
+            "close": float(panel["close"][-1, j]),
+            f"EMA_{panel['ema_period']}": float(panel["ema"][-1, j]),
+            f"ADX_{panel['adx_period']}": float(panel["adx"][-1, j]),
+            "trend_signal": str(panel["trend_signal"][-1, j]),
+            "trend_strength": str(panel["trend_strength"][-1, j]),
+        }
+    return signals
+
+
+def add_panel_indicators(frames, config):
+    """
+    Modo painel de add_indicators: recebe {símbolo: DataFrame} e grava em cada
+    DataFrame as mesmas colunas (EMA_n, ADX_n, trend_signal, trend_strength),
+    calculadas numa única passada.
+
+    Returns:
+        dict | None: panel_signals do painel, ou None se os indicadores
+        estiverem desativados.
+    """
+    if not config.get('indicators_ema_adx_active', False):
+        return None
+
+    ema_period = config.get("ema_period", 20)
+    adx_period = config.get("adx_period", 14)
+    panel = compute_panel(frames, ema_period, adx_period)
+
+    for j, (symbol, df) in enumerate(frames.items()):
+        rows = np.searchsorted(panel["times"], df["time"].to_numpy(dtype=np.float64))
+        df[f"EMA_{ema_period}"] = panel["ema"][rows, j]
+        df[f"ADX_{adx_period}"] = panel["adx"][rows, j]
+        df["trend_signal"] = panel["trend_signal"][rows, j]
+        df["trend_strength"] = panel["trend_strength"][rows, j]
+    return panel_signals(panel)
+
+
+def fetch_panel_bars(symbols, timeframe, start_time, end_time):
+    """Barras de cada símbolo no intervalo (copy_rates_range); símbolos sem dados ficam de fora."""
+    bars = {}
+    for symbol in symbols:
+        rates = mt5.copy_rates_range(symbol, timeframe, start_time, end_time)
+        if rates is not None and len(rates) > 0:
+            bars[symbol] = rates
+    return bars
@@ -1,8 +1,8 @@
 import MetaTrader5 as mt5
-import time
-import datetime
 import logging
-from .config_loader import load_json_config
+from types import SimpleNamespace
+from . import clock
+from .bot_config import BotConfig, ConfigWatcher
 from .logger_config import setup_logger
 from .manager_margin import manager_positions
 from .excel_writer import salvar_em_excel, gerar_nome_excel
@@ -12,16 +12,28 @@ from .service_position import check_positions_condition
 from .service_add_sells import new_sell_trades
 from .pandas_aux import add_indicators
 from .account_alert_manager import check_equity_and_alert
+from .tick_recorder import TickRecorder
+from .pnl_ledger import PnlLedger
+from . import market_feed
+from . import mt5_gateway
+from .threshold_manager import ThresholdManager, enforce_order_thresholds
+from .position_timer import PositionExpiryIndex, check_and_close_positions_by_time
+from .cycle_profiler import CycleProfiler, run_cycle
+from .cycle_budget import CycleBudget, admit, pending, ENTRY, REPORTING
+from .position_events import PositionTracker, journal_events
+from .hedge_manager import check_and_manage_hedge, HedgeStopWatcher
+from .risk_simulator import RiskSimulator, risk_metrics
+from .order_ladder import OrderLadder
 
 def carregar_config(base_name: str):
     """
-    Carrega configurações a partir da pasta /config usando o loader.
+    Carrega e valida as configurações a partir da pasta /config (BotConfig).
     Procura primeiro:
       config/<base_name>.local.json
     e se não existir, usa:
       config/<base_name>.sample.json
     """
-    return load_json_config(base_name)
+    return BotConfig.load(base_name)
 
 
 def load_config_and_logger(type_order):
@@ -48,39 +60,93 @@ def init_mt5_connection(account, logger, mt5_path, symbol):
     return True
 
 def should_save_excel(ultima_gravacao, intervalo):
-    return (time.time() - ultima_gravacao) >= intervalo
+    return (clock.time() - ultima_gravacao) >= intervalo
 
 def should_check_margin(ultima_verificacao, intervalo):
-    return (time.time() - ultima_verificacao) >= intervalo
+    return (clock.time() - ultima_verificacao) >= intervalo
 
 def should_check_target_down(ultima_verificacao, intervalo):
-    return (time.time() - ultima_verificacao) >= intervalo
+    return (clock.time() - ultima_verificacao) >= intervalo
 
 def should_check_hedge(ultima_verificacao, intervalo):
-    return (time.time() - ultima_verificacao) >= intervalo
+    return (clock.time() - ultima_verificacao) >= intervalo
 
 def should_check_drawdown(ultima_verificacao, intervalo): # <-- ADICIONAR ESTA FUNÇÃO
-    return (time.time() - ultima_verificacao) >= intervalo
+    return (clock.time() - ultima_verificacao) >= intervalo
 
 def process_positions(config, type_order_mt5, logger, symbol,
                       ultima_gravacao_excel, ultima_verificacao_margem,
-                      ultima_verificacao_target_down, caminho_excel):
-    """Processa posições abertas e executa ações conforme análise."""
-    positions = get_open_positions_by_type(symbol, config['magic_number'], type_order_mt5)
+                      ultima_verificacao_target_down, caminho_excel, services=None):
+    """
+    Processa posições abertas e executa ações conforme análise.
+    'services' guarda os componentes com estado criados em build_services().
+    """
+    services = services or {}
+
+    # Orçamento de tempo do ciclo: tarefas ENTRY/REPORTING são adiadas quando ele acaba
+    budget = services.get('cycle_budget')
+    if budget is not None:
+        budget.start()
+        try:
+            return _process_positions(config, type_order_mt5, logger, symbol, ultima_gravacao_excel,
+                                      ultima_verificacao_margem, ultima_verificacao_target_down,
+                                      caminho_excel, services, budget)
+        finally:
+            budget.finish()
+    return _process_positions(config, type_order_mt5, logger, symbol, ultima_gravacao_excel,
+                              ultima_verificacao_margem, ultima_verificacao_target_down, caminho_excel, services)
+
+def _process_positions(config, type_order_mt5, logger, symbol,
+                       ultima_gravacao_excel, ultima_verificacao_margem,
+                       ultima_verificacao_target_down, caminho_excel, services, budget=None):
+    # Um único snapshot do livro por ciclo; os assinantes recebem só o que mudou
+    tracker = services.get('position_tracker')
+    if tracker is not None:
+        # None (falha de leitura) mantém o snapshot anterior em vez de "fechar" tudo
+        tracker.update(market_feed.positions_get(symbol))
+        positions = [p for p in tracker.positions() if p.magic == config['magic_number'] and p.type == type_order_mt5]
+    else:
+        positions = get_open_positions_by_type(symbol, config['magic_number'], type_order_mt5)
     
-    df = get_historical_by_hours(config, logger, 'timeframe')
+    # Sem histórico/indicadores (adiados pelo orçamento), o ciclo não abre entradas
+    entries_shed = not admit(budget, 'history_indicators', ENTRY)
+    df = None if entries_shed else get_historical_by_hours(config, logger, 'timeframe')
     
     is_trend_signal_up = True
     
     if df is None or df.empty:
-        logger.error("Erro ao carregar os dados históricos ou DataFrame vazio.")
+        if not entries_shed:
+            logger.error("Erro ao carregar os dados históricos ou DataFrame vazio.")
     else:
         add_indicators(df, config)
         is_trend_signal_up = df.loc[len(df) -1].trend_signal == 'UP'
         logger.info(f"Sinal para trend é: {df.loc[len(df) -1].trend_signal}, {is_trend_signal_up} == UP")
 
+    # Limites de quantidade de ordens por lado (cooldowns persistidos)
+    entries_blocked = False
+    threshold_manager = services.get('threshold_manager')
+    if threshold_manager:
+        side = 'buy' if type_order_mt5 == mt5.ORDER_TYPE_BUY else 'sell'
+        entries_blocked = enforce_order_thresholds(threshold_manager, side, positions, config, logger)
+        if entries_blocked:
+            logger.info(f"[THRESHOLD] Novas entradas {side.upper()} bloqueadas por cooldown.")
+
+    # Escada de pendentes nos próximos níveis do grid; o poll só cuida da
+    # primeira entrada e de níveis que o preço já ultrapassou
+    ladder = services.get('order_ladder')
+    poll_entries = not entries_shed
+    if ladder is not None:
+        # Sem posições ou com as entradas adiadas, nenhuma pendente pode ficar armada
+        if entries_shed or not positions or not admit(budget, 'order_ladder', ENTRY):
+            ladder.cancel_all(logger)
+        else:
+            tick = market_feed.symbol_info_tick(symbol)
+            if tick:
+                poll_entries = ladder.sync(positions, tick, is_trend_signal_up and not entries_blocked, logger)
+
     # Condição de abertura de novas ordens
-    if should_check_target_down(ultima_verificacao_target_down, config["target_down_interval_seconds"]):
+    if poll_entries and should_check_target_down(ultima_verificacao_target_down, config["target_down_interval_seconds"]) \
+            and admit(budget, 'new_entries', ENTRY):
         is_true_check_positions, _ = check_positions_condition(
             positions,
             type_order_mt5,
@@ -91,9 +157,9 @@ def process_positions(config, type_order_mt5, logger, symbol,
             config["target_down_interval_seconds"]
         )
 
-        ultima_verificacao_target_down = time.time()
+        ultima_verificacao_target_down = clock.time()
         
-        if is_true_check_positions and is_trend_signal_up:
+        if is_true_check_positions and is_trend_signal_up and not entries_blocked:
             logger.info(f"Condição atendida → Abrindo nova ordem {type_order_mt5}")
             open_new_order(symbol, type_order_mt5, config, logger, positions)
     
@@ -108,21 +174,46 @@ def process_positions(config, type_order_mt5, logger, symbol,
             f"Margem Livre: {analise['margin_free_perc']:.2%}"
         )
 
-        # Salvar Excel
-        if config['export_to_excel'] and should_save_excel(ultima_gravacao_excel, config['excel_save_interval_seconds']):
-            logger.info(f"Salvando dados no arquivo Excel: {caminho_excel}")
-            salvar_em_excel(analise, caminho_excel)
-            ultima_gravacao_excel = time.time()
+        # Risco simulado (thread em segundo plano): entrega o livro do ciclo e publica o último resultado
+        risk_simulator = services.get('risk_simulator')
+        if risk_simulator is not None and admit(budget, 'risk_simulator', REPORTING):
+            if risk_simulator.contract_size is None:
+                symbol_info = mt5.symbol_info(symbol)
+                risk_simulator.contract_size = symbol_info.trade_contract_size if symbol_info else None
+            risk_simulator.update(
+                tracker.positions() if tracker else positions,
+                SimpleNamespace(equity=analise['equity'], margin=analise['equity'] - analise['margin_free']),
+                analise['current_price'],
+                df['close'].to_numpy() if df is not None and not df.empty else None,
+            )
+            analise.update(risk_metrics(risk_simulator.latest()))
+
+        # Fechamento por tempo de vida (só posições que venceram)
+        # (com o tracker, o índice já foi atualizado pelos eventos do ciclo)
+        expiry_index = services.get('expiry_index')
+        if expiry_index is not None:
+            check_and_close_positions_by_time(None if tracker else positions, config, logger, index=expiry_index)
 
-        # Gerenciar margem
+        # Hedge defensivo (imediato quando o SELL STOP pré-armado foi executado
+        # ou quando os BUYs mudaram e o SELL STOP precisa ser reprecificado)
+        hedge_stop_watcher = services.get('hedge_stop_watcher')
+        hedge_due = hedge_stop_watcher is not None and hedge_stop_watcher.pop_due()
+        if config.get('hedge_manager_enabled', False) and (hedge_due or should_check_hedge(
+                services.get('hedge_last_check', 0), config.get('hedge_check_interval_seconds', 180))):
+            check_and_manage_hedge(config, logger, symbol, tracker=tracker)
+            services['hedge_last_check'] = clock.time()
+
+        # Gerenciar margem (antes do Excel e dos alertas: não espera por eles)
+        alert_due = False
         if should_check_margin(ultima_verificacao_margem, config['manager_margin_interval_seconds']):
 
-            is_trend_signal = df.loc[len(df) -1].trend_signal == 'DOWN'
-            logger.info(f"Sinal para trend é: {df.loc[len(df) -1].trend_signal}, {is_trend_signal} == DOWN")
+            if not entries_shed and df is not None and not df.empty and admit(budget, 'dynamic_mf_sells', ENTRY):
+                is_trend_signal = df.loc[len(df) -1].trend_signal == 'DOWN'
+                logger.info(f"Sinal para trend é: {df.loc[len(df) -1].trend_signal}, {is_trend_signal} == DOWN")
 
-            if is_trend_signal:
-                # Adiciona sells para balancer hedge
-                new_sell_trades(analise, config, logger, symbol)
+                if is_trend_signal:
+                    # Adiciona sells para balancer hedge
+                    new_sell_trades(analise, config, logger, symbol)
                        
             handle_low_margin(
                 margin_free_perc=analise['margin_free_perc'],
@@ -130,41 +221,227 @@ def process_positions(config, type_order_mt5, logger, symbol,
                 config=config,
                 logger=logger
             )
-            ultima_verificacao_margem = time.time()
+            ultima_verificacao_margem = clock.time()
+            alert_due = True
             
-            #Envio de alerta, email
+        #Envio de alerta, email (um alerta adiado pelo orçamento sai no próximo ciclo com folga)
+        if (alert_due or pending(budget, 'equity_alert')) and admit(budget, 'equity_alert', REPORTING):
             check_equity_and_alert(config, logger, analise['equity'])
+
+        # Salvar Excel
+        if config['export_to_excel'] and should_save_excel(ultima_gravacao_excel, config['excel_save_interval_seconds']) \
+                and admit(budget, 'excel', REPORTING):
+            logger.info(f"Salvando dados no arquivo Excel: {caminho_excel}")
+            salvar_em_excel(analise, caminho_excel)
+            ultima_gravacao_excel = clock.time()
             
     return ultima_gravacao_excel, ultima_verificacao_margem, ultima_verificacao_target_down, positions
 
+def robot_order_type(config):
+    return mt5.ORDER_TYPE_SELL if str(config.get('type_order', 'BUY')).upper() == 'SELL' else mt5.ORDER_TYPE_BUY
+
+def robot_position_filter(config):
+    """Filtro das posições do robô (None = todas, quando 'all_positions')."""
+    if config.get('all_positions', False):
+        return None
+    magic = config['magic_number']
+    order_type = robot_order_type(config)
+    return lambda p: p.magic == magic and p.type == order_type
+
+def build_services(config, logger, only=None, current=None):
+    """
+    Cria os componentes com estado usados por process_positions a cada ciclo.
+
+    Com 'only', cria apenas esses serviços (hot reload): nenhum outro é
+    instanciado, então threads como a do risk_simulator só sobem quando ele
+    for de fato recriado. Os assinantes usam o position_tracker de 'current'
+    quando o tracker não está em 'only'.
+    """
+    services = {}
+
+    def wanted(name):
+        return only is None or name in only
+
+    if wanted('position_tracker'):
+        tracker = PositionTracker()
+        tracker.subscribe(journal_events(logger))
+        services['position_tracker'] = tracker
+    else:
+        tracker = (current or {}).get('position_tracker')
+
+    if (wanted('hedge_stop_watcher') and config.get('hedge_manager_enabled', False)
+            and config.get('hedge_trigger_prearm', False)):
+        hedge_stop_watcher = HedgeStopWatcher()
+        hedge_stop_watcher.subscribe(tracker, config)
+        services['hedge_stop_watcher'] = hedge_stop_watcher
+
+    if wanted('threshold_manager') and config.get('order_thresholds_enabled', False):
+        threshold_manager = ThresholdManager.from_config(config)
+        try:
+            threshold_manager.load_state()
+        except Exception as e:
+            logger.warning(f"[THRESHOLD] Não foi possível carregar os cooldowns salvos: {e}")
+        services['threshold_manager'] = threshold_manager
+
+    if wanted('expiry_index') and config.get('close_positions_by_time_enabled', False):
+        expiry_index = PositionExpiryIndex(config['max_position_duration_minutes'])
+        tracker.subscribe(expiry_index.on_position_event, predicate=robot_position_filter(config))
+        services['expiry_index'] = expiry_index
+
+    if wanted('order_ladder') and config.get('ladder_enabled', False):
+        ladder = OrderLadder.from_config(config, robot_order_type(config), logger)
+        if ladder is None:
+            logger.warning("[LADDER] target_up/target_down não configurados. Escada de pendentes desativada.")
+        else:
+            services['order_ladder'] = ladder
+
+    if wanted('risk_simulator') and config.get('risk_sim_enabled', False):
+        risk_simulator = RiskSimulator.from_config(config, logger)
+        risk_simulator.start()
+        services['risk_simulator'] = risk_simulator
+
+    if wanted('cycle_budget') and config.get('cycle_budget_enabled', False):
+        services['cycle_budget'] = CycleBudget.from_config(config, logger)
+
+    # Perfil dos ciclos (config 'profiler_enabled' ou variável DAYTRADE_PROFILE=1)
+    profiler = CycleProfiler.from_config(config, logger) if wanted('cycle_profiler') else None
+    if profiler:
+        services['cycle_profiler'] = profiler
+
+    return services
+
+# Campos de config que exigem recriar cada serviço quando mudam no hot reload
+SERVICE_FIELDS = {
+    'threshold_manager': ('order_thresholds_enabled', 'order_thresholds', 'threshold_state_file'),
+    'expiry_index': ('close_positions_by_time_enabled', 'max_position_duration_minutes', 'all_positions'),
+    'hedge_stop_watcher': ('hedge_manager_enabled', 'hedge_trigger_prearm', 'magic_number', 'hedge_magic_number'),
+    # Os assinantes ficam registrados no tracker: recriado junto com eles
+    'position_tracker': (
+        'close_positions_by_time_enabled', 'max_position_duration_minutes', 'all_positions',
+        'hedge_manager_enabled', 'hedge_trigger_prearm', 'magic_number', 'hedge_magic_number',
+    ),
+    'order_ladder': (
+        'ladder_enabled', 'ladder_reprice_tolerance_points', 'volume', 'stop_points', 'profit_points',
+        'target_up_dollars', 'target_down_dollars', 'target_up_pts', 'target_down_pts',
+        'target_down_interval_seconds',
+    ),
+    'risk_simulator': (
+        'risk_sim_enabled', 'risk_sim_interval_seconds', 'risk_sim_paths', 'risk_sim_batch_size',
+        'risk_sim_workers', 'risk_sim_horizon_minutes', 'risk_sim_steps_per_bar', 'risk_sim_seed',
+        'risk_sim_stop_out_level', 'floating_dd_stop_threshold', 'hedge_trigger_profit_buy', 'margin_free_perc',
+    ),
+    'cycle_budget': (
+        'cycle_budget_enabled', 'cycle_budget_seconds', 'cycle_budget_entry_share',
+        'cycle_budget_reporting_share', 'cycle_budget_max_defer_cycles',
+    ),
+    'cycle_profiler': (
+        'profiler_enabled', 'profiler_folder', 'profiler_every_n_cycles', 'profiler_slow_cycle_ms',
+        'profiler_sample_interval_ms', 'profiler_top_n', 'profiler_max_files',
+    ),
+}
+
+# Serviços que assinam eventos do position_tracker
+TRACKER_SUBSCRIBERS = ('expiry_index', 'hedge_stop_watcher')
+
+def refresh_services(services, old_config, new_config, logger):
+    """
+    Aplica uma config recarregada aos serviços: só os afetados pelos campos
+    alterados são recriados; os demais (e seus caches) são mantidos.
+    """
+    changed = set(old_config.changed_fields(new_config))
+    stale = [name for name, fields in SERVICE_FIELDS.items() if changed.intersection(fields)]
+    if not stale:
+        return services
+    # Tracker novo: os assinantes mantidos ficariam presos ao antigo (surdos)
+    if 'position_tracker' in stale:
+        stale += [name for name in TRACKER_SUBSCRIBERS if name not in stale]
+
+    # Cooldowns ativos sobrevivem à troca pelo state_file
+    threshold_manager = services.get('threshold_manager')
+    if 'threshold_manager' in stale and threshold_manager:
+        threshold_manager.save_state()
+
+    for name in stale:
+        # Serviços com thread própria (ex.: risk_simulator) são parados antes da troca
+        if hasattr(services.get(name), 'stop'):
+            services[name].stop()
+
+    refreshed = {name: service for name, service in services.items() if name not in stale}
+    refreshed.update(build_services(new_config, logger, only=stale, current=refreshed))
+    logger.info(f"[CONFIG] Serviços recriados: {', '.join(stale)}")
+    return refreshed
+
+def seconds_until_next_cycle(config, services):
+    """Intervalo normal do loop, encurtado se alguma posição expira antes disso."""
+    sleep_seconds = config['check_interval_seconds']
+    expiry_index = services.get('expiry_index')
+    if expiry_index is not None:
+        wait = expiry_index.seconds_until_next_expiry()
+        if wait is not None:
+            sleep_seconds = min(sleep_seconds, max(wait, 1))
+    return sleep_seconds
+
 def main(type_order="BUY"):
     config, logger = load_config_and_logger(type_order)
     if not config or not logger:
         return
 
-    # Presumindo que você adicione 'shutdown_hour' ao seu config. 
-    # Usamos .get() para ter um valor padrão (ex: 99) caso não esteja definido.
-    # Coloque 99 (ou qualquer hora "impossível") para nunca desligar por padrão.
-    shutdown_hour = config.get('shutdown_hour', 99)
-
     env = "demo"
     # env = "real"
     account = carregar_conta(type_order, env)
     # account = carregar_conta(type_order, "real")
+    run_bot(type_order, config, logger, account, env)
+
+def run_bot(type_order, config, logger, account, env="demo"):
+    """
+    Loop principal do robô, com config, logger e conta já carregados
+    (main() os lê de /config; os cenários de benchmark passam os seus).
+    """
+    # Presumindo que você adicione 'shutdown_hour' ao seu config. 
+    # Usamos .get() para ter um valor padrão (ex: 99) caso não esteja definido.
+    # Coloque 99 (ou qualquer hora "impossível") para nunca desligar por padrão.
+    shutdown_hour = config.get('shutdown_hour', 99)
     symbol = config['symbol']
 
+    # Gravação de todas as chamadas ao MT5 para replay offline (opcional)
+    mt5_recorder = None
+    if config.get('mt5_record_enabled', False):
+        mt5_recorder = mt5_gateway.install(mt5_gateway.from_config(config, type_order, target=mt5))
+        logger.info(f"Gravando chamadas do MT5 em {mt5_recorder.path}")
+
     if not init_mt5_connection(account, logger, config['mt5_path'], symbol):
+        if mt5_recorder:
+            mt5_recorder.close()
         return
 
+    # Lê tick/conta/posições do feeder compartilhado, se houver um rodando
+    market_feed.connect_reader(config, logger)
+
     caminho_excel = gerar_nome_excel(symbol, config['export_folder'], type_order, env)
     
     ultima_gravacao_excel = ultima_verificacao_margem = ultima_verificacao_target_down = 0
+
+    services = build_services(config, logger)
+
+    # Gravação binária dos ticks vistos pelo robô (opcional)
+    tick_recorder = TickRecorder.from_config(config, logger) if config.get('tick_recorder_enabled', False) else None
+
+    # Livro local de deals com o resultado agregado por dia/magic/lado/tag (opcional)
+    pnl_ledger = PnlLedger.from_config(config, logger) if config.get('pnl_ledger_enabled', False) else None
+
+    # Hot reload: o arquivo de config é verificado por mtime e trocado entre ciclos
+    config_watcher = None
+    if config.get('config_reload_enabled', False):
+        config_watcher = ConfigWatcher(
+            f"config_{type_order.lower()}", config, logger,
+            interval_seconds=config.get('config_reload_interval_seconds', 5),
+        )
     
     try:
         while True:
             # --- INÍCIO DA MODIFICAÇÃO ---
             # Pega a hora atual
-            current_hour = datetime.datetime.now().hour
+            current_hour = clock.now().hour
             
             # Verifica se a hora atual atingiu ou passou da hora de desligar
             if current_hour >= shutdown_hour:
@@ -172,20 +449,32 @@ def main(type_order="BUY"):
                 break  # Sai do loop 'while True'
             # --- FIM DA MODIFICAÇÃO ---            
             
+            if config_watcher:
+                new_config = config_watcher.poll()
+                if new_config is not None:
+                    services = refresh_services(services, config, new_config, logger)
+                    config = new_config
+
             try:
                 type_order_mt5 = mt5.ORDER_TYPE_BUY if type_order == 'BUY' else mt5.ORDER_TYPE_SELL
 
-                ultima_gravacao_excel, ultima_verificacao_margem, ultima_verificacao_target_down, positions = process_positions(
+                if tick_recorder:
+                    tick_recorder.poll()
+                if pnl_ledger:
+                    pnl_ledger.poll()
+
+                ultima_gravacao_excel, ultima_verificacao_margem, ultima_verificacao_target_down, positions = run_cycle(
+                    services.get('cycle_profiler'), process_positions,
                     config, type_order_mt5, logger, symbol,
                     ultima_gravacao_excel, ultima_verificacao_margem,
-                    ultima_verificacao_target_down, caminho_excel
+                    ultima_verificacao_target_down, caminho_excel, services
                 )
 
             except Exception as e:
                 logger.error(f"Erro ao comunicar com o MT5: {e}", exc_info=True)
                 logger.warning("Conexão perdida. Tentando reconectar em 30s...")
                 mt5.shutdown()
-                time.sleep(30)
+                clock.sleep(30)
 
                 if not mt5.initialize():
                     logger.critical("Falha ao reconectar com o MT5. Encerrando.")
@@ -193,12 +482,24 @@ def main(type_order="BUY"):
                 else:
                     logger.info("Reconexão com sucesso. Retomando monitoramento.")
 
-            time.sleep(config['check_interval_seconds'])
+            clock.sleep(seconds_until_next_cycle(config, services))
 
     except KeyboardInterrupt:
         logger.info("Programa interrompido pelo usuário.")
     finally:
+        if tick_recorder:
+            tick_recorder.close()
+        if pnl_ledger:
+            pnl_ledger.close()
+        if 'risk_simulator' in services:
+            services['risk_simulator'].stop()
+        if 'order_ladder' in services:
+            # Sem o robô, cooldowns e filtros de tendência não seriam respeitados
+            services['order_ladder'].stop()
+        market_feed.disconnect_reader()
         mt5.shutdown()
+        if mt5_recorder:
+            mt5_recorder.close()
         logger.info("Conexão com MT5 encerrada.")
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 #manager_margin
 import MetaTrader5 as mt5
-from datetime import datetime
+from . import clock
 from .mt5_order import get_open_positions_by_type, get_all_open_positions
+from . import market_feed
 
 def manager_positions(config, type_order_mt5):
     """Analisa as posições abertas e retorna um resumo e a lista de posições."""
@@ -31,8 +32,9 @@ def manager_positions(config, type_order_mt5):
             total_sell_volume += p.volume
             
     # ===================== MUDANÇAS AQUI =====================
-    account = mt5.account_info()
-    tick = mt5.symbol_info_tick(config['symbol'])
+    # Servidos pelo feeder em memória compartilhada quando ativo (senão, terminal)
+    account = market_feed.account_info(config['symbol'])
+    tick = market_feed.symbol_info_tick(config['symbol'])
 
     if not account or not tick:
         return None, None # Falha ao obter informações da conta ou do tick
@@ -41,7 +43,7 @@ def manager_positions(config, type_order_mt5):
     perc_mf = round(account.margin_free / account.equity, 4) if account.equity else 0
 
     dados_analise = {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": clock.now().strftime("%Y-%m-%d %H:%M:%S"),
         "total_positions": len(my_positions),
         "buy_positions": buy_count,
         "sell_positions": sell_count,
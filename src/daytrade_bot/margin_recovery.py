@@ -0,0 +1,148 @@
+# margin_recovery.py
+"""
+-----------------------------------------------------------------------------
+ PLANEJADOR DE RECUPERAÇÃO DE MARGEM
+
+ Quando a margem livre cai abaixo de 'margin_free_perc', o robô precisa
+ liberar pelo menos
+
+     necessário = margin_free_perc * equity - margem_livre
+
+ (fechar uma posição não muda o equity, só realiza o P/L e devolve a margem).
+ Em conta hedging, fechar uma perna que está hedgeada pode até aumentar a
+ margem exigida: a margem de cada posição é o quanto a margem do livro do
+ símbolo cai ao fechá-la (nunca negativa).
+ Em vez de fechar uma posição por intervalo, escolhe-se de uma vez o menor
+ conjunto que libera a margem necessária com a menor perda realizada:
+ um knapsack de cobertura resolvido com o guloso por perda/margem mais a
+ melhor posição que cobre sozinha (aproximação clássica com garantia de 2x),
+ tudo vetorizado com numpy.
+-----------------------------------------------------------------------------
+"""
+import numpy as np
+
+_BUY = 0  # mt5.ORDER_TYPE_BUY
+
+
+def hedged_ratio(symbol_info):
+    """
+    Fração da margem cobrada por perna de volume hedgeado (conta hedging):
+    symbol_info.margin_hedged / trade_contract_size. Sem o campo (ou sem
+    contrato), 1.0, ou seja, sem desconto (estimativa conservadora).
+    """
+    margin_hedged = getattr(symbol_info, "margin_hedged", None)
+    contract_size = getattr(symbol_info, "trade_contract_size", 0)
+    if margin_hedged is None or not contract_size:
+        return 1.0
+    return min(max(margin_hedged / contract_size, 0.0), 1.0)
+
+
+def book_margin(buy_volume, sell_volume, unit_margin, ratio=1.0):
+    """
+    Margem de um livro BUY/SELL de um símbolo. O volume que se cruza
+    (min(buy, sell)) paga 'ratio' da margem em cada perna; o resto, cheia.
+    Aceita arrays de volumes (um livro por elemento).
+
+    Args:
+        unit_margin (dict): {tipo: margem de 1 lote}.
+    """
+    hedged = np.minimum(buy_volume, sell_volume)
+    unit_buy, unit_sell = unit_margin.get(0, 0.0), unit_margin.get(1, 0.0)
+    return ((buy_volume - hedged) * unit_buy + (sell_volume - hedged) * unit_sell
+            + hedged * (unit_buy + unit_sell) * ratio)
+
+
+def margin_needed(equity, margin_free, mf_perc_threshold):
+    """Margem que precisa ser liberada para voltar ao limite (<= 0: nada a fazer)."""
+    return mf_perc_threshold * equity - margin_free
+
+
+def position_margins(positions, unit_margin, account_margin=None, book=None, ratio=1.0):
+    """
+    Margem liberada ao fechar cada posição: volume * margem de 1 lote do seu
+    tipo ou, com hedge, a queda da margem do livro do símbolo.
+
+    Args:
+        positions (list): Posições (type, volume).
+        unit_margin (dict): {tipo: margem de 1 lote} (ex.: via order_calc_margin).
+        account_margin (float): Margem total da conta. Se informada, as
+            estimativas são escaladas para somar esse valor (absorve a
+            diferença entre preço atual e de abertura). Só faz sentido quando
+            'positions' é a conta inteira.
+        book (tuple): (volume BUY, volume SELL) de todo o livro do símbolo.
+        ratio (float): hedged_ratio do símbolo (1.0 = sem desconto de hedge).
+
+    Returns:
+        np.ndarray: Margem por posição.
+    """
+    volumes = np.fromiter((p.volume for p in positions), dtype=np.float64, count=len(positions))
+    is_buy = np.fromiter((p.type == _BUY for p in positions), dtype=bool, count=len(positions))
+
+    if book is None or ratio >= 1.0:
+        margins = volumes * np.where(is_buy, unit_margin.get(0, 0.0), unit_margin.get(1, 0.0))
+        total = margins.sum()
+    else:
+        buy_volume, sell_volume = book
+        total = book_margin(buy_volume, sell_volume, unit_margin, ratio)
+        after = np.where(
+            is_buy,
+            book_margin(buy_volume - volumes, sell_volume, unit_margin, ratio),
+            book_margin(buy_volume, sell_volume - volumes, unit_margin, ratio),
+        )
+        margins = np.maximum(total - after, 0.0)
+
+    if account_margin and total > 0:
+        margins *= account_margin / total
+    return margins
+
+
+def select_recovery_set(margins, profits, needed):
+    """
+    Índices do conjunto de posições a fechar. Função Pura.
+
+    Custo de uma posição = perda realizada ao fechá-la (max(0, -lucro)).
+    Posições no lucro custam zero e entram primeiro (as de maior margem
+    antes, para o conjunto ficar pequeno).
+
+    Args:
+        margins (array): Margem liberada por posição.
+        profits (array): Lucro flutuante por posição.
+        needed (float): Margem que precisa ser liberada.
+
+    Returns:
+        np.ndarray | None: Índices escolhidos (vazio se needed <= 0);
+        None se nem fechando tudo a margem seria suficiente.
+    """
+    margins = np.asarray(margins, dtype=np.float64)
+    costs = np.maximum(-np.asarray(profits, dtype=np.float64), 0.0)
+
+    if needed <= 0:
+        return np.empty(0, dtype=np.intp)
+    if margins.sum() < needed:
+        return None
+
+    # Guloso: menor perda por unidade de margem; empate -> maior margem
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(margins > 0, costs / margins, np.inf)
+    order = np.lexsort((-margins, ratio))
+    covered = np.cumsum(margins[order])
+    k = int(np.searchsorted(covered, needed - 1e-9)) + 1
+    greedy = order[:k]
+
+    # Remove redundâncias (mais caras primeiro) enquanto a cobertura se mantém
+    keep = np.ones(k, dtype=bool)
+    slack = covered[k - 1] - needed
+    for i in np.argsort(-costs[greedy], kind="stable"):
+        if margins[greedy[i]] <= slack + 1e-9:
+            keep[i] = False
+            slack -= margins[greedy[i]]
+    greedy = greedy[keep]
+
+    # Melhor posição que cobre sozinha
+    covers = np.flatnonzero(margins >= needed - 1e-9)
+    if covers.size:
+        single = covers[np.argmin(costs[covers])]
+        greedy_cost = costs[greedy].sum()
+        if costs[single] < greedy_cost or (costs[single] == greedy_cost and len(greedy) > 1):
+            return np.array([single], dtype=np.intp)
+    return greedy
@@ -0,0 +1,357 @@
+# market_feed.py
+"""
+Feeder de dados de mercado em memória compartilhada.
+
+Um único processo (o feeder) consulta o terminal e publica o último tick, a
+conta e o livro de posições de um símbolo em multiprocessing.shared_memory.
+Os bots (BUY, SELL, ...) leem esse bloco sem lock, usando um contador de
+versão (seqlock): o escritor deixa o contador ímpar durante a escrita e par
+ao terminar; o leitor copia o bloco e só aceita a cópia se o contador era par
+e não mudou no meio da leitura.
+
+Execute o feeder com:
+  python -m daytrade_bot.market_feed buy
+"""
+import mmap
+import sys
+import time
+from types import SimpleNamespace
+from multiprocessing import shared_memory
+
+import numpy as np
+import MetaTrader5 as mt5
+
+from .mt5_gateway import RecordingMT5, ReplayMT5
+
+TICK_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("time_msc", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("volume", "<u8"),
+    ("flags", "<u4"),
+])
+
+ACCOUNT_DTYPE = np.dtype([
+    ("login", "<i8"),
+    ("leverage", "<i8"),
+    ("balance", "<f8"),
+    ("equity", "<f8"),
+    ("profit", "<f8"),
+    ("margin", "<f8"),
+    ("margin_free", "<f8"),
+    ("margin_level", "<f8"),
+    ("currency", "S8"),
+])
+
+POSITION_DTYPE = np.dtype([
+    ("ticket", "<i8"),
+    ("time", "<i8"),
+    ("time_msc", "<i8"),
+    ("time_update", "<i8"),
+    ("type", "<i4"),
+    ("reason", "<i4"),
+    ("magic", "<i8"),
+    ("identifier", "<i8"),
+    ("volume", "<f8"),
+    ("price_open", "<f8"),
+    ("sl", "<f8"),
+    ("tp", "<f8"),
+    ("price_current", "<f8"),
+    ("swap", "<f8"),
+    ("profit", "<f8"),
+    ("symbol", "S32"),
+    ("comment", "S32"),
+])
+
+_STRING_FIELDS = ("symbol", "comment", "currency")
+
+
+def block_dtype(max_positions):
+    """Layout completo do bloco compartilhado."""
+    return np.dtype([
+        ("seq", "<u8"),
+        ("published_at", "<f8"),
+        ("symbol", "S32"),
+        ("has_tick", "<u1"),
+        ("has_account", "<u1"),
+        ("has_positions", "<u1"),
+        ("n_positions", "<u4"),
+        ("tick", TICK_DTYPE),
+        ("account", ACCOUNT_DTYPE),
+        ("positions", POSITION_DTYPE, (max_positions,)),
+    ])
+
+
+def feed_name(config):
+    return config.get("market_feed_name") or f"dtb_feed_{config['symbol']}"
+
+
+def _record_to_namespace(record):
+    values = {}
+    for name in record.dtype.names:
+        value = record[name]
+        if name in _STRING_FIELDS:
+            value = value.decode("utf-8", "ignore")
+        else:
+            value = value.item()
+        values[name] = value
+    return SimpleNamespace(**values)
+
+
+def _fill_record(target, source, dtype):
+    for name in dtype.names:
+        value = getattr(source, name, 0)
+        if name in _STRING_FIELDS:
+            value = str(value or "").encode("utf-8")[: dtype[name].itemsize]
+        target[name] = value
+
+
+class MarketFeedWriter:
+    """Lado do feeder: cria o bloco e publica snapshots."""
+
+    def __init__(self, name, symbol, max_positions=512):
+        self.symbol = symbol
+        self.max_positions = max_positions
+        self.dtype = block_dtype(max_positions)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.dtype.itemsize)
+        except FileExistsError:
+            # Feeder reiniciado: reaproveita o bloco existente, se tiver o mesmo layout
+            self.shm = shared_memory.SharedMemory(name=name, create=False)
+            if not _size_matches(self.shm.size, self.dtype.itemsize):
+                # Outro max_positions: recria (leitores presos ao bloco antigo
+                # veem o snapshot envelhecer e voltam ao terminal)
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.dtype.itemsize)
+        self.block = np.ndarray((1,), dtype=self.dtype, buffer=self.shm.buf)[0]
+        if int(self.block["seq"]) & 1:
+            # O feeder anterior caiu no meio de uma publicação: volta a paridade
+            # do seqlock (par = consistente) antes de publicar de novo
+            self.block["seq"] += 1
+        self.block["symbol"] = symbol.encode("utf-8")
+
+    def publish(self, tick, account, positions):
+        """Publica um snapshot. Qualquer parte pode ser None (falha na leitura do terminal)."""
+        block = self.block
+        positions = list(positions) if positions is not None else None
+        if positions is not None and len(positions) > self.max_positions:
+            positions = None  # Livro maior que o bloco: leitores voltam ao terminal
+
+        block["seq"] += 1  # ímpar: escrita em andamento
+        try:
+            block["has_tick"] = tick is not None
+            if tick is not None:
+                _fill_record(block["tick"], tick, TICK_DTYPE)
+
+            block["has_account"] = account is not None
+            if account is not None:
+                _fill_record(block["account"], account, ACCOUNT_DTYPE)
+
+            block["has_positions"] = positions is not None
+            if positions is not None:
+                rows = block["positions"]
+                for i, position in enumerate(positions):
+                    _fill_record(rows[i], position, POSITION_DTYPE)
+                block["n_positions"] = len(positions)
+
+            block["published_at"] = time.time()
+        finally:
+            block["seq"] += 1  # par: snapshot consistente
+
+    def close(self, unlink=True):
+        self.block = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class MarketFeedReader:
+    """Lado do bot: lê o último snapshot sem lock (seqlock)."""
+
+    def __init__(self, name, max_positions=512, max_age_seconds=5.0, max_retries=100):
+        self.max_age_seconds = max_age_seconds
+        self.max_retries = max_retries
+        self.dtype = block_dtype(max_positions)
+        self.shm = shared_memory.SharedMemory(name=name, create=False)
+        _untrack(self.shm)
+        if not _size_matches(self.shm.size, self.dtype.itemsize):
+            size = self.shm.size
+            self.shm.close()
+            raise ValueError(
+                f"Bloco '{name}' com {size} bytes não corresponde a market_feed_max_positions={max_positions} "
+                f"({self.dtype.itemsize} bytes)."
+            )
+        self.block = np.ndarray((1,), dtype=self.dtype, buffer=self.shm.buf)[0]
+
+    def snapshot(self):
+        """
+        Retorna uma cópia consistente do bloco, ou None se o feeder estiver
+        parado (snapshot mais velho que max_age_seconds) ou sempre escrevendo.
+        """
+        block = self.block
+        for _ in range(self.max_retries):
+            before = int(block["seq"])
+            if before & 1:
+                continue
+            copy = block.copy()
+            if int(block["seq"]) == before:
+                if before == 0 or time.time() - float(copy["published_at"]) > self.max_age_seconds:
+                    return None
+                return copy
+        return None
+
+    def close(self):
+        self.block = None
+        self.shm.close()
+
+
+def _size_matches(size, expected):
+    """Tamanho do bloco existente compatível com o layout (o SO pode arredondar para a página)."""
+    return expected <= size < expected + mmap.PAGESIZE
+
+
+def _untrack(shm):
+    """
+    Em POSIX o resource_tracker de um processo que só lê o bloco tenta
+    apagá-lo ao sair, derrubando o feeder. Leitores não são donos do bloco.
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+# -----------------------------------------------------------------------------
+#  ACESSO PELOS BOTS (com fallback para o terminal)
+# -----------------------------------------------------------------------------
+
+_reader = None
+_reader_symbol = None
+
+
+def connect_reader(config, logger):
+    """Conecta o bot ao feeder, se habilitado. Sem feeder, tudo segue via terminal."""
+    global _reader, _reader_symbol
+
+    if not config.get("market_feed_enabled", False):
+        return False
+
+    name = feed_name(config)
+    if isinstance(mt5, (RecordingMT5, ReplayMT5)):
+        # Leituras do feeder não passam pelo gateway: o replay divergiria da gravação
+        logger.warning(f"[FEED] Gravação/replay do MT5 ativo. Feeder '{name}' ignorado; usando o terminal.")
+        return False
+
+    try:
+        _reader = MarketFeedReader(
+            name,
+            max_positions=config.get("market_feed_max_positions", 512),
+            max_age_seconds=config.get("market_feed_max_age_seconds", 5.0),
+        )
+        _reader_symbol = config["symbol"]
+        logger.info(f"[FEED] Lendo dados de mercado da memória compartilhada '{name}'.")
+        return True
+    except FileNotFoundError:
+        logger.warning(f"[FEED] Feeder '{name}' não encontrado. Usando o terminal diretamente.")
+        return False
+    except ValueError as e:
+        # Layout diferente do feeder (market_feed_max_positions divergente)
+        logger.error(f"[FEED] {e} Usando o terminal diretamente.")
+        return False
+
+
+def disconnect_reader():
+    global _reader, _reader_symbol
+    if _reader is not None:
+        _reader.close()
+    _reader = None
+    _reader_symbol = None
+
+
+def _snapshot_for(symbol):
+    if _reader is None or symbol != _reader_symbol:
+        return None
+    return _reader.snapshot()
+
+
+def positions_get(symbol):
+    """Equivalente a mt5.positions_get(symbol=...) servido pelo feeder quando disponível."""
+    snap = _snapshot_for(symbol)
+    # Livro maior que o bloco deste leitor (layout menor que o do feeder): nunca truncar
+    if snap is None or not snap["has_positions"] or int(snap["n_positions"]) > len(snap["positions"]):
+        return mt5.positions_get(symbol=symbol)
+    rows = snap["positions"][: int(snap["n_positions"])]
+    return tuple(_record_to_namespace(row) for row in rows)
+
+
+def account_info(symbol):
+    """Equivalente a mt5.account_info() (o feeder publica por símbolo)."""
+    snap = _snapshot_for(symbol)
+    if snap is None or not snap["has_account"]:
+        return mt5.account_info()
+    return _record_to_namespace(snap["account"])
+
+
+def symbol_info_tick(symbol):
+    """Equivalente a mt5.symbol_info_tick(symbol)."""
+    snap = _snapshot_for(symbol)
+    if snap is None or not snap["has_tick"]:
+        return mt5.symbol_info_tick(symbol)
+    return _record_to_namespace(snap["tick"])
+
+
+# -----------------------------------------------------------------------------
+#  PROCESSO FEEDER
+# -----------------------------------------------------------------------------
+
+def run_feeder(config, logger):
+    """Loop do feeder: consulta o terminal uma vez por intervalo e publica."""
+    symbol = config["symbol"]
+    interval = config.get("market_feed_interval_seconds", 0.5)
+    writer = MarketFeedWriter(feed_name(config), symbol, config.get("market_feed_max_positions", 512))
+    logger.info(f"[FEED] Publicando {symbol} em '{feed_name(config)}' a cada {interval}s.")
+
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                writer.publish(
+                    mt5.symbol_info_tick(symbol),
+                    mt5.account_info(),
+                    mt5.positions_get(symbol=symbol),
+                )
+            except Exception as e:
+                logger.error(f"[FEED] Erro ao consultar o terminal: {e}", exc_info=True)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        logger.info("[FEED] Feeder interrompido pelo usuário.")
+    finally:
+        writer.close()
+
+
+def main(type_order="BUY", env="demo"):
+    from .config_loader import load_json_config
+    from .logger_config import setup_logger
+    from .mt5_order import carregar_conta, initialize_mt5
+
+    config = load_json_config(f"config_{type_order.lower()}")
+    logger = setup_logger(f"{config['symbol']}_market_feed")
+    account = carregar_conta(type_order, env)
+
+    if not initialize_mt5(account, logger, config['mt5_path']):
+        return
+    try:
+        run_feeder(config, logger)
+    finally:
+        mt5.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(arg.upper() if i == 0 else arg for i, arg in enumerate(sys.argv[1:])))
@@ -0,0 +1,249 @@
+# mmap_store.py
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+"""
+-----------------------------------------------------------------------------
+ TABELA BINÁRIA EM ARQUIVO MAPEADO (np.memmap)
+
+ Layout do arquivo:
+   [cabeçalho de 64 bytes][capacity * registros do dtype estruturado]
+
+ O cabeçalho guarda 'count' (linhas válidas), 'capacity' (linhas alocadas)
+ e 'origin', um valor livre para o dono da tabela (ex: início do backfill).
+ 'origin' entrou na versão 2 do cabeçalho; arquivos da versão 1 (só
+ count/capacity, resto zerado) são aceitos com origin = 0 e promovidos à
+ versão 2 quando abertos para escrita. Versões desconhecidas são recusadas.
+ O escritor grava as linhas primeiro e só depois incrementa 'count', então
+ leitores em outros processos sempre enxergam um prefixo consistente.
+
+ Vários handles podem abrir o mesmo arquivo (robôs BUY e SELL no mesmo
+ arquivo de barras): a capacidade vale a do cabeçalho, e cada handle
+ remapeia antes de ler ou escrever se outro já aumentou o arquivo. O
+ arquivo nunca é truncado abaixo do tamanho atual (o mapeamento de outro
+ processo perderia páginas: SIGBUS).
+-----------------------------------------------------------------------------
+"""
+
+HEADER_SIZE = 64
+_MAGIC = b"DTBMMAP1"
+_VERSION = 2  # 1: count/capacity | 2: + origin
+_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("itemsize", "<u4"),
+    ("count", "<i8"),
+    ("capacity", "<i8"),
+    ("origin", "<i8"),
+])
+
+
+class MmapTable:
+    """
+    Array estruturado persistente, pré-alocado e crescente (dobra a capacidade).
+
+    Args:
+        path (str): Caminho do arquivo.
+        dtype: dtype estruturado das linhas.
+        initial_capacity (int): Linhas pré-alocadas ao criar o arquivo.
+        readonly (bool): Abre somente para leitura (outros processos).
+    """
+
+    def __init__(self, path, dtype, initial_capacity=65536, readonly=False):
+        self.path = str(path)
+        self.dtype = np.dtype(dtype)
+        self.readonly = readonly
+        self._header = None
+        self._data = None
+
+        if not os.path.exists(self.path):
+            if readonly:
+                raise FileNotFoundError(f"Arquivo mapeado não encontrado: {self.path}")
+            self._create(max(int(initial_capacity), 1))
+
+        self._map()
+
+    # ------------------------------------------------------------------ I/O
+    def _create(self, capacity):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        header = np.zeros(1, dtype=_HEADER_DTYPE)
+        header["magic"] = _MAGIC
+        header["version"] = _VERSION
+        header["itemsize"] = self.dtype.itemsize
+        header["count"] = 0
+        header["capacity"] = capacity
+
+        with open(self.path, "wb") as f:
+            f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + capacity * self.dtype.itemsize)
+
+    def _map(self):
+        mode = "r" if self.readonly else "r+"
+        self._header = np.memmap(self.path, dtype=_HEADER_DTYPE, mode=mode, offset=0, shape=(1,))
+
+        if self._header["magic"][0] != _MAGIC:
+            raise ValueError(f"Arquivo {self.path} não é uma tabela mapeada válida.")
+        version = int(self._header["version"][0])
+        if version not in (1, _VERSION):
+            raise ValueError(f"Versão {version} do arquivo {self.path} não suportada (esperada {_VERSION}).")
+        if int(self._header["itemsize"][0]) != self.dtype.itemsize:
+            raise ValueError(
+                f"dtype incompatível com {self.path}: "
+                f"{self.dtype.itemsize} != {int(self._header['itemsize'][0])} bytes por linha."
+            )
+
+        if version == 1 and not self.readonly:
+            # Layout antigo: os bytes de 'origin' eram padding zerado
+            self._header["origin"] = 0
+            self._header["version"] = _VERSION
+            self._header.flush()
+
+        capacity = int(self._header["capacity"][0])
+        self._data = np.memmap(self.path, dtype=self.dtype, mode=mode, offset=HEADER_SIZE, shape=(capacity,))
+
+    def _refresh(self):
+        """Remapeia se outro handle mudou a capacidade publicada no cabeçalho."""
+        if int(self._header["capacity"][0]) != len(self._data):
+            self._map()
+
+    def _grow(self, min_capacity):
+        self._refresh()
+        file_capacity = (os.path.getsize(self.path) - HEADER_SIZE) // self.dtype.itemsize
+        new_capacity = max(self.capacity * 2, int(min_capacity), file_capacity)
+
+        self._data.flush()
+        self._data = None
+
+        # Só estende: nunca corta o que outro processo pode ter mapeado
+        size = HEADER_SIZE + new_capacity * self.dtype.itemsize
+        if size > os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+
+        # Só publica a nova capacidade depois que o arquivo já foi estendido
+        self._header["capacity"] = new_capacity
+        self._header.flush()
+        self._map()
+
+    # --------------------------------------------------------------- estado
+    @property
+    def count(self):
+        return int(self._header["count"][0])
+
+    @property
+    def capacity(self):
+        return int(self._header["capacity"][0])
+
+    @property
+    def origin(self):
+        if int(self._header["version"][0]) < 2:
+            return 0
+        return int(self._header["origin"][0])
+
+    @origin.setter
+    def origin(self, value):
+        self._header["origin"] = value
+
+    def __len__(self):
+        return self.count
+
+    def view(self):
+        """
+        Retorna as linhas válidas sem cópia (fatia do memmap).
+        No modo leitura remapeia se o escritor tiver aumentado o arquivo.
+        """
+        self._refresh()
+        count = self.count
+        if count > len(self._data):
+            self._map()
+        return self._data[:count]
+
+    # -------------------------------------------------------------- escrita
+    def append(self, rows):
+        """
+        Acrescenta um array estruturado de linhas, copiando campo a campo
+        direto no arquivo (sem criar objetos Python por linha).
+        O array pode ter campos extras; apenas os campos do dtype são gravados.
+        """
+        if self.readonly:
+            raise PermissionError(f"Tabela {self.path} aberta somente para leitura.")
+
+        n = len(rows)
+        if n == 0:
+            return 0
+
+        self._refresh()
+        start = self.count
+        if start + n > self.capacity:
+            self._grow(start + n)
+
+        target = self._data[start:start + n]
+        for name in self.dtype.names:
+            target[name] = rows[name]
+
+        self._header["count"] = start + n
+        return n
+
+    def append_row(self, values):
+        """Acrescenta uma única linha (tupla na ordem dos campos do dtype)."""
+        if self.readonly:
+            raise PermissionError(f"Tabela {self.path} aberta somente para leitura.")
+
+        self._refresh()
+        start = self.count
+        if start + 1 > self.capacity:
+            self._grow(start + 1)
+
+        self._data[start] = values
+        self._header["count"] = start + 1
+
+    def replace_last(self, row):
+        """Sobrescreve a última linha válida (ex: barra ainda em formação)."""
+        self._refresh()
+        count = self.count
+        if count == 0:
+            raise IndexError("Tabela vazia.")
+        target = self._data[count - 1:count]
+        for name in self.dtype.names:
+            target[name] = row[name]
+
+    # -------------------------------------------------------------- leitura
+    def slice_by(self, column, start=None, end=None):
+        """
+        Fatia [start, end) de uma coluna ordenada usando busca binária
+        direto no memmap (O(log n), sem copiar a coluna).
+        """
+        view = self.view()
+        keys = view[column]
+        lo = 0 if start is None else bisect_left(keys, start)
+        hi = len(keys) if end is None else bisect_left(keys, end, lo)
+        return view[lo:hi]
+
+    def last(self, column):
+        """Valor da coluna na última linha, ou None se vazia."""
+        self._refresh()
+        count = self.count
+        if count == 0:
+            return None
+        return self._data[count - 1][column]
+
+    def count_equal_at_end(self, column, value):
+        """Quantas linhas finais têm 'column' igual a 'value' (coluna ordenada)."""
+        keys = self.view()[column]
+        return len(keys) - bisect_left(keys, value) if len(keys) and keys[-1] == value else 0
+
+    def flush(self):
+        if not self.readonly and self._data is not None:
+            self._data.flush()
+            self._header.flush()
+
+    def close(self):
+        self.flush()
+        self._data = None
+        self._header = None
+
@@ -0,0 +1,218 @@
+# mt5_faults.py
+"""
+-----------------------------------------------------------------------------
+ INJEÇÃO DE FALHAS NO MT5 SIMULADO
+
+ FaultyMT5 envolve um terminal (normalmente o FakeMT5) e, por função,
+ acrescenta latência e falhas antes de repassar a chamada:
+
+   latency          distribuição do tempo de resposta (ver latency_sampler)
+   error_rate       probabilidade da chamada falhar (None; nada é executado)
+   requote_rate     order_send a mercado devolve TRADE_RETCODE_REQUOTE
+   lost_reply_rate  order_send é executado no servidor, mas a resposta se
+                    perde (o robô recebe None): gera ordens "perdidas"
+
+ Além disso, janelas de desconexão (segundos a partir da criação) em que
+ todas as chamadas falham e initialize() devolve False. Uma chamada cuja
+ latência termina dentro da janela também falha, então uma desconexão pode
+ pegar o robô no meio de uma sequência de ordens (ex.: new_sell_trades).
+
+ A latência passa pelo relógio do robô (clock.sleep, ou SimulatedClock.advance
+ nos cenários), então em tempo simulado o preço anda enquanto a chamada
+ "demora", como no terminal real.
+
+ Exemplo (formato JSON, usado por benchmarks/run_scenarios.py):
+     {
+       "order_send":    {"latency": {"dist": "lognormal", "median": 2.0, "sigma": 0.4},
+                         "requote_rate": 0.1, "lost_reply_rate": 0.02},
+       "positions_get": {"error_rate": 0.2},
+       "*":             {"latency": {"dist": "uniform", "low": 0.005, "high": 0.05}}
+     }
+-----------------------------------------------------------------------------
+"""
+import math
+import random
+
+from . import clock as bot_clock
+from .fake_mt5 import (
+    OrderSendResult, RES_E_INTERNAL_FAIL_CONNECT, RES_E_INTERNAL_FAIL_TIMEOUT, TRADE_ACTION_DEAL,
+    TRADE_RETCODE_REQUOTE, TradeRequest,
+)
+
+# Resultados de order_send registrados em FaultyMT5.order_events
+DONE = "done"              # executada e confirmada
+REJECTED = "rejected"      # resposta do servidor com retcode de erro (inclui requote)
+FAILED = "failed"          # erro/desconexão antes da execução: nada foi feito
+LOST_REPLY = "lost_reply"  # executada no servidor, mas o robô recebeu None
+
+# Chamadas que nunca falham (diagnóstico do próprio erro)
+_NEVER_FAIL = {"last_error", "version"}
+
+
+def latency_sampler(spec, rng):
+    """
+    Função que sorteia a latência (segundos) de uma chamada.
+
+    spec:
+        None ou número           latência fixa (None = 0)
+        {"dist": "constant", "value": s}
+        {"dist": "uniform", "low": a, "high": b}
+        {"dist": "lognormal", "median": m, "sigma": s}   cauda longa
+        {"dist": "exponential", "mean": m}
+        {"dist": "spike", "base": s, "spike": s2, "prob": p}  s2 com probabilidade p
+    """
+    if spec is None:
+        return lambda: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+
+    dist = spec.get("dist", "constant")
+    if dist == "constant":
+        value = float(spec["value"])
+        return lambda: value
+    if dist == "uniform":
+        low, high = float(spec["low"]), float(spec["high"])
+        return lambda: rng.uniform(low, high)
+    if dist == "lognormal":
+        mu, sigma = math.log(float(spec["median"])), float(spec.get("sigma", 0.5))
+        return lambda: rng.lognormvariate(mu, sigma)
+    if dist == "exponential":
+        rate = 1.0 / float(spec["mean"])
+        return lambda: rng.expovariate(rate)
+    if dist == "spike":
+        base, spike, prob = float(spec.get("base", 0.0)), float(spec["spike"]), float(spec["prob"])
+        return lambda: spike if rng.random() < prob else base
+    raise ValueError(f"Distribuição de latência desconhecida: {dist}")
+
+
+class FaultyMT5:
+    """
+    Terminal com latência e falhas injetadas.
+
+    Args:
+        target: Terminal envolvido (FakeMT5).
+        faults (dict): {nome da função | "*": {latency, error_rate, requote_rate,
+            lost_reply_rate}}. "*" vale para as funções sem entrada própria.
+        disconnects (list): Janelas [{"start": s, "duration": d}] em segundos
+            a partir da criação.
+        seed (int): Semente do sorteio (cenários reprodutíveis).
+        clock (callable): Fonte de tempo.
+        delay (callable): Como a latência é aplicada (clock.sleep ou
+            SimulatedClock.advance).
+    """
+
+    def __init__(self, target, faults=None, disconnects=None, seed=0, clock=bot_clock.time, delay=bot_clock.sleep):
+        self._target = target
+        self._clock = clock
+        self._delay = delay
+        self._rng = random.Random(seed)
+        self._started = clock()
+        self._faults = {}
+        for name, spec in (faults or {}).items():
+            spec = dict(spec)
+            spec["latency"] = latency_sampler(spec.get("latency"), self._rng)
+            self._faults[name] = spec
+        self._windows = [
+            (self._started + w["start"], self._started + w["start"] + w["duration"]) for w in (disconnects or [])
+        ]
+        self._last_error = None
+        self.order_events = []  # {time, request, outcome, retcode, order}
+        self.injected = {}      # {(função, tipo de falha): contagem}
+
+    def disconnected(self, now=None):
+        now = self._clock() if now is None else now
+        return any(start <= now < end for start, end in self._windows)
+
+    def _count(self, name, kind):
+        key = (name, kind)
+        self.injected[key] = self.injected.get(key, 0) + 1
+
+    def _fail(self, name, code, message):
+        self._last_error = (code, message)
+        return False if name in ("initialize", "login") else None
+
+    def last_error(self):
+        if self._last_error is not None:
+            return self._last_error
+        return self._target.last_error()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in _NEVER_FAIL:
+            return attr
+
+        spec = self._faults.get(name, self._faults.get("*", {}))
+        latency = spec.get("latency")
+        error_rate = spec.get("error_rate", 0.0)
+        requote_rate = spec.get("requote_rate", 0.0)
+        lost_reply_rate = spec.get("lost_reply_rate", 0.0)
+        is_order_send = name == "order_send"
+
+        def call(*args, **kwargs):
+            request = args[0] if is_order_send and args else kwargs.get("request")
+
+            if self.disconnected():
+                self._count(name, "disconnect")
+                self._record(request, FAILED)
+                return self._fail(name, RES_E_INTERNAL_FAIL_CONNECT, "IPC initialize failed")
+
+            seconds = latency() if latency else 0.0
+            if seconds > 0:
+                self._delay(seconds)
+
+            # A conexão caiu enquanto a chamada estava em trânsito
+            if self.disconnected():
+                self._count(name, "disconnect")
+                self._record(request, FAILED)
+                return self._fail(name, RES_E_INTERNAL_FAIL_CONNECT, "IPC initialize failed")
+
+            if error_rate and self._rng.random() < error_rate:
+                self._count(name, "error")
+                self._record(request, FAILED)
+                return self._fail(name, RES_E_INTERNAL_FAIL_TIMEOUT, "IPC timeout")
+
+            if is_order_send and requote_rate and request.get("action") == TRADE_ACTION_DEAL \
+                    and self._rng.random() < requote_rate:
+                self._count(name, "requote")
+                result = self._requote(request)
+                self._record(request, REJECTED, result)
+                return result
+
+            self._last_error = None
+            result = attr(*args, **kwargs)
+
+            if is_order_send:
+                if lost_reply_rate and self._rng.random() < lost_reply_rate:
+                    self._count(name, "lost_reply")
+                    self._record(request, LOST_REPLY, result)
+                    return self._fail(name, RES_E_INTERNAL_FAIL_TIMEOUT, "IPC timeout")
+                done = result is not None and result.retcode == self._target.TRADE_RETCODE_DONE
+                self._record(request, DONE if done else REJECTED, result)
+            return result
+
+        call.__name__ = name
+        self.__dict__[name] = call
+        return call
+
+    def _requote(self, request):
+        fields = {name: request.get(name, 0) for name in TradeRequest._fields}
+        return OrderSendResult(
+            retcode=TRADE_RETCODE_REQUOTE, deal=0, order=0, volume=0.0, price=0.0,
+            bid=getattr(self._target, "bid", 0.0), ask=getattr(self._target, "ask", 0.0),
+            comment="Requote", request_id=0, retcode_external=0, request=TradeRequest(**fields),
+        )
+
+    def _record(self, request, outcome, result=None):
+        if request is None:
+            return
+        self.order_events.append({
+            "time": self._clock(),
+            "request": dict(request),
+            "outcome": outcome,
+            "retcode": getattr(result, "retcode", None),
+            "order": getattr(result, "order", 0),
+        })
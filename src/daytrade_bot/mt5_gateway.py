@@ -0,0 +1,334 @@
+# mt5_gateway.py
+"""
+-----------------------------------------------------------------------------
+ GATEWAY DO METATRADER5: GRAVAÇÃO E REPLAY
+
+ Camada fina entre o robô e o pacote MetaTrader5. Instalada no lugar de
+ 'mt5' em todos os módulos do robô (como fake_mt5.install), intercepta
+ todas as chamadas mt5.*:
+
+   RecordingMT5  repassa cada chamada ao terminal real (ou a qualquer
+                 objeto com a mesma API) e grava requisição, resposta,
+                 instante e duração em um log binário compacto.
+   ReplayMT5     serve as respostas do log, na mesma ordem, sem terminal:
+                 um dia ruim de produção pode ser reproduzido no Linux para
+                 perfilar, bisectar e medir mudanças.
+
+ Formato do arquivo (.mt5log):
+   b"MT5G" + versão (1 byte), seguido de um stream gzip de registros pickle:
+     cabeçalho  {"version", "started", "constants": {NOME: valor}}
+     chamada    (instante, duração, nome, args, kwargs, resposta, erro)
+   Os registros do MT5 (TradePosition, Tick, OrderSendResult, ...) são
+   gravados como Struct(nome, campos, valores) e voltam como namedtuples
+   com os mesmos campos; arrays numpy (copy_rates_*, copy_ticks_*) vão
+   inteiros. O gzip é descarregado a cada 'flush_every' chamadas, então um
+   arquivo cortado por queda do processo é lido até o último bloco completo.
+
+ Credenciais: os argumentos de initialize() e login() não são gravados.
+
+ Feeder (market_feed): com o gateway instalado, o leitor da memória
+ compartilhada não é conectado (market_feed.connect_reader) e tick, conta e
+ posições são lidos do terminal. As leituras do feeder não passam pelo
+ gateway, então gravá-las assim deixaria o replay fora de ordem
+ (ReplayMismatch).
+
+ Segurança: o log é pickle. read_log e ReplayMT5 executam o que estiver no
+ arquivo; só leia logs gravados por você ou de origem confiável.
+
+ Uso:
+     gateway = mt5_gateway.install(mt5_gateway.RecordingMT5(mt5, "dia.mt5log"))
+     ...
+     replay = mt5_gateway.ReplayMT5("dia.mt5log")
+     mt5_gateway.install(replay)
+     with clock.use(replay.clock):
+         main_manager_fm_buy_sell.main("BUY")   # termina com ReplayFinished
+-----------------------------------------------------------------------------
+"""
+import gzip
+import os
+import pickle
+import sys
+import threading
+from collections import deque, namedtuple
+
+from . import clock as bot_clock
+from .clock import ReplayFinished
+
+MAGIC = b"MT5G"
+VERSION = 1
+
+# Chamadas cujos argumentos não são gravados (login/senha)
+_REDACTED_CALLS = {"initialize", "login"}
+
+
+class ReplayMismatch(Exception):
+    """O código chamou o MT5 em uma ordem diferente da gravada."""
+
+
+class ReplayedError(Exception):
+    """Exceção levantada pela chamada original, reproduzida no replay."""
+
+
+class Struct:
+    """Registro do MT5 serializado (namedtuple ou estrutura com _fields)."""
+
+    __slots__ = ("name", "fields", "values")
+
+    def __init__(self, name, fields, values):
+        self.name = name
+        self.fields = fields
+        self.values = values
+
+    def __reduce__(self):
+        return Struct, (self.name, self.fields, self.values)
+
+
+def _encode(value):
+    """Converte a resposta/argumento em tipos serializáveis sem depender do MetaTrader5."""
+    if isinstance(value, (int, float, str, bytes, bool)) or value is None:
+        return value
+    fields = getattr(value, "_fields", None)
+    if fields is not None:
+        return Struct(type(value).__name__, tuple(fields), tuple(_encode(v) for v in value))
+    if isinstance(value, tuple):
+        return tuple(_encode(v) for v in value)
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value  # datetime, numpy, ...
+
+
+class _Decoder:
+    """Reconstrói os Structs como namedtuples (uma classe por nome + campos)."""
+
+    def __init__(self):
+        self._types = {}
+
+    def __call__(self, value):
+        if isinstance(value, Struct):
+            key = (value.name, value.fields)
+            cls = self._types.get(key)
+            if cls is None:
+                cls = self._types[key] = namedtuple(value.name, value.fields)
+            return cls(*(self(v) for v in value.values))
+        if isinstance(value, tuple):
+            return tuple(self(v) for v in value)
+        if isinstance(value, list):
+            return [self(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self(v) for k, v in value.items()}
+        return value
+
+
+def _constants(target):
+    constants = {}
+    for name in dir(target):
+        if name.isupper():
+            value = getattr(target, name)
+            if isinstance(value, (int, float, str)):
+                constants[name] = value
+    return constants
+
+
+def read_log(path):
+    """
+    Lê um log gravado.
+
+    O arquivo é desserializado com pickle: use apenas logs confiáveis.
+
+    Returns:
+        tuple: (cabeçalho, lista de chamadas). Registros ainda codificados.
+    """
+    with open(path, "rb") as raw:
+        if raw.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} não é um log do mt5_gateway")
+        version = raw.read(1)[0]
+        if version != VERSION:
+            raise ValueError(f"Versão de log não suportada: {version}")
+        calls = []
+        with gzip.GzipFile(fileobj=raw, mode="rb") as stream:
+            header = pickle.load(stream)
+            try:
+                while True:
+                    calls.append(pickle.load(stream))
+            except EOFError:
+                pass  # Fim do arquivo (ou arquivo cortado: mantém o que foi lido)
+    return header, calls
+
+
+class RecordingMT5:
+    """
+    Repassa as chamadas ao terminal e grava tudo em 'path'.
+
+    Args:
+        target: Módulo MetaTrader5 (ou FakeMT5).
+        path (str): Arquivo do log.
+        flush_every (int): Chamadas entre descargas do gzip.
+        clock (callable): Fonte de tempo dos registros.
+    """
+
+    def __init__(self, target, path, flush_every=200, clock=bot_clock.time):
+        self._target = target
+        self._clock = clock
+        self._flush_every = flush_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.path = path
+        self.calls = 0
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._raw = open(path, "wb")
+        self._raw.write(MAGIC + bytes([VERSION]))
+        self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+        header = {"version": VERSION, "started": clock(), "constants": _constants(target)}
+        pickle.dump(header, self._stream, protocol=pickle.HIGHEST_PROTOCOL)
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            started = self._clock()
+            result = error = None
+            try:
+                result = attr(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = (type(e).__name__, str(e))
+                raise
+            finally:
+                self._write(started, self._clock() - started, name, args, kwargs, result, error)
+
+        call.__name__ = name
+        self.__dict__[name] = call  # Próximos acessos não passam por __getattr__
+        return call
+
+    def _write(self, started, elapsed, name, args, kwargs, result, error):
+        if name in _REDACTED_CALLS:
+            args, kwargs = (), {}
+        record = (started, elapsed, name, _encode(args), _encode(kwargs), _encode(result), error)
+        with self._lock:
+            if self._stream is None:
+                return
+            pickle.dump(record, self._stream, protocol=pickle.HIGHEST_PROTOCOL)
+            self.calls += 1
+            self._pending += 1
+            if self._pending >= self._flush_every:
+                self._stream.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.close()
+            self._raw.close()
+            self._stream = None
+
+
+class ReplayMT5:
+    """
+    Serve as respostas de um log gravado, sem terminal.
+
+    Cada chamada consome o próximo registro; o nome precisa bater com o
+    gravado (senão ReplayMismatch). Com strict=False cada função tem sua
+    própria fila, o que tolera mudanças na ordem das chamadas (útil para
+    bisectar mudanças de código que reordenam ou pulam chamadas).
+
+    'clock' é um SimulatedClock que acompanha os instantes gravados: cada
+    resposta leva o relógio ao fim da chamada original (só para frente).
+    Depois do último registro levanta clock.ReplayFinished uma vez; as
+    chamadas seguintes devolvem None, como um terminal desconectado, para
+    que a limpeza do robô rode.
+
+    Args:
+        path (str): Arquivo do log.
+        strict (bool): Exige a mesma sequência de chamadas.
+    """
+
+    def __init__(self, path, strict=True):
+        header, self._calls = read_log(path)
+        self.strict = strict
+        self.constants = header["constants"]
+        self.clock = bot_clock.SimulatedClock(start=header["started"])
+        self._decode = _Decoder()
+        self._cursor = 0
+        self._queues = None
+        self._finished = False
+        if not strict:
+            self._queues = {}
+            for record in self._calls:
+                self._queues.setdefault(record[2], deque()).append(record)
+        for name, value in self.constants.items():
+            setattr(self, name, value)
+
+    @property
+    def remaining(self):
+        if self._queues is not None:
+            return sum(len(q) for q in self._queues.values())
+        return len(self._calls) - self._cursor
+
+    def _next(self, name):
+        if self._queues is not None:
+            queue = self._queues.get(name)
+            return queue.popleft() if queue else None
+        if self._cursor >= len(self._calls):
+            return None
+        record = self._calls[self._cursor]
+        if record[2] != name:
+            if all(r[2] == "shutdown" for r in self._calls[self._cursor:]):
+                return None  # Só resta o encerramento: a sessão gravada acabou aqui
+            raise ReplayMismatch(
+                f"Chamada {self._cursor}: código chamou {name}(), o log tem {record[2]}()"
+            )
+        self._cursor += 1
+        return record
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            if self._finished:
+                return None
+            record = self._next(name)
+            if record is None:
+                self._finished = True
+                raise ReplayFinished(f"Replay do MT5 terminou em {name}()")
+            started, elapsed, _, _, _, result, error = record
+            end = started + elapsed
+            if end > self.clock.time():
+                self.clock.advance(end - self.clock.time())
+            if error is not None:
+                raise ReplayedError(f"{error[0]}: {error[1]}")
+            return self._decode(result)
+
+        call.__name__ = name
+        self.__dict__[name] = call
+        return call
+
+
+def install(gateway):
+    """Instala o gateway no lugar do MetaTrader5 (inclusive nos módulos já importados)."""
+    from .fake_mt5 import install as install_terminal
+    return install_terminal(gateway)
+
+
+def from_config(config, type_order, target=None):
+    """
+    RecordingMT5 para o robô, com o arquivo em
+    <mt5_record_folder>/<símbolo>_<BUY|SELL>_<AAAAMMDD_HHMMSS>.mt5log.
+    """
+    target = target if target is not None else sys.modules["MetaTrader5"]
+    stamp = bot_clock.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(
+        config.get("mt5_record_folder", "mt5_records"), f"{config['symbol']}_{type_order}_{stamp}.mt5log"
+    )
+    return RecordingMT5(target, path, flush_every=config.get("mt5_record_flush_every", 200))
@@ -2,6 +2,34 @@
 import MetaTrader5 as mt5
 from datetime import datetime, timedelta, timezone
 
+from . import clock, history_service
+
+
+def _filtered(records, predicate):
+    if records is None or predicate is None:
+        return records
+    return [r for r in records if predicate(r)]
+
+
+def _history_deals(start_time, end_time, config, group=None, predicate=None, key=None):
+    """
+    Deals do histórico que passam em 'predicate'. Com 'history_service_enabled',
+    saem do snapshot compartilhado (history_service) em vez de uma nova
+    consulta ao terminal, e o resultado filtrado fica memorizado por 'key'.
+    """
+    if config.get('history_service_enabled', False):
+        return history_service.get_service(config).deals(start_time, end_time, predicate, key)
+    if group is not None:
+        return _filtered(mt5.history_deals_get(start_time, end_time, group=group), predicate)
+    return _filtered(mt5.history_deals_get(start_time, end_time), predicate)
+
+
+def _history_orders(start_time, end_time, config, predicate=None, key=None):
+    """Ordens do histórico (mesma regra de _history_deals)."""
+    if config.get('history_service_enabled', False):
+        return history_service.get_service(config).orders(start_time, end_time, predicate, key)
+    return _filtered(mt5.history_orders_get(start_time, end_time), predicate)
+
 def get_profitable_closed_deals(symbol, original_order_type, config, logger):
     """
     Busca no histórico por negócios (deals) de fechamento que foram lucrativos,
@@ -48,34 +76,33 @@ def get_profitable_closed_deals(symbol, original_order_type, config, logger):
         logger.error(f"Erro ao calcular o intervalo de tempo: {e}")
         return []
 
-    # 3. Buscar os negócios (deals) no histórico do MT5
+    # 3. Buscar no histórico do MT5 os negócios (deals) que correspondem aos critérios
+    # Critérios para ser um negócio de fechamento lucrativo:
+    # - O tipo do negócio deve ser o oposto da ordem original (ex: SELL para fechar um BUY)
+    # - O lucro (profit) deve ser maior que zero
+    # - A entrada (entry) deve ser 'out', indicando que é um negócio de saída (fechamento)
+    def is_profitable_close(deal):
+        return (deal.type == closing_deal_type and
+                deal.profit > 0 and
+                deal.entry == mt5.DEAL_ENTRY_OUT and
+                deal.symbol == symbol)
+
     try:
-        history_deals = mt5.history_deals_get(start_time, end_time, group=symbol)
+        history_deals = _history_deals(
+            start_time, end_time, config, group=symbol,
+            predicate=is_profitable_close, key=("profitable_closes", symbol, closing_deal_type),
+        )
         
         if history_deals is None:
             logger.error(f"Falha ao buscar o histórico de negócios. Erro: {mt5.last_error()}")
             return []
             
-        if not history_deals:
-            logger.info(f"Nenhum negócio encontrado para {symbol} no período especificado.")
-            return []
-            
     except Exception as e:
         logger.error(f"Uma exceção ocorreu ao chamar history_deals_get: {e}")
         return []
 
-    # 4. Filtrar os negócios para encontrar os que correspondem aos critérios
-    profitable_deals = []
-    for deal in history_deals:
-        # Critérios para ser um negócio de fechamento lucrativo:
-        # - O tipo do negócio deve ser o oposto da ordem original (ex: SELL para fechar um BUY)
-        # - O lucro (profit) deve ser maior que zero
-        # - A entrada (entry) deve ser 'out', indicando que é um negócio de saída (fechamento)
-        if (deal.type == closing_deal_type and 
-            deal.profit > 0 and 
-            deal.entry == mt5.DEAL_ENTRY_OUT and
-            deal.symbol == symbol):
-            profitable_deals.append(deal)
+    # 4. Cópia: o resultado memorizado pelo history_service não deve ser alterado
+    profitable_deals = list(history_deals)
 
     logger.info(f"Encontrado(s) {len(profitable_deals)} negócio(s) de fechamento lucrativo(s) para posições de '{original_order_type}' em {symbol}.")
     
@@ -115,44 +142,44 @@ def get_closed_orders_by_timeframe(symbol, type_order, config, logger):
         logger.info(f"Buscando ordens fechadas - Símbolo: {symbol}, Tipo: {type_order}, "
                    f"Intervalo: {minutes_interval} minutos ({start_time} to {end_time})")
         
-        # Busca ordens no histórico dentro do intervalo de tempo
-        closed_orders = mt5.history_orders_get(start_time, end_time)
+        # Busca no histórico as ordens do intervalo que atendem aos critérios
+        closed_orders = _history_orders(
+            start_time, end_time, config,
+            predicate=lambda order: _matches_criteria(order, symbol, type_order) and _is_order_closed_profitably(order),
+            key=("closed_profitable", symbol, type_order),
+        )
         
         if closed_orders is None:
             logger.warning("Nenhuma ordem no histórico encontrada ou erro na busca")
             return []
         
-        # Filtra as ordens
         filtered_orders = []
         for order in closed_orders:
-            if (_matches_criteria(order, symbol, type_order) and 
-                _is_order_closed_profitably(order)):
-                
-                order_info = {
-                    'ticket': order.ticket,
-                    'symbol': order.symbol,
-                    'type': order.type,
-                    'type_description': 'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL',
-                    'volume': order.volume_current or order.volume_initial,
-                    'price_open': order.price_open,
-                    'price_current': order.price_current,
-                    'sl': order.sl,
-                    'tp': order.tp,
-                    'profit': order.profit,
-                    'time_setup': order.time_setup,
-                    'time_done': order.time_done,
-                    'time_expiration': order.time_expiration,
-                    'state': order.state,
-                    'state_description': _get_order_state_description(order.state),
-                    'magic': order.magic,
-                    'comment': order.comment
-                }
-                filtered_orders.append(order_info)
-                
-                logger.debug(f"Ordem encontrada - Ticket: {order.ticket}, "
-                           f"Tipo: {'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL'}, "
-                           f"Lucro: {order.profit}, "
-                           f"Fechamento: {order.time_done}")
+            order_info = {
+                'ticket': order.ticket,
+                'symbol': order.symbol,
+                'type': order.type,
+                'type_description': 'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL',
+                'volume': order.volume_current or order.volume_initial,
+                'price_open': order.price_open,
+                'price_current': order.price_current,
+                'sl': order.sl,
+                'tp': order.tp,
+                'profit': order.profit,
+                'time_setup': order.time_setup,
+                'time_done': order.time_done,
+                'time_expiration': order.time_expiration,
+                'state': order.state,
+                'state_description': _get_order_state_description(order.state),
+                'magic': order.magic,
+                'comment': order.comment
+            }
+            filtered_orders.append(order_info)
+            
+            logger.debug(f"Ordem encontrada - Ticket: {order.ticket}, "
+                       f"Tipo: {'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL'}, "
+                       f"Lucro: {order.profit}, "
+                       f"Fechamento: {order.time_done}")
         
         logger.info(f"Encontradas {len(filtered_orders)} ordens fechadas com lucro no intervalo")
         return filtered_orders
@@ -203,33 +230,35 @@ def get_closed_orders_by_magic(symbol, magic_number, config, logger):
     """
     try:
         minutes_interval = config.get('history_minutes_interval', 60)
-        end_time = datetime.now()
+        end_time = clock.now()
         start_time = end_time - timedelta(minutes=minutes_interval)
         
-        closed_orders = mt5.history_orders_get(start_time, end_time)
+        closed_orders = _history_orders(
+            start_time, end_time, config,
+            predicate=lambda order: (order.symbol == symbol and
+                                     order.magic == magic_number and
+                                     order.state == mt5.ORDER_STATE_FILLED and
+                                     order.profit > 0),
+            key=("closed_profitable_by_magic", symbol, magic_number),
+        )
         
         if closed_orders is None:
             return []
         
         filtered_orders = []
         for order in closed_orders:
-            if (order.symbol == symbol and 
-                order.magic == magic_number and 
-                order.state == mt5.ORDER_STATE_FILLED and
-                order.profit > 0):
-                
-                order_info = {
-                    'ticket': order.ticket,
-                    'symbol': order.symbol,
-                    'type': order.type,
-                    'type_description': 'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL',
-                    'volume': order.volume_current or order.volume_initial,
-                    'profit': order.profit,
-                    'time_done': order.time_done,
-                    'magic': order.magic,
-                    'comment': order.comment
-                }
-                filtered_orders.append(order_info)
+            order_info = {
+                'ticket': order.ticket,
+                'symbol': order.symbol,
+                'type': order.type,
+                'type_description': 'BUY' if order.type == mt5.ORDER_TYPE_BUY else 'SELL',
+                'volume': order.volume_current or order.volume_initial,
+                'profit': order.profit,
+                'time_done': order.time_done,
+                'magic': order.magic,
+                'comment': order.comment
+            }
+            filtered_orders.append(order_info)
         
         logger.info(f"Encontradas {len(filtered_orders)} ordens fechadas com magic {magic_number}")
         return filtered_orders
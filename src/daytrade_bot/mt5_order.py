@@ -2,6 +2,11 @@ import MetaTrader5 as mt5
 import pandas as pd
 from datetime import datetime, timezone, timedelta
 from .config_loader import load_json_config
+from .bar_archive import get_archived_history
+from . import market_feed
+from .order_planner import preflight_volume, parse_sub_lots, calc_margin
+from .margin_recovery import book_margin, hedged_ratio, margin_needed, position_margins, select_recovery_set
+from .netting_planner import plan_close_by, netted_volume, CLOSE_BY
 
 def carregar_conta(type_order, type_account=None):
     """
@@ -26,7 +31,7 @@ def initialize_mt5(account, logger, mt5_path):
     
 def get_open_positions_by_type(symbol, magic_number, type_order):
     """Busca posições abertas filtrando por símbolo e magic number."""
-    positions = mt5.positions_get(symbol=symbol)
+    positions = market_feed.positions_get(symbol)
     if positions is None:
         return []
         
@@ -35,26 +40,27 @@ def get_open_positions_by_type(symbol, magic_number, type_order):
 
 def get_all_open_positions(symbol):
     """Busca posições abertas filtrando por símbolo e magic number."""
-    positions = mt5.positions_get(symbol=symbol)
+    positions = market_feed.positions_get(symbol)
     if positions is None:
         return []
         
     return positions
 
-def close_position(position, logger):
+def close_position(position, logger, volume=None):
     """
     Fecha uma posição de mercado específica com base no objeto da posição.
 
     Args:
         position: O objeto da posição retornado por mt5.positions_get().
         logger: A instância do logger para registrar as ações.
+        volume: Volume a fechar (fechamento parcial). None fecha a posição inteira.
 
     Returns:
         True se a ordem de fechamento foi enviada com sucesso, False caso contrário.
     """
     symbol = position.symbol
     ticket = position.ticket
-    volume = position.volume
+    volume = position.volume if volume is None else min(volume, position.volume)
     order_type = position.type
     magic = position.magic
 
@@ -98,6 +104,95 @@ def close_position(position, logger):
     )
     return True
 
+def close_sub_lots(position, lots, logger):
+    """
+    Fechamento parcial de 'lots' sub-lotes lógicos de uma posição fundida
+    (ver order_planner.coalesce_plan). Em posições comuns, fecha a posição inteira.
+
+    Drawdown, expiração por tempo e recuperação de margem não usam esta função:
+    fecham a posição fundida inteira, ou seja, todos os sub-lotes de uma vez.
+    """
+    available, lot_volume = parse_sub_lots(position.comment, position.volume)
+    lots = min(lots, available)
+    if lots <= 0:
+        return False
+    if lots == available:
+        return close_position(position, logger)
+
+    logger.info(f"Fechando {lots}/{available} sub-lote(s) de {lot_volume} do ticket {position.ticket}.")
+    return close_position(position, logger, volume=round(lots * lot_volume, 8))
+
+def close_position_by(position, opposite, logger):
+    """
+    Fecha 'position' pela posição oposta 'opposite' (TRADE_ACTION_CLOSE_BY).
+    As duas são fechadas pelo volume menor, sem spread; a maior segue aberta com o resto.
+    """
+    request = {
+        "action": mt5.TRADE_ACTION_CLOSE_BY,
+        "position": position.ticket,
+        "position_by": opposite.ticket,
+        "magic": position.magic,
+        "comment": "Close by",
+    }
+
+    result = mt5.order_send(request)
+
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        reason = mt5.last_error() if result is None else f"{result.comment} (retcode: {result.retcode})"
+        logger.error(f"FALHA NO CLOSE_BY do ticket {position.ticket} pelo {opposite.ticket}. Motivo: {reason}")
+        return False
+
+    logger.info(f"CLOSE_BY ENVIADO: ticket {position.ticket} fechado pelo {opposite.ticket}.")
+    return True
+
+def close_positions_netted(positions, logger, tag="[NETTING]"):
+    """
+    Fecha as posições usando CLOSE_BY entre BUYs e SELLs opostas (ver
+    netting_planner.plan_close_by); só o resíduo vai a mercado.
+
+    Args:
+        positions (list): Posições que o robô decidiu fechar.
+
+    Se algum passo falhar, o plano é abandonado: o que ainda estiver aberto
+    entre 'positions' (consulta nova ao terminal) é fechado a mercado, para
+    que as posições escolhidas pelo chamador não fiquem abertas.
+
+    Returns:
+        bool: True se todas as posições foram fechadas.
+    """
+    steps = plan_close_by(positions)
+    netted = netted_volume(steps)
+    if netted:
+        logger.info(
+            f"{tag} Plano de fechamento: {len(steps)} requisição(ões) para {len(positions)} posição(ões), "
+            f"{netted} lote(s) por lado fechados por CLOSE_BY."
+        )
+
+    for step in steps:
+        if step[0] == CLOSE_BY:
+            _, position, opposite, _ = step
+            ok = close_position_by(position, opposite, logger)
+        else:
+            _, position, volume = step
+            ok = close_position(position, logger, volume=volume)
+        if not ok:
+            break
+    else:
+        return True
+
+    tickets = {p.ticket for p in positions}
+    still_open = []
+    for symbol in {p.symbol for p in positions}:
+        still_open += [p for p in mt5.positions_get(symbol=symbol) or () if p.ticket in tickets]
+    logger.warning(
+        f"{tag} Plano de fechamento interrompido. Fechando a mercado {len(still_open)} posição(ões) "
+        f"ainda aberta(s): {[p.ticket for p in still_open]}"
+    )
+    all_ok = True
+    for position in still_open:
+        all_ok = close_position(position, logger) and all_ok
+    return all_ok
+
 def close_all_positions(positions, logger):
     """
     Fecha todas as posições.
@@ -136,6 +231,11 @@ def handle_low_margin(margin_free_perc, open_positions, config, logger):
             )
             return
 
+        # Fecha de uma vez o menor conjunto que restaura o limite
+        if config.get("margin_recovery_planner_enabled", False):
+            if _recover_margin(open_positions, mf_perc_threshold, config, logger):
+                return
+
         # Encontra a posição com o menor lucro (pode ser o maior prejuízo)
         position_to_close = min(open_positions, key=lambda p: p.profit)
         
@@ -151,6 +251,73 @@ def handle_low_margin(margin_free_perc, open_positions, config, logger):
         close_position(position_to_close, logger)
 
 
+def _recover_margin(open_positions, mf_perc_threshold, config, logger):
+    """
+    Planejador de recuperação de margem (ver margin_recovery).
+    Retorna False se não houver dados para planejar (usa-se a regra antiga).
+    """
+    symbol = config["symbol"]
+    account = market_feed.account_info(symbol)
+    tick = market_feed.symbol_info_tick(symbol)
+    if not account or not tick:
+        logger.warning("[MARGEM] Sem dados de conta/tick para o planejador de recuperação.")
+        return False
+
+    bucket_size = config.get("margin_preflight_price_bucket", 1.0)
+    unit_margin = {
+        mt5.ORDER_TYPE_BUY: calc_margin(symbol, mt5.ORDER_TYPE_BUY, 1.0, tick.ask, bucket_size),
+        mt5.ORDER_TYPE_SELL: calc_margin(symbol, mt5.ORDER_TYPE_SELL, 1.0, tick.bid, bucket_size),
+    }
+    if None in unit_margin.values():
+        logger.warning("[MARGEM] order_calc_margin indisponível para o planejador de recuperação.")
+        return False
+
+    # Livro inteiro do símbolo (todas as magics): fechar uma perna hedgeada pode não liberar nada
+    book = {mt5.ORDER_TYPE_BUY: 0.0, mt5.ORDER_TYPE_SELL: 0.0}
+    for position in market_feed.positions_get(symbol) or ():
+        if position.type in book:
+            book[position.type] += position.volume
+    book = (book[mt5.ORDER_TYPE_BUY], book[mt5.ORDER_TYPE_SELL])
+    ratio = hedged_ratio(mt5.symbol_info(symbol))
+
+    # account.margin é a margem da conta inteira: só calibra quando as posições são a conta toda
+    account_tickets = {p.ticket for p in mt5.positions_get() or ()}
+    whole_book = account_tickets == {p.ticket for p in open_positions}
+    account_margin = account.margin if whole_book else None
+
+    needed = margin_needed(account.equity, account.margin_free, mf_perc_threshold)
+    margins = position_margins(open_positions, unit_margin, account_margin, book=book, ratio=ratio)
+    selected = select_recovery_set(margins, [p.profit for p in open_positions], needed)
+    if selected is None:
+        logger.error(
+            f"[MARGEM] Nem fechando todas as posições seria liberada a margem necessária ({needed:.2f})."
+        )
+        return False
+    if not len(selected):
+        return True
+
+    positions_to_close = [open_positions[i] for i in selected]
+    # As margens por posição são marginais: confere o conjunto inteiro contra o livro
+    closed_buy = sum(p.volume for p in positions_to_close if p.type == mt5.ORDER_TYPE_BUY)
+    closed_sell = sum(p.volume for p in positions_to_close if p.type == mt5.ORDER_TYPE_SELL)
+    book_total = book_margin(*book, unit_margin, ratio)
+    freed = book_total - book_margin(book[0] - closed_buy, book[1] - closed_sell, unit_margin, ratio)
+    if account_margin and book_total > 0:
+        freed *= account_margin / book_total
+    if freed < needed:
+        logger.warning(f"[MARGEM] O conjunto escolhido libera só ~{freed:.2f} de margem (necessário {needed:.2f}).")
+    logger.info(
+        f"[MARGEM] Fechando {len(positions_to_close)} posição(ões) para liberar {freed:.2f} "
+        f"de margem (necessário {needed:.2f}), perda realizada {sum(min(p.profit, 0) for p in positions_to_close):.2f}: "
+        f"{[p.ticket for p in positions_to_close]}"
+    )
+    if config.get("close_by_enabled", False):
+        close_positions_netted(positions_to_close, logger, tag="[MARGEM]")
+    else:
+        for position in positions_to_close:
+            close_position(position, logger)
+    return True
+
 def modify_order_sl_tp(price_open, order_type, ticket, tp, sl, logger):
     """
     Modifica uma ordem existente para adicionar ou alterar o Take Profit e o Stop Loss.
@@ -191,14 +358,37 @@ def modify_order_sl_tp(price_open, order_type, ticket, tp, sl, logger):
 
     return result
 
+def set_position_sl(position, sl, logger):
+    """Move só o SL de uma posição (mantém o TP atual), com preço absoluto."""
+    request = {
+        "action": mt5.TRADE_ACTION_SLTP,
+        "position": position.ticket,
+        "symbol": position.symbol,
+        "sl": round(sl, 2),
+        "tp": position.tp,
+    }
+
+    result = mt5.order_send(request)
+
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        reason = mt5.last_error() if result is None else f"{result.comment} (retcode: {result.retcode})"
+        logger.error(f"Falha ao mover o SL do ticket {position.ticket} para {sl:.2f}: {reason}")
+        return False
+    return True
+
 def validate_margin_free(margin_free_perc, order_type, config, logger):
     mf_perc_config = config.get("margin_free_perc", 0.5)
     
     if margin_free_perc > 0 and margin_free_perc < mf_perc_config:
+        volume = preflight_volume(config["symbol"], mt5.ORDER_TYPE_SELL, config["volume"], config, logger)
+        if volume is None:
+            logger.warning("[PREFLIGHT] SELL de proteção não enviada: margem insuficiente.")
+            return
+
         place_order(
             symbol=config["symbol"],
             order_type=mt5.ORDER_TYPE_SELL,
-            volume=config["volume"],
+            volume=volume,
             magic_number=config["magic_number"],
             stop_points=config["stop_points"],
             profit_points=config["profit_points"],
@@ -215,10 +405,16 @@ def open_order_hedge(symbol, order_type, config, logger, positions=None, profit_
     profit = profit_points if profit_points is not None else config.get("profit_points")
     logger.info(f"[OPEN_ORDER] Tentando abrir ordem {order_type} para {symbol} (TP={profit}, SL={config.get('stop_points')}, vol={config.get('volume')})")
 
+    # Pré-verificação de margem: não envia o que o terminal rejeitaria por NO_MONEY
+    volume = preflight_volume(symbol, order_type, config["volume"], config, logger)
+    if volume is None:
+        logger.warning("[OPEN_ORDER] Ordem não enviada: margem insuficiente na pré-verificação.")
+        return None
+
     result, detail = place_order(
         symbol=symbol,
         order_type=order_type,
-        volume=config["volume"],
+        volume=volume,
         magic_number=config["magic_number"],
         stop_points=config["stop_points"],
         profit_points=profit,
@@ -258,10 +454,16 @@ def open_new_order(symbol, order_type, config, logger, positions=None, profit_po
     profit = profit_points if profit_points is not None else config.get("profit_points")
     logger.info(f"[OPEN_ORDER] Tentando abrir ordem {order_type} para {symbol} (TP={profit}, SL={config.get('stop_points')}, vol={config.get('volume')})")
 
+    # Pré-verificação de margem: não envia o que o terminal rejeitaria por NO_MONEY
+    volume = preflight_volume(symbol, order_type, config["volume"], config, logger)
+    if volume is None:
+        logger.warning("[OPEN_ORDER] Ordem não enviada: margem insuficiente na pré-verificação.")
+        return None
+
     result, _ = place_order(
         symbol=symbol,
         order_type=order_type,
-        volume=config["volume"],
+        volume=volume,
         magic_number=config["magic_number"],
         stop_points=config["stop_points"],
         profit_points=profit,
@@ -291,8 +493,11 @@ def open_new_order(symbol, order_type, config, logger, positions=None, profit_po
 
     return result
     
-def place_order(symbol, order_type, volume, magic_number, stop_points, profit_points, logger):
-    """Coloca uma ordem direcional com TP/SL."""
+def place_order(symbol, order_type, volume, magic_number, stop_points, profit_points, logger, comment_suffix=""):
+    """
+    Coloca uma ordem direcional com TP/SL.
+    'comment_suffix' é anexado ao comentário (ex.: sub-lotes de uma ordem fundida).
+    """
     
     symbol_info = mt5.symbol_info(symbol)
     if symbol_info is None:
@@ -327,7 +532,7 @@ def place_order(symbol, order_type, volume, magic_number, stop_points, profit_po
         logger.error("Tipo de ordem inválido.")
         return False
     
-    comment = f"{round(profit_points * point, 1)}x{round(stop_points * point, 1)}"
+    comment = f"{round(profit_points * point, 1)}x{round(stop_points * point, 1)}{comment_suffix}"
 
     request = {
         "action": mt5.TRADE_ACTION_DEAL,
@@ -360,6 +565,87 @@ def place_order(symbol, order_type, volume, magic_number, stop_points, profit_po
     logger.info(f"[ORDEM ENVIADA] Ticket: {result.order}, Preço: {result.price}, Volume: {result.volume}")
     return True, result
 
+def pending_sl_tp(order_type, price, stop_points, profit_points, point):
+    """Preços de SL/TP de uma ordem pendente a partir do preço de ativação."""
+    if order_type in (mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_BUY_LIMIT):
+        sl = price - stop_points * point if stop_points else 0.0
+        tp = price + profit_points * point if profit_points else 0.0
+    else:
+        sl = price + stop_points * point if stop_points else 0.0
+        tp = price - profit_points * point if profit_points else 0.0
+    return sl, tp
+
+def place_pending_order(symbol, order_type, price, volume, magic_number, logger, sl=0.0, tp=0.0, comment=""):
+    """
+    Coloca uma ordem pendente (BUY/SELL STOP ou LIMIT) no preço informado.
+    Retorna o ticket da ordem ou None.
+    """
+    request = {
+        "action": mt5.TRADE_ACTION_PENDING,
+        "symbol": symbol,
+        "volume": volume,
+        "type": order_type,
+        "price": round(price, 2),
+        "sl": round(sl, 2),
+        "tp": round(tp, 2),
+        "magic": magic_number,
+        "comment": comment,
+        "type_time": mt5.ORDER_TIME_GTC,
+        "type_filling": mt5.ORDER_FILLING_RETURN,
+    }
+
+    result = mt5.order_send(request)
+
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        reason = mt5.last_error() if result is None else f"{result.comment} (retcode: {result.retcode})"
+        logger.error(f"[PENDENTE] Falha ao colocar ordem {order_type} @ {price:.2f}: {reason}")
+        return None
+
+    logger.info(f"[PENDENTE] Ordem {result.order} colocada: tipo {order_type} @ {price:.2f}, volume {volume}")
+    return result.order
+
+def modify_pending_order(ticket, price, logger, sl=0.0, tp=0.0):
+    """Move o preço (e SL/TP) de uma ordem pendente."""
+    request = {
+        "action": mt5.TRADE_ACTION_MODIFY,
+        "order": ticket,
+        "price": round(price, 2),
+        "sl": round(sl, 2),
+        "tp": round(tp, 2),
+        "type_time": mt5.ORDER_TIME_GTC,
+    }
+
+    result = mt5.order_send(request)
+
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        reason = mt5.last_error() if result is None else f"{result.comment} (retcode: {result.retcode})"
+        logger.error(f"[PENDENTE] Falha ao mover ordem {ticket} para {price:.2f}: {reason}")
+        return False
+    return True
+
+def cancel_pending_order(ticket, logger):
+    """Remove uma ordem pendente."""
+    result = mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": ticket})
+
+    if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+        reason = mt5.last_error() if result is None else f"{result.comment} (retcode: {result.retcode})"
+        logger.error(f"[PENDENTE] Falha ao cancelar ordem {ticket}: {reason}")
+        return False
+
+    logger.info(f"[PENDENTE] Ordem {ticket} cancelada.")
+    return True
+
+def get_pending_orders(symbol, magic_number=None, comment_prefix=None):
+    """Ordens pendentes do símbolo, opcionalmente filtradas por magic e prefixo do comentário."""
+    orders = mt5.orders_get(symbol=symbol)
+    if orders is None:
+        return None
+    return [
+        o for o in orders
+        if (magic_number is None or o.magic == magic_number)
+        and (comment_prefix is None or o.comment.startswith(comment_prefix))
+    ]
+
 def get_historical_data(symbol, timeframe, start_time, end_time, logger):
     """Obtém dados históricos dentro do período especificado"""
     if start_time.tzinfo is None:
@@ -386,7 +672,13 @@ def get_historical_by_hours(config, logger, timeframe:None):
     else:
         timeframe = config[timeframe]
 
-    df = get_historical_data(config['symbol'], timeframe, start_time, end_time, logger)
+    df = None
+    if config.get('bar_archive_enabled', False):
+        # Fatia do arquivo local de barras (só o delta é buscado no MT5)
+        df = get_archived_history(config, timeframe, start_time, end_time, logger)
+
+    if df is None:
+        df = get_historical_data(config['symbol'], timeframe, start_time, end_time, logger)
     
     if df is None or df.empty:
         logger.error("Erro ao carregar os dados históricos ou DataFrame vazio.")
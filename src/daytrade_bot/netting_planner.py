@@ -0,0 +1,89 @@
+# netting_planner.py
+"""
+-----------------------------------------------------------------------------
+ PLANEJADOR DE NETTING (TRADE_ACTION_CLOSE_BY)
+
+ Fechar uma BUY e uma SELL com duas ordens a mercado paga o spread duas
+ vezes. Com CLOSE_BY, uma posição é fechada pela oposta numa única
+ requisição, sem spread: ambas são fechadas pelo volume menor e a maior
+ continua aberta com a diferença (fechamento parcial).
+
+ plan_close_by() recebe as posições que o robô decidiu fechar e monta o
+ menor plano que fecha por netting todo o volume possível
+ (min(volume BUY, volume SELL)); só o resíduo de um dos lados vai a mercado.
+
+ Funções puras: não dependem do MT5. A execução fica em
+ mt5_order.close_positions_netted().
+-----------------------------------------------------------------------------
+"""
+
+CLOSE_BY = "close_by"
+CLOSE = "close"
+
+_BUY, _SELL = 0, 1  # mt5.ORDER_TYPE_BUY / ORDER_TYPE_SELL
+
+
+def _volume_key(volume):
+    return round(volume, 8)
+
+
+def plan_close_by(positions):
+    """
+    Monta o plano de fechamento com o máximo de volume fechado por CLOSE_BY.
+
+    1. Pares de volumes idênticos (cada par = 1 requisição, as duas somem).
+    2. O restante é casado do maior para o maior: cada requisição fecha por
+       completo pelo menos uma das posições; a outra segue com o resto.
+    3. O que sobra de um lado só é fechado a mercado.
+
+    Args:
+        positions (list): Posições a fechar (com ticket, type, volume).
+
+    Returns:
+        list: Passos em ordem de execução:
+              (CLOSE_BY, posição, posição_oposta, volume) ou
+              (CLOSE, posição, volume_restante).
+    """
+    buys = [p for p in positions if p.type == _BUY]
+    sells = [p for p in positions if p.type == _SELL]
+    steps = []
+
+    # 1. Volumes idênticos
+    sells_by_volume = {}
+    for s in sells:
+        sells_by_volume.setdefault(_volume_key(s.volume), []).append(s)
+    unmatched_buys = []
+    for b in buys:
+        candidates = sells_by_volume.get(_volume_key(b.volume))
+        if candidates:
+            s = candidates.pop()
+            steps.append((CLOSE_BY, b, s, _volume_key(b.volume)))
+        else:
+            unmatched_buys.append(b)
+    unmatched_sells = [s for group in sells_by_volume.values() for s in group]
+
+    # 2. Maior contra maior, levando o resto adiante
+    remaining_buys = sorted(([b, b.volume] for b in unmatched_buys), key=lambda x: -x[1])
+    remaining_sells = sorted(([s, s.volume] for s in unmatched_sells), key=lambda x: -x[1])
+    i = j = 0
+    while i < len(remaining_buys) and j < len(remaining_sells):
+        buy, sell = remaining_buys[i], remaining_sells[j]
+        volume = _volume_key(min(buy[1], sell[1]))
+        steps.append((CLOSE_BY, buy[0], sell[0], volume))
+        buy[1] = _volume_key(buy[1] - volume)
+        sell[1] = _volume_key(sell[1] - volume)
+        if buy[1] <= 0:
+            i += 1
+        if sell[1] <= 0:
+            j += 1
+
+    # 3. Resíduo a mercado
+    for position, volume in remaining_buys[i:] + remaining_sells[j:]:
+        steps.append((CLOSE, position, volume))
+
+    return steps
+
+
+def netted_volume(steps):
+    """Volume total fechado por CLOSE_BY no plano (por lado)."""
+    return _volume_key(sum(step[3] for step in steps if step[0] == CLOSE_BY))
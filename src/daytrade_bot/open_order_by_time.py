@@ -1,7 +1,7 @@
 import MetaTrader5 as mt5
 import json
-import time
 from datetime import datetime, timedelta
+from . import clock
 from .logger_config import setup_logger
 
 def carregar_config(caminho_arquivo='config.json'):
@@ -234,13 +234,13 @@ def check_positions_condition(positions, order_type, target_up, target_down, log
         if price_current < min_price_open - target_down:
             global last_buy_target_down_time
             # Calcula há quanto tempo a condição foi ativada pela última vez
-            seconds_since_last_trigger = (datetime.now() - last_buy_target_down_time).total_seconds()
+            seconds_since_last_trigger = (clock.now() - last_buy_target_down_time).total_seconds()
             
             if seconds_since_last_trigger >= target_down_interval_seconds:
                 logger.info(f"[COND BUY] Preço {price_current:.2f} < min_open {min_price_open:.2f} - target_down {target_down}")
                 logger.info(f"[COND BUY] Cooldown de {target_down_interval_seconds}s atendido. Permitindo nova ordem.")
                 # Atualiza o tempo da última ativação para AGORA
-                last_buy_target_down_time = datetime.now()
+                last_buy_target_down_time = clock.now()
                 return True
             else:
                 logger.info(f"[COND BUY] Bloqueado por cooldown. Última ativação há {seconds_since_last_trigger:.1f}s.")
@@ -254,13 +254,13 @@ def check_positions_condition(positions, order_type, target_up, target_down, log
         if price_current > max_price_open + target_down:
             # Calcula há quanto tempo a condição foi ativada pela última vez
             global last_sell_target_down_time
-            seconds_since_last_trigger = (datetime.now() - last_sell_target_down_time).total_seconds()
+            seconds_since_last_trigger = (clock.now() - last_sell_target_down_time).total_seconds()
 
             if seconds_since_last_trigger >= target_down_interval_seconds:
                 logger.info(f"[COND SELL] Preço {price_current:.2f} > max_open {max_price_open:.2f} + target_down {target_down}")
                 logger.info(f"[COND SELL] Cooldown de {target_down_interval_seconds}s atendido. Permitindo nova ordem.")
                 # Atualiza o tempo da última ativação para AGORA
-                last_sell_target_down_time = datetime.now()
+                last_sell_target_down_time = clock.now()
                 return True
             else:
                 logger.info(f"[COND SELL] Bloqueado por cooldown. Última ativação há {seconds_since_last_trigger:.1f}s.")
@@ -566,11 +566,11 @@ def open_order_buy_by_time(config, logger, type_order):
             # --- Verificação de HEDGE ---
             # check_and_place_hedge_sell(config, logger)                
 
-            time.sleep(sleep_time)
+            clock.sleep(sleep_time)
 
         except Exception as e:
             logger.error(f"Ocorreu um erro inesperado no loop principal: {e}")
-            time.sleep(60)
+            clock.sleep(60)
 
 
 # Inicializamos com um tempo muito antigo para garantir que a primeira verificação sempre passe
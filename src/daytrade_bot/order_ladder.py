@@ -0,0 +1,221 @@
+# order_ladder.py
+"""
+-----------------------------------------------------------------------------
+ ESCADA DE ORDENS PENDENTES (GRID)
+
+ check_positions_condition() abre uma ordem a mercado quando um poll vê o
+ preço além de max_open + target_up ou min_open - target_down; entre dois
+ polls o nível pode ser perdido ou atingido com atraso.
+
+ A escada mantém no servidor uma ordem pendente em cada um desses níveis:
+
+   BUY:  BUY STOP   em max_open + target_up    (nível "up")
+         BUY LIMIT  em min_open - target_down  (nível "down")
+   SELL: SELL STOP  em min_open - target_up    (nível "up")
+         SELL LIMIT em max_open + target_down  (nível "down")
+
+ A cada ciclo, sync() compara os níveis desejados com as pendentes
+ existentes (identificadas pelo magic e pelo comentário "ladder <nível>"):
+ coloca as que faltam, move as que mudaram (além da tolerância) e cancela
+ as que não devem existir, como quando as entradas estão bloqueadas
+ (tendência, cooldown de threshold). Depois que o nível "down" é
+ executado, ele só volta a ser armado após target_down_interval_seconds,
+ como no poll.
+
+ Sem posições não há grid: a primeira entrada continua a mercado, e o
+ chamador cancela a escada (cancel_all) quando não há posições ou quando as
+ entradas do ciclo são adiadas. O volume de cada pendente nova passa pela
+ pré-verificação de margem (order_planner.preflight_volume).
+-----------------------------------------------------------------------------
+"""
+import MetaTrader5 as mt5
+
+from . import clock as bot_clock
+from .mt5_order import (
+    cancel_pending_order, get_pending_orders, modify_pending_order, pending_sl_tp, place_pending_order,
+)
+from .order_planner import preflight_volume
+
+UP = "up"
+DOWN = "down"
+COMMENT_PREFIX = "ladder"
+
+
+def ladder_levels(positions, order_type, target_up, target_down):
+    """
+    Função Pura: {nível: (tipo da pendente, preço)} a partir do livro do lado.
+    Retorna {} se não houver posições desse tipo.
+    """
+    prices = [p.price_open for p in positions if p.type == order_type]
+    if not prices:
+        return {}
+
+    min_price_open, max_price_open = min(prices), max(prices)
+    if order_type == mt5.ORDER_TYPE_BUY:
+        return {
+            UP: (mt5.ORDER_TYPE_BUY_STOP, max_price_open + target_up),
+            DOWN: (mt5.ORDER_TYPE_BUY_LIMIT, min_price_open - target_down),
+        }
+    return {
+        UP: (mt5.ORDER_TYPE_SELL_STOP, min_price_open - target_up),
+        DOWN: (mt5.ORDER_TYPE_SELL_LIMIT, max_price_open + target_down),
+    }
+
+
+def is_crossed(pending_type, price, tick):
+    """True se o preço atual já passou do nível (a pendente seria rejeitada)."""
+    if pending_type == mt5.ORDER_TYPE_BUY_STOP:
+        return tick.ask >= price
+    if pending_type == mt5.ORDER_TYPE_BUY_LIMIT:
+        return tick.ask <= price
+    if pending_type == mt5.ORDER_TYPE_SELL_STOP:
+        return tick.bid <= price
+    return tick.bid >= price  # SELL LIMIT
+
+
+class OrderLadder:
+    """Mantém as pendentes do grid de um lado (BUY ou SELL) sincronizadas com o livro."""
+
+    def __init__(self, symbol, order_type, magic_number, volume, target_up, target_down,
+                 stop_points, profit_points, point, down_interval_seconds=0, reprice_tolerance=0.0,
+                 clock=bot_clock.time, config=None, logger=None):
+        self.symbol = symbol
+        self.order_type = order_type
+        self.magic_number = magic_number
+        self.volume = volume
+        self.target_up = target_up
+        self.target_down = target_down
+        self.stop_points = stop_points
+        self.profit_points = profit_points
+        self.point = point
+        self.down_interval_seconds = down_interval_seconds
+        self.reprice_tolerance = reprice_tolerance
+        self._clock = clock
+        self.config = config  # Para a pré-verificação de margem (None = sem pré-verificação)
+        self.logger = logger
+        self._cleared = False  # cancel_all já limpou e nenhum sync armou nada depois
+        self._tickets = {}    # {nível: ticket da pendente colocada por nós}
+        self._filled_at = {}  # {nível: instante em que a pendente sumiu sem ser cancelada}
+
+    @classmethod
+    def from_config(cls, config, order_type, logger=None):
+        point = config['point']
+        target_up = config.get('target_up_dollars')
+        target_down = config.get('target_down_dollars')
+        if target_up is None and config.get('target_up_pts') is not None:
+            target_up = config['target_up_pts'] * point
+        if target_down is None and config.get('target_down_pts') is not None:
+            target_down = config['target_down_pts'] * point
+        if target_up is None or target_down is None:
+            return None
+        return cls(
+            config['symbol'], order_type, config['magic_number'], config['volume'],
+            target_up, target_down, config['stop_points'], config['profit_points'], point,
+            down_interval_seconds=config.get('target_down_interval_seconds', 0),
+            reprice_tolerance=config.get('ladder_reprice_tolerance_points', 0) * point,
+            config=config, logger=logger,
+        )
+
+    def sync(self, positions, tick, active, logger):
+        """
+        Ajusta as pendentes ao livro atual.
+
+        Args:
+            positions (list): Posições do robô (o lado é filtrado aqui).
+            tick: Tick atual (bid/ask).
+            active (bool): Se novas entradas são permitidas agora. Se False,
+                todas as pendentes da escada são canceladas.
+
+        Returns:
+            bool: True se o poll de entradas a mercado deve rodar: algum nível
+            já foi ultrapassado pelo preço, ou as pendentes não puderam ser lidas.
+        """
+        orders = get_pending_orders(self.symbol, self.magic_number, COMMENT_PREFIX)
+        if orders is None:
+            logger.warning("[LADDER] Não foi possível ler as ordens pendentes. Entradas ficam com o poll.")
+            return True
+        self._cleared = False
+
+        current = {}
+        for order in orders:
+            level = order.comment[len(COMMENT_PREFIX):].strip()
+            if level in current:
+                cancel_pending_order(order.ticket, logger)  # Duplicada
+            else:
+                current[level] = order
+
+        # Pendente nossa que sumiu sem ser cancelada: foi executada
+        now = self._clock()
+        for level, ticket in self._tickets.items():
+            if current.get(level) is None or current[level].ticket != ticket:
+                self._filled_at[level] = now
+        self._tickets = {level: order.ticket for level, order in current.items()}
+
+        desired = ladder_levels(positions, self.order_type, self.target_up, self.target_down) if active else {}
+        placed = moved = cancelled = 0
+        crossed = False
+
+        for level, (pending_type, price) in desired.items():
+            existing = current.pop(level, None)
+
+            waiting = level == DOWN and now - self._filled_at.get(DOWN, float("-inf")) < self.down_interval_seconds
+            level_crossed = is_crossed(pending_type, price, tick)
+            crossed = crossed or (level_crossed and not waiting)
+            if waiting or level_crossed or (existing is not None and existing.type != pending_type):
+                if existing is not None and cancel_pending_order(existing.ticket, logger):
+                    self._tickets.pop(level, None)
+                    cancelled += 1
+                    existing = None
+                if waiting or level_crossed:
+                    continue
+
+            sl, tp = pending_sl_tp(pending_type, price, self.stop_points, self.profit_points, self.point)
+            if existing is None:
+                volume = self.volume
+                if self.config is not None:
+                    volume = preflight_volume(self.symbol, self.order_type, volume, self.config, logger)
+                    if not volume:
+                        logger.warning(f"[LADDER] Sem margem para a pendente do nível '{level}'.")
+                        continue
+                ticket = place_pending_order(
+                    self.symbol, pending_type, price, volume, self.magic_number, logger,
+                    sl=sl, tp=tp, comment=f"{COMMENT_PREFIX} {level}",
+                )
+                if ticket:
+                    self._tickets[level] = ticket
+                    placed += 1
+            elif abs(existing.price_open - price) > self.reprice_tolerance + 1e-9:
+                if modify_pending_order(existing.ticket, price, logger, sl=sl, tp=tp):
+                    moved += 1
+
+        # Níveis que não devem mais existir
+        for level, order in current.items():
+            if cancel_pending_order(order.ticket, logger):
+                self._tickets.pop(level, None)
+                cancelled += 1
+
+        if placed or moved or cancelled:
+            logger.info(f"[LADDER] Pendentes: {placed} colocada(s), {moved} movida(s), {cancelled} cancelada(s).")
+        return crossed
+
+    def cancel_all(self, logger):
+        """
+        Remove todas as pendentes da escada (sem posições, entradas adiadas,
+        ao encerrar o robô). Depois de uma limpeza completa, chamadas seguidas
+        não consultam o servidor até o próximo sync().
+        """
+        if self._cleared:
+            return
+        orders = get_pending_orders(self.symbol, self.magic_number, COMMENT_PREFIX)
+        if orders is None:
+            return
+        cancelled = [order for order in orders if cancel_pending_order(order.ticket, logger)]
+        if cancelled:
+            logger.info(f"[LADDER] {len(cancelled)} pendente(s) cancelada(s).")
+        self._cleared = len(cancelled) == len(orders)
+        self._tickets = {}
+
+    def stop(self):
+        """Cancela as pendentes (troca do serviço no hot reload ou encerramento)."""
+        if self.logger is not None:
+            self.cancel_all(self.logger)
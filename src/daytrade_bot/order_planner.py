@@ -0,0 +1,299 @@
+# order_planner.py
+import math
+import MetaTrader5 as mt5
+from . import market_feed
+from .margin_recovery import book_margin, hedged_ratio
+
+"""
+-----------------------------------------------------------------------------
+ PLANEJADOR DE ORDENS (PRÉ-VERIFICAÇÃO DE MARGEM)
+
+ Um "plano" é uma lista de dicts, uma entrada por ordem a enviar:
+   {"order_type": mt5.ORDER_TYPE_SELL, "volume": 0.01,
+    "profit_points": 900, "stop_points": 1500}
+
+ Antes de qualquer order_send, o plano é cortado para caber na margem livre
+ atual usando mt5.order_calc_margin (com cache por volume/faixa de preço).
+ Assim o robô não descobre a falta de margem pelo TRADE_RETCODE_NO_MONEY.
+ Ordens contra o livro aberto do símbolo (ex.: o SELL de hedge contra os
+ BUYs) pagam só o acréscimo da margem hedgeada (symbol_info.margin_hedged),
+ que pode ser negativo: o hedge que reduz a exigência nunca é barrado.
+
+ Opcionalmente (dynamic_mf_strategy.coalesce_orders), ordens com o mesmo
+ tipo/TP/SL são fundidas numa única ordem de volume somado. Cada ordem
+ original vira um "sub-lote" lógico (lot_volume), gravado no comentário da
+ posição para permitir fechamentos parciais depois.
+-----------------------------------------------------------------------------
+"""
+
+# {(symbol, order_type, volume, price_bucket): margem exigida}
+_margin_cache = {}
+_MARGIN_CACHE_MAX = 4096
+
+
+def _price_bucket(price, bucket_size):
+    if not bucket_size or bucket_size <= 0:
+        return price
+    return round(round(price / bucket_size) * bucket_size, 8)
+
+
+def calc_margin(symbol, order_type, volume, price, bucket_size=1.0):
+    """
+    Margem exigida para (volume, preço), via mt5.order_calc_margin.
+    O preço é arredondado para a faixa 'bucket_size' e o resultado fica em cache,
+    então o terminal só é consultado quando o preço muda de faixa.
+    Retorna None se o terminal não souber calcular.
+    """
+    bucket = _price_bucket(price, bucket_size)
+    key = (symbol, order_type, round(volume, 8), bucket)
+    margin = _margin_cache.get(key)
+    if margin is None:
+        margin = mt5.order_calc_margin(order_type, symbol, volume, bucket)
+        if margin is None:
+            return None
+        if len(_margin_cache) >= _MARGIN_CACHE_MAX:
+            _margin_cache.clear()  # Faixas antigas de preço não voltam a ser usadas
+        _margin_cache[key] = margin
+    return margin
+
+
+def clear_margin_cache():
+    _margin_cache.clear()
+
+
+def floor_to_step(volume, volume_step):
+    """Arredonda o volume para baixo no múltiplo de volume_step."""
+    if not volume_step or volume_step <= 0:
+        return volume
+    steps = math.floor(volume / volume_step + 1e-9)
+    return round(steps * volume_step, 8)
+
+
+def coalesce_plan(plan, volume_max=None, volume_step=0.01):
+    """
+    Função Pura: funde as ordens com o mesmo (order_type, profit_points, stop_points).
+
+    O volume somado é dividido em ordens de no máximo 'volume_max' (em
+    múltiplos inteiros do sub-lote, para que cada posição contenha sub-lotes
+    inteiros). A ordem do plano é mantida pela primeira ocorrência de cada grupo.
+
+    Returns:
+        list: Novo plano; cada ordem fundida tem 'lot_volume' (volume do
+        sub-lote) e 'lots' (quantidade de sub-lotes).
+    """
+    groups = {}
+    for order in plan:
+        key = (order["order_type"], order.get("profit_points"), order.get("stop_points"), round(order["volume"], 8))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [order, 1]
+        else:
+            group[1] += 1
+
+    coalesced = []
+    for order, count in groups.values():
+        lot_volume = order["volume"]
+        per_order = count
+        if volume_max and volume_max > 0:
+            per_order = max(1, min(count, int(floor_to_step(volume_max, volume_step) / lot_volume + 1e-9)))
+        while count > 0:
+            lots = min(per_order, count)
+            coalesced.append({
+                **order,
+                "volume": floor_to_step(lot_volume * lots, volume_step),
+                "lot_volume": lot_volume,
+                "lots": lots,
+            })
+            count -= lots
+    return coalesced
+
+
+def coalesce_orders(symbol, plan, config, logger):
+    """
+    Aplica coalesce_plan() se 'dynamic_mf_strategy.coalesce_orders' estiver ativo,
+    respeitando volume_max/volume_step do símbolo.
+    """
+    if not config.get("dynamic_mf_strategy", {}).get("coalesce_orders", False) or len(plan) < 2:
+        return plan
+
+    symbol_info = mt5.symbol_info(symbol)
+    if not symbol_info:
+        logger.warning("[COALESCE] Sem dados do símbolo. Plano enviado sem fusão de ordens.")
+        return plan
+
+    coalesced = coalesce_plan(plan, symbol_info.volume_max, symbol_info.volume_step)
+    if len(coalesced) < len(plan):
+        logger.info(f"[COALESCE] {len(plan)} ordem(ns) fundida(s) em {len(coalesced)} requisição(ões).")
+    return coalesced
+
+
+def sub_lot_comment(order):
+    """Sufixo do comentário que identifica os sub-lotes de uma ordem fundida (ex.: ' #5x0.01')."""
+    if order.get("lots", 1) <= 1:
+        return ""
+    return f" #{order['lots']}x{order['lot_volume']:g}"
+
+
+def parse_sub_lots(comment, volume):
+    """
+    (quantidade de sub-lotes restantes, volume do sub-lote) a partir do
+    comentário da posição. Posições sem sufixo são um único lote.
+    """
+    token = (comment or "").rsplit(" ", 1)[-1]
+    if token.startswith("#") and "x" in token:
+        try:
+            lot_volume = float(token.split("x", 1)[1])
+        except ValueError:
+            lot_volume = 0.0
+        if lot_volume > 0:
+            return int(round(volume / lot_volume, 8) + 1e-9), lot_volume
+    return 1, volume
+
+
+def fit_plan_to_margin(plan, free_margin, margin_of, volume_min=0.01, volume_step=0.01, on_accept=None):
+    """
+    Função Pura: corta o plano para que a soma das margens caiba em 'free_margin'.
+
+    As ordens são aceitas em ordem. A primeira que não couber tem o volume
+    reduzido (em múltiplos de volume_step, respeitando volume_min); as
+    seguintes são rejeitadas. Ordens que não aumentam a margem (hedge) são
+    sempre aceitas, mesmo com 'free_margin' negativa.
+
+    Args:
+        plan (list): Lista de ordens (dicts com 'order_type' e 'volume').
+        free_margin (float): Margem disponível para o plano.
+        margin_of (callable): margin_of(order_type, volume) -> margem ou None.
+        volume_min (float): Volume mínimo do símbolo.
+        volume_step (float): Passo de volume do símbolo.
+        on_accept (callable): on_accept(order_type, volume) a cada ordem aceita
+            (para margin_of que depende das ordens já aceitas).
+
+    Returns:
+        tuple: (ordens aceitas, ordens rejeitadas, margem total usada), ou None
+        se a margem de alguma ordem não puder ser calculada.
+    """
+    accepted = []
+    used = 0.0
+
+    for i, order in enumerate(plan):
+        margin = margin_of(order["order_type"], order["volume"])
+        if margin is None:
+            return None
+
+        if margin <= 0 or used + margin <= free_margin:
+            accepted.append(order)
+            used += margin
+            if on_accept:
+                on_accept(order["order_type"], order["volume"])
+            continue
+
+        # Tenta uma fração da ordem: maior múltiplo do passo que ainda cabe.
+        # Busca binária, pois com hedge a margem não é proporcional ao volume
+        # (mas o que cabe continua sendo um intervalo a partir de zero).
+        # Ordens fundidas são cortadas em sub-lotes inteiros
+        remaining = free_margin - used
+        trimmed = False
+        step = order.get("lot_volume", volume_step)
+        if margin > 0 and remaining > 0:
+            low, best = 0, None
+            high = int(round(order["volume"] / step, 8) + 1e-9) - 1
+            while low < high:
+                steps = (low + high + 1) // 2
+                volume = round(steps * step, 8)
+                partial_margin = margin_of(order["order_type"], volume)
+                if partial_margin is not None and used + partial_margin <= free_margin:
+                    best, low = (volume, partial_margin), steps
+                else:
+                    high = steps - 1
+            if best and best[0] >= volume_min:
+                volume, partial_margin = best
+                partial = {**order, "volume": volume, "trimmed_from": order["volume"]}
+                if "lot_volume" in order:
+                    partial["lots"] = int(round(volume / step, 8) + 1e-9)
+                accepted.append(partial)
+                used += partial_margin
+                trimmed = True
+                if on_accept:
+                    on_accept(order["order_type"], volume)
+
+        return accepted, list(plan[i + 1:] if trimmed else plan[i:]), used
+
+    return accepted, [], used
+
+
+def preflight_plan(symbol, plan, config, logger):
+    """
+    Ajusta o plano à margem livre atual antes de enviar qualquer ordem.
+
+    Usa 'margin_preflight_min_free_perc' como reserva: depois do plano, a margem
+    livre ainda deve ser pelo menos esse percentual do equity.
+    Retorna a lista de ordens que podem ser enviadas.
+    """
+    if not config.get("margin_preflight_enabled", False) or not plan:
+        return plan
+
+    account = market_feed.account_info(symbol)
+    tick = market_feed.symbol_info_tick(symbol)
+    symbol_info = mt5.symbol_info(symbol)
+    if not account or not tick or not symbol_info:
+        logger.warning("[PREFLIGHT] Sem dados de conta/tick/símbolo. Plano enviado sem pré-verificação.")
+        return plan
+
+    reserve = account.equity * config.get("margin_preflight_min_free_perc", 0.0)
+    available = account.margin_free - reserve
+    bucket_size = config.get("margin_preflight_price_bucket", 1.0)
+
+    def price_of(order_type):
+        return tick.ask if order_type == mt5.ORDER_TYPE_BUY else tick.bid
+
+    # Livro do símbolo (todas as posições, qualquer magic) + ordens já aceitas do plano
+    book = {mt5.ORDER_TYPE_BUY: 0.0, mt5.ORDER_TYPE_SELL: 0.0}
+    for position in market_feed.positions_get(symbol) or ():
+        if position.type in book:
+            book[position.type] += position.volume
+    ratio = hedged_ratio(symbol_info)
+
+    def margin_of(order_type, volume):
+        opposite = mt5.ORDER_TYPE_SELL if order_type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
+        if book[opposite] <= book[order_type] or ratio >= 1.0:
+            # Nada a compensar: margem cheia da ordem
+            return calc_margin(symbol, order_type, volume, price_of(order_type), bucket_size)
+        unit = {t: calc_margin(symbol, t, 1.0, price_of(t), bucket_size) for t in book}
+        if None in unit.values():
+            return None
+        after = dict(book)
+        after[order_type] += volume
+        return (book_margin(after[mt5.ORDER_TYPE_BUY], after[mt5.ORDER_TYPE_SELL], unit, ratio)
+                - book_margin(book[mt5.ORDER_TYPE_BUY], book[mt5.ORDER_TYPE_SELL], unit, ratio))
+
+    def on_accept(order_type, volume):
+        book[order_type] += volume
+
+    fitted = fit_plan_to_margin(
+        plan, available, margin_of,
+        volume_min=symbol_info.volume_min,
+        volume_step=symbol_info.volume_step,
+        on_accept=on_accept,
+    )
+    if fitted is None:
+        logger.warning("[PREFLIGHT] Margem não calculada pelo terminal. Plano enviado sem pré-verificação.")
+        return plan
+
+    accepted, rejected, used = fitted
+
+    if rejected or any(o.get("trimmed_from") for o in accepted):
+        logger.warning(
+            f"[PREFLIGHT] Margem insuficiente para o plano completo: "
+            f"{len(accepted)}/{len(plan)} ordem(ns) aceita(s), margem usada {used:.2f} "
+            f"de {available:.2f} disponível."
+        )
+    return accepted
+
+
+def preflight_volume(symbol, order_type, volume, config, logger):
+    """
+    Pré-verificação de uma única ordem.
+    Retorna o volume que cabe na margem (possivelmente reduzido) ou None.
+    """
+    plan = preflight_plan(symbol, [{"order_type": order_type, "volume": volume}], config, logger)
+    return plan[0]["volume"] if plan else None
@@ -0,0 +1,361 @@
+# pnl_ledger.py
+"""
+-----------------------------------------------------------------------------
+ LIVRO LOCAL DE DEALS E RESULTADO REALIZADO AGREGADO (SQLite)
+
+ Os deals do terminal são gravados num banco SQLite local e, no mesmo
+ momento, somados em uma tabela de agregados por
+
+     (dia, magic, lado da posição, tag do comentário)
+
+ onde a tag é o "{tp}x{sl}" que place_order grava no comentário (sem o
+ sufixo de sub-lotes). Assim o resultado do magic_number x
+ hedge_magic_number, ou BUY x SELL por dia, sai de um SELECT na tabela
+ pequena, sem reprocessar o histórico.
+
+   - ingest(): cada deal novo (ticket ainda não gravado) faz um UPSERT
+     na sua linha do agregado: custo O(deals novos), nunca uma releitura.
+   - Deals de saída (OUT/OUT_BY/INOUT) trazem o comentário do servidor
+     ("[tp X]", "Close by"...), não o da abertura: magic, lado e tag da
+     posição vêm do deal de entrada, guardado na tabela positions.
+   - sync(): busca no terminal só os deals a partir do último já gravado.
+     Os horários dos deals são do servidor (UTC + fuso da corretora): a
+     janela termina na hora do servidor (tick do símbolo) mais um dia de
+     folga, nunca no relógio UTC local.
+
+ O resultado de um deal é profit + commission + swap + fee (a comissão de
+ entrada entra no dia da abertura).
+
+ Uso pela linha de comando:
+     python -m daytrade_bot.pnl_ledger --by magic,side --from 2026-10-01
+-----------------------------------------------------------------------------
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+
+import MetaTrader5 as mt5
+
+from . import clock
+
+_ENTRY_IN = 0  # mt5.DEAL_ENTRY_IN
+SIDES = {0: "BUY", 1: "SELL"}  # mt5.DEAL_TYPE_BUY / DEAL_TYPE_SELL
+
+# Colunas pelas quais a consulta pode agrupar
+GROUP_COLUMNS = ("day", "magic", "side", "tag")
+
+_TAG = re.compile(r"^\d+(?:\.\d+)?x\d+(?:\.\d+)?")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    ticket      INTEGER PRIMARY KEY,
+    position_id INTEGER NOT NULL,
+    time_msc    INTEGER NOT NULL,
+    day         TEXT NOT NULL,
+    magic       INTEGER NOT NULL,
+    side        TEXT NOT NULL,
+    tag         TEXT NOT NULL,
+    entry       INTEGER NOT NULL,
+    volume      REAL NOT NULL,
+    price       REAL NOT NULL,
+    net         REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    position_id INTEGER PRIMARY KEY,
+    magic       INTEGER NOT NULL,
+    side        TEXT NOT NULL,
+    tag         TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily_pnl (
+    day        TEXT NOT NULL,
+    magic      INTEGER NOT NULL,
+    side       TEXT NOT NULL,
+    tag        TEXT NOT NULL,
+    deals      INTEGER NOT NULL DEFAULT 0,
+    closes     INTEGER NOT NULL DEFAULT 0,
+    wins       INTEGER NOT NULL DEFAULT 0,
+    volume     REAL NOT NULL DEFAULT 0,
+    profit     REAL NOT NULL DEFAULT 0,
+    commission REAL NOT NULL DEFAULT 0,
+    swap       REAL NOT NULL DEFAULT 0,
+    fee        REAL NOT NULL DEFAULT 0,
+    net        REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, magic, side, tag)
+);
+CREATE INDEX IF NOT EXISTS deals_time ON deals (time_msc);
+"""
+
+# Soma de um deal na sua linha do agregado (volume/closes/wins só nas saídas)
+_UPSERT = """
+INSERT INTO daily_pnl (day, magic, side, tag, deals, closes, wins, volume, profit, commission, swap, fee, net)
+VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, magic, side, tag) DO UPDATE SET
+    deals = deals + 1,
+    closes = closes + excluded.closes,
+    wins = wins + excluded.wins,
+    volume = volume + excluded.volume,
+    profit = profit + excluded.profit,
+    commission = commission + excluded.commission,
+    swap = swap + excluded.swap,
+    fee = fee + excluded.fee,
+    net = net + excluded.net
+"""
+
+
+def comment_tag(comment):
+    """Tag "{tp}x{sl}" do comentário de abertura, sem o sufixo de sub-lotes."""
+    comment = (comment or "").strip()
+    match = _TAG.match(comment)
+    if match:
+        return match.group(0)
+    return comment.split(" #", 1)[0]
+
+
+def deal_day(time_seconds):
+    """Dia (UTC) do deal no formato AAAA-MM-DD."""
+    return datetime.fromtimestamp(int(time_seconds), tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class PnlLedger:
+    """
+    Livro de deals em SQLite com o agregado diário mantido a cada deal novo.
+
+    Args:
+        path (str): Arquivo do banco (':memory:' em testes).
+        backfill_days (float): Alcance da primeira sincronização com o terminal.
+        sync_seconds (float): Intervalo mínimo entre sincronizações em poll().
+        symbol (str): Símbolo cujo tick dá a hora do servidor (None = relógio local).
+        logger: Logger opcional.
+    """
+
+    def __init__(self, path="pnl_ledger.sqlite", backfill_days=30, sync_seconds=60, symbol=None, logger=None):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.backfill_days = backfill_days
+        self.sync_seconds = sync_seconds
+        self.symbol = symbol
+        self.logger = logger
+        self._synced_at = None
+        # Robôs BUY e SELL da mesma conta podem gravar no mesmo arquivo
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        return cls(
+            config.get('pnl_ledger_path', 'pnl_ledger.sqlite'),
+            backfill_days=config.get('pnl_ledger_backfill_days', 30),
+            sync_seconds=config.get('pnl_ledger_sync_seconds', 60),
+            symbol=config.get('symbol'),
+            logger=logger,
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def _position_key(self, deal):
+        """(magic, lado, tag) da posição do deal; entradas registram a posição."""
+        if deal.entry == _ENTRY_IN:
+            key = (deal.magic, SIDES.get(deal.type, str(deal.type)), comment_tag(deal.comment))
+            self._conn.execute("INSERT OR IGNORE INTO positions VALUES (?, ?, ?, ?)", (deal.position_id, *key))
+            return key
+        row = self._conn.execute(
+            "SELECT magic, side, tag FROM positions WHERE position_id = ?", (deal.position_id,)
+        ).fetchone()
+        if row is not None:
+            return row
+        # Entrada anterior ao livro: o lado da posição é o oposto do deal de saída
+        return deal.magic, SIDES.get(1 - deal.type, str(deal.type)), ""
+
+    def ingest(self, deals):
+        """
+        Grava os deals ainda não vistos e soma cada um no agregado.
+        Deals sem posição (depósitos, saques, créditos) são ignorados.
+
+        Returns:
+            int: Quantidade de deals novos.
+        """
+        added = 0
+        with self._conn:
+            for deal in deals or ():
+                if deal.position_id == 0 or deal.type not in SIDES:
+                    continue
+                if self._conn.execute("SELECT 1 FROM deals WHERE ticket = ?", (deal.ticket,)).fetchone():
+                    continue
+                magic, side, tag = self._position_key(deal)
+                day = deal_day(deal.time)
+                net = deal.profit + deal.commission + deal.swap + deal.fee
+                is_close = deal.entry != _ENTRY_IN
+                self._conn.execute(
+                    "INSERT INTO deals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (deal.ticket, deal.position_id, deal.time_msc, day, magic, side, tag,
+                     deal.entry, deal.volume, deal.price, net),
+                )
+                self._conn.execute(_UPSERT, (
+                    day, magic, side, tag, int(is_close), int(is_close and deal.profit > 0),
+                    deal.volume if is_close else 0.0,
+                    deal.profit, deal.commission, deal.swap, deal.fee, net,
+                ))
+                added += 1
+        return added
+
+    def last_deal_msc(self):
+        row = self._conn.execute("SELECT MAX(time_msc) FROM deals").fetchone()
+        return row[0]
+
+    def server_time(self, now=None):
+        """Hora do servidor (tick do símbolo, como em mt5_history); sem tick, 'now' / relógio local."""
+        tick = mt5.symbol_info_tick(self.symbol) if self.symbol else None
+        if tick:
+            return tick.time
+        return clock.time() if now is None else now
+
+    def sync(self, now=None):
+        """
+        Busca no terminal os deals desde o último gravado e os registra.
+
+        Returns:
+            int | None: Deals novos, ou None se o terminal não respondeu.
+        """
+        server_now = self.server_time(now)
+        last_msc = self.last_deal_msc()
+        if last_msc is None:
+            start = server_now - self.backfill_days * 86400
+        else:
+            start = last_msc // 1000 - 1  # Sobreposição de 1s: repetidos são ignorados pelo ticket
+        # Um dia de folga no fim: cobre o fuso do servidor mesmo sem tick
+        deals = mt5.history_deals_get(
+            datetime.fromtimestamp(start, tz=timezone.utc),
+            datetime.fromtimestamp(server_now + 86400, tz=timezone.utc),
+        )
+        if deals is None:
+            return None
+        return self.ingest(deals)
+
+    def poll(self):
+        """Sincroniza se já passou 'sync_seconds' desde a última vez (chamado a cada ciclo)."""
+        now = clock.time()
+        if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+            return 0
+        self._synced_at = now
+        try:
+            added = self.sync(now)
+        except sqlite3.Error as e:
+            if self.logger:
+                self.logger.error(f"[LEDGER] Erro ao gravar deals em {self.path}: {e}")
+            return 0
+        if added is None and self.logger:
+            self.logger.warning(f"[LEDGER] Histórico de deals indisponível: {mt5.last_error()}")
+        elif added and self.logger:
+            self.logger.debug(f"[LEDGER] {added} deal(s) novo(s) no livro.")
+        return added or 0
+
+    def rollup(self, by=GROUP_COLUMNS, start_day=None, end_day=None, magic=None, side=None, tag=None):
+        """
+        Resultado realizado agrupado por 'by' (subconjunto de GROUP_COLUMNS).
+
+        Args:
+            start_day, end_day (str): Intervalo de dias (AAAA-MM-DD, inclusivo).
+            magic, side, tag: Filtros opcionais.
+
+        Returns:
+            list[dict]: Uma linha por grupo, ordenada pelas colunas de 'by'.
+        """
+        by = [column for column in by if column]
+        unknown = set(by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Colunas de agrupamento inválidas: {', '.join(sorted(unknown))}")
+
+        where, params = [], []
+        for column, op, value in (("day", ">=", start_day), ("day", "<=", end_day),
+                                  ("magic", "=", magic), ("side", "=", side), ("tag", "=", tag)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+
+        columns = ", ".join(by)
+        sql = (
+            f"SELECT {columns + ', ' if by else ''}SUM(deals), SUM(closes), SUM(wins), SUM(volume), "
+            "SUM(profit), SUM(commission), SUM(swap), SUM(fee), SUM(net) FROM daily_pnl"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if by:
+            sql += f" GROUP BY {columns} ORDER BY {columns}"
+
+        names = by + ["deals", "closes", "wins", "volume", "profit", "commission", "swap", "fee", "net"]
+        rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(names, row)) for row in rows if row[len(by)] is not None]
+
+
+def format_rollup(rows):
+    """Tabela de texto para o terminal."""
+    if not rows:
+        return "(sem deals no período)"
+    columns = list(rows[0])
+    cells = [[f"{v:.2f}" if isinstance(v, float) else str(v) for v in row.values()] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(r, widths)) for r in cells]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resultado realizado por dia, magic, lado e tag (livro local).")
+    parser.add_argument("--db", help="Arquivo do livro (padrão: pnl_ledger_path da config).")
+    parser.add_argument("--by", default="day,magic,side,tag", help=f"Agrupamento: {','.join(GROUP_COLUMNS)}.")
+    parser.add_argument("--from", dest="start_day", help="Primeiro dia (AAAA-MM-DD).")
+    parser.add_argument("--to", dest="end_day", help="Último dia (AAAA-MM-DD).")
+    parser.add_argument("--days", type=int, help="Últimos N dias (alternativa a --from).")
+    parser.add_argument("--magic", type=int)
+    parser.add_argument("--side", choices=sorted(SIDES.values()))
+    parser.add_argument("--tag")
+    parser.add_argument("--sync", metavar="TYPE", help="Sincroniza antes com o terminal (BUY/SELL: config e conta).")
+    parser.add_argument("--env", default="demo")
+    args = parser.parse_args(argv)
+
+    config = None
+    if args.sync or not args.db:
+        from .config_loader import load_json_config
+        config = load_json_config(f"config_{(args.sync or 'BUY').lower()}")
+    if args.db:
+        ledger = PnlLedger(args.db, symbol=config['symbol'] if config else None)
+    else:
+        ledger = PnlLedger.from_config(config)
+
+    try:
+        if args.sync:
+            from .logger_config import setup_logger
+            from .mt5_order import carregar_conta, initialize_mt5
+
+            logger = setup_logger(f"{config['symbol']}_pnl_ledger")
+            if not initialize_mt5(carregar_conta(args.sync.upper(), args.env), logger, config['mt5_path']):
+                return 1
+            try:
+                added = ledger.sync()
+            finally:
+                mt5.shutdown()
+            if added is None:
+                print(f"Falha ao ler o histórico do terminal: {mt5.last_error()}", file=sys.stderr)
+            else:
+                print(f"{added} deal(s) novo(s) sincronizado(s).", file=sys.stderr)
+
+        start_day = args.start_day
+        if args.days is not None:
+            start_day = (datetime.now(timezone.utc) - timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+        rows = ledger.rollup(
+            args.by.split(","), start_day=start_day, end_day=args.end_day,
+            magic=args.magic, side=args.side, tag=args.tag,
+        )
+        print(format_rollup(rows))
+    finally:
+        ledger.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
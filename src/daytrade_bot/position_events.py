@@ -0,0 +1,151 @@
+# position_events.py
+"""
+Diferença entre snapshots consecutivos de posições e eventos de ciclo de vida.
+
+O PositionTracker recebe a lista de posições do ciclo (mt5.positions_get),
+compara com o snapshot anterior por ticket e emite eventos:
+
+  opened          ticket novo
+  closed          ticket que sumiu (TP, SL, fechamento manual ou pelo robô)
+  sltp_modified   SL ou TP alterado
+  volume_changed  fechamento parcial
+
+Os agregados por (magic, tipo) — quantidade, volume e lucro — são mantidos
+na mesma passada, por diferença, em vez de cada gerenciador varrer o livro.
+Os assinantes (índice de expiração, hedge, diário, métricas) só recebem os
+eventos, ou seja, trabalham em O(mudanças) por ciclo.
+"""
+from collections import namedtuple
+
+OPENED = "opened"
+CLOSED = "closed"
+SLTP_MODIFIED = "sltp_modified"
+VOLUME_CHANGED = "volume_changed"
+
+# position: posição atual (no 'closed', a última vista); previous: a do snapshot anterior
+PositionEvent = namedtuple("PositionEvent", ["kind", "ticket", "position", "previous"])
+
+
+class _Aggregate:
+    __slots__ = ("count", "volume", "profit")
+
+    def __init__(self):
+        self.count = 0
+        self.volume = 0.0
+        self.profit = 0.0
+
+    def add(self, position, sign=1):
+        self.count += sign
+        self.volume += sign * position.volume
+        self.profit += sign * position.profit
+
+
+class PositionTracker:
+    """Mantém o último snapshot de posições, seus agregados e os assinantes de eventos."""
+
+    def __init__(self):
+        self._positions = {}   # {ticket: posição}
+        self._aggregates = {}  # {(magic, tipo): _Aggregate}
+        self._subscribers = []  # [(callback, kinds, predicate)]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, ticket):
+        return ticket in self._positions
+
+    def get(self, ticket):
+        return self._positions.get(ticket)
+
+    def positions(self):
+        """Snapshot atual (tupla, na ordem do terminal)."""
+        return tuple(self._positions.values())
+
+    def subscribe(self, callback, kinds=None, predicate=None):
+        """
+        Registra callback(event). 'kinds' limita os tipos de evento; 'predicate'
+        filtra pela posição (ex.: só o magic do robô).
+        """
+        self._subscribers.append((callback, frozenset(kinds) if kinds else None, predicate))
+
+    def _aggregate(self, position):
+        key = (position.magic, position.type)
+        aggregate = self._aggregates.get(key)
+        if aggregate is None:
+            aggregate = self._aggregates[key] = _Aggregate()
+        return aggregate
+
+    def aggregate(self, magic=None, order_type=None):
+        """Quantidade, volume e lucro somados das posições com esse magic/tipo (None = todos)."""
+        count, volume, profit = 0, 0.0, 0.0
+        for (key_magic, key_type), aggregate in self._aggregates.items():
+            if (magic is None or key_magic == magic) and (order_type is None or key_type == order_type):
+                count += aggregate.count
+                volume += aggregate.volume
+                profit += aggregate.profit
+        return {"count": count, "volume": round(volume, 8), "profit": round(profit, 2)}
+
+    def update(self, positions):
+        """
+        Compara 'positions' com o snapshot anterior, atualiza os agregados e
+        notifica os assinantes. Retorna a lista de eventos.
+        """
+        if positions is None:
+            return []  # Falha na leitura do terminal: mantém o snapshot anterior
+
+        previous = self._positions
+        current = {}
+        events = []
+        opened = 0
+
+        for position in positions:
+            ticket = position.ticket
+            current[ticket] = position
+            old = previous.get(ticket)
+            if old is None:
+                opened += 1
+                self._aggregate(position).add(position)
+                events.append(PositionEvent(OPENED, ticket, position, None))
+                continue
+
+            aggregate = self._aggregate(position)
+            aggregate.profit += position.profit - old.profit
+            if position.volume != old.volume:
+                aggregate.volume += position.volume - old.volume
+                events.append(PositionEvent(VOLUME_CHANGED, ticket, position, old))
+            if position.sl != old.sl or position.tp != old.tp:
+                events.append(PositionEvent(SLTP_MODIFIED, ticket, position, old))
+
+        # Só procura os fechados se as contagens não batem
+        if len(previous) + opened != len(current):
+            for ticket in previous.keys() - current.keys():
+                old = previous[ticket]
+                self._aggregate(old).add(old, sign=-1)
+                events.append(PositionEvent(CLOSED, ticket, old, old))
+
+        self._positions = current
+        self._dispatch(events)
+        return events
+
+    def _dispatch(self, events):
+        for callback, kinds, predicate in self._subscribers:
+            for event in events:
+                if kinds is not None and event.kind not in kinds:
+                    continue
+                if predicate is not None and not predicate(event.position):
+                    continue
+                callback(event)
+
+
+def journal_events(logger):
+    """Assinante que registra no log (nível DEBUG) cada evento de posição."""
+    def on_event(event):
+        p = event.position
+        if event.kind == VOLUME_CHANGED:
+            detail = f"volume {event.previous.volume} -> {p.volume}"
+        elif event.kind == SLTP_MODIFIED:
+            detail = f"SL {event.previous.sl} -> {p.sl}, TP {event.previous.tp} -> {p.tp}"
+        else:
+            detail = f"tipo {p.type}, volume {p.volume}, preço {p.price_open}, lucro {p.profit:.2f}"
+        logger.debug(f"[POSIÇÃO] {event.kind.upper()} ticket {event.ticket} (magic {p.magic}): {detail}")
+    return on_event
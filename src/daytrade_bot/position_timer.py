@@ -1,10 +1,95 @@
 # position_timer.py
 
-from datetime import datetime, timezone
+import heapq
+from datetime import timezone
 import MetaTrader5 as mt5
+from . import clock
 from .mt5_order import close_position # Importando a sua função
 
-def check_and_close_positions_by_time(positions, config, logger):
+
+class PositionExpiryIndex:
+    """
+    Índice de expiração das posições: min-heap de (open_time + duração máxima, ticket).
+
+    É mantido por diferença de snapshots (tickets novos entram, tickets que
+    sumiram são descartados de forma preguiçosa), então cada verificação só
+    olha as posições que realmente venceram.
+    """
+
+    def __init__(self, max_duration_minutes, retry_seconds=60):
+        self.max_duration_seconds = max_duration_minutes * 60
+        self.retry_seconds = retry_seconds
+        self._heap = []       # [(expira_em_ts_servidor, ticket)]
+        self._positions = {}  # {ticket: posição mais recente}
+        self._server_offset = None  # tempo do servidor - tempo local (último tick visto)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, position):
+        if position.ticket not in self._positions:
+            heapq.heappush(self._heap, (position.time + self.max_duration_seconds, position.ticket))
+        self._positions[position.ticket] = position
+
+    def remove(self, ticket):
+        # A entrada no heap é descartada quando chegar ao topo
+        self._positions.pop(ticket, None)
+
+    def sync(self, positions):
+        """Atualiza o índice a partir de um snapshot completo de posições."""
+        current = {p.ticket: p for p in positions}
+        for ticket in current.keys() - self._positions.keys():
+            heapq.heappush(self._heap, (current[ticket].time + self.max_duration_seconds, ticket))
+        self._positions = current
+
+    def on_position_event(self, event):
+        """Assinante do PositionTracker: mantém o índice só com as mudanças do ciclo."""
+        if event.kind == "opened":
+            self.add(event.position)
+        elif event.kind == "closed":
+            self.remove(event.ticket)
+        elif event.ticket in self._positions:
+            self._positions[event.ticket] = event.position
+
+    def _discard_stale(self):
+        while self._heap and self._heap[0][1] not in self._positions:
+            heapq.heappop(self._heap)
+
+    def any_position(self):
+        return next(iter(self._positions.values()), None)
+
+    def next_expiry(self):
+        """Timestamp (servidor) da próxima expiração, ou None."""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, server_ts):
+        """Remove e retorna as posições com expiração < server_ts."""
+        expired = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] >= server_ts:
+                return expired
+            _, ticket = heapq.heappop(self._heap)
+            expired.append(self._positions.pop(ticket))
+
+    def retry_later(self, position, server_ts):
+        """Reagenda uma posição cujo fechamento falhou."""
+        self._positions[position.ticket] = position
+        heapq.heappush(self._heap, (server_ts + self.retry_seconds, position.ticket))
+
+    def observe_server_time(self, server_ts):
+        self._server_offset = server_ts - clock.time()
+
+    def seconds_until_next_expiry(self):
+        """Estimativa de quanto falta para a próxima expiração (para o agendador dormir até lá)."""
+        next_ts = self.next_expiry()
+        if next_ts is None or self._server_offset is None:
+            return None
+        return max(0.0, next_ts - (clock.time() + self._server_offset))
+
+
+def check_and_close_positions_by_time(positions, config, logger, index=None):
     """
     Verifica o tempo de vida de todas as posições abertas e fecha aquelas
     que excederam o tempo máximo definido na configuração.
@@ -14,43 +99,59 @@ def check_and_close_positions_by_time(positions, config, logger):
         positions (list): A lista de posições abertas (retornada por mt5.positions_get()).
         config (module): O módulo de configuração com as variáveis.
         logger (Logger): A instância do logger para registrar as ações.
+        index (PositionExpiryIndex): Índice mantido entre ciclos. Sem ele, um
+            índice temporário é montado a partir de 'positions'.
+
+    Returns:
+        int: Quantidade de posições fechadas.
     """
     # 1. Verifica se a funcionalidade está habilitada no config
     if not config.get('close_positions_by_time_enabled', False):
-        return
+        return 0
 
     try:
         max_duration_minutes = config['max_position_duration_minutes']
-    except AttributeError:
-        logger.error("As variáveis 'CLOSE_POSITIONS_BY_TIME_ENABLED' ou 'MAX_POSITION_DURATION_MINUTES' não foram encontradas no config.")
-        return
-
-    logger.info("Iniciando verificação de tempo de vida das posições usando o tempo do servidor MT5...")
-
-    # 2. Itera sobre cada posição aberta
-    for position in positions:
-        # Pega o tempo de abertura da posição (timestamp UTC)
-        position_open_time_utc = datetime.fromtimestamp(position.time, tz=timezone.utc)
-        
-        # 3. Busca o tempo atual diretamente do servidor da corretora
-        symbol_info = mt5.symbol_info_tick(position.symbol)
-        if not symbol_info:
-            logger.error(f"Não foi possível obter informações para o símbolo {position.symbol}. Pulando verificação para o TICKET {position.ticket}.")
-            continue # Pula para a próxima posição
-
-        # O atributo 'time' do symbol_info é o timestamp da última cotação (UTC)
-        server_time_ts = symbol_info.time
-        server_time_utc = datetime.fromtimestamp(server_time_ts, tz=timezone.utc)
-        
-        # 4. Calcula a duração que a posição está aberta, usando o tempo do servidor
-        duration = server_time_utc - position_open_time_utc
-        duration_in_minutes = duration.total_seconds() / 60
-
-        # 5. Compara com o tempo máximo definido
-        if duration_in_minutes > max_duration_minutes:
-            logger.warning(
-                f"TICKET {position.ticket}: Tempo limite excedido! "
-                f"Aberta por {duration_in_minutes:.2f} min. Limite: {max_duration_minutes} min."
-            )
-            # 6. Chama a função para fechar a posição
-            close_position(position, logger)
\ No newline at end of file
+    except KeyError:
+        logger.error("As variáveis 'close_positions_by_time_enabled' ou 'max_position_duration_minutes' não foram encontradas no config.")
+        return 0
+
+    if index is None:
+        index = PositionExpiryIndex(max_duration_minutes)
+    if positions is not None:
+        index.sync(positions)
+
+    # 2. Nada venceu ainda (pela estimativa do relógio do servidor): nenhuma chamada ao terminal
+    if index.next_expiry() is None:
+        return 0
+    wait = index.seconds_until_next_expiry()
+    if wait is not None and wait > 0:
+        return 0
+
+    # 3. Busca o tempo atual do servidor uma única vez por verificação
+    symbol = index.any_position().symbol
+    tick = mt5.symbol_info_tick(symbol)
+    if not tick:
+        logger.error(f"Não foi possível obter informações para o símbolo {symbol}. Verificação de tempo adiada.")
+        return 0
+
+    server_ts = tick.time
+    index.observe_server_time(server_ts)
+    server_time_utc = clock.fromtimestamp(server_ts, tz=timezone.utc)
+
+    # 4. Só as posições que realmente venceram
+    closed = 0
+    for position in index.pop_expired(server_ts):
+        position_open_time_utc = clock.fromtimestamp(position.time, tz=timezone.utc)
+        duration_in_minutes = (server_time_utc - position_open_time_utc).total_seconds() / 60
+
+        logger.warning(
+            f"TICKET {position.ticket}: Tempo limite excedido! "
+            f"Aberta por {duration_in_minutes:.2f} min. Limite: {max_duration_minutes} min."
+        )
+        # 5. Chama a função para fechar a posição
+        if close_position(position, logger):
+            closed += 1
+        else:
+            index.retry_later(position, server_ts)
+
+    return closed
@@ -0,0 +1,325 @@
+# risk_simulator.py
+"""
+Simulação Monte Carlo de risco sobre o livro de posições atual.
+
+Para um único símbolo, o P/L de qualquer conjunto de posições é linear no
+preço: valor(bid) = valor_atual + inclinação * (bid - bid_atual), com
+inclinação = contrato * (volume BUY - volume SELL). Cada limite do config
+vira, portanto, uma barreira de preço:
+
+  dd_stop        lucro flutuante do robô <= floating_dd_stop_threshold
+  hedge_trigger  lucro dos BUYs do robô  <  hedge_trigger_profit_buy
+  margin_free    margem livre / equity   <  margin_free_perc
+  stop_out       nível de margem         <= risk_sim_stop_out_level (%)
+
+(a margem usada é considerada constante no horizonte).
+
+Os caminhos de preço são passeios log-normais com a volatilidade por barra
+estimada dos fechamentos já carregados no ciclo. Como as barreiras são
+comparadas no espaço dos choques acumulados, cada lote é só um cumsum de
+normais float32 e algumas comparações. Os lotes podem ser espalhados num
+pool de processos; a simulação roda numa thread em segundo plano e o último
+resultado é publicado na análise do ciclo (log e Excel).
+"""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BARRIERS = ("dd_stop", "hedge_trigger", "margin_free", "stop_out")
+
+_TIMEFRAME_MINUTES = {1: 1, 5: 5, 10: 10, 15: 15, 30: 30, 16385: 60, 16388: 240, 16408: 1440}
+
+_BUY, _SELL = 0, 1  # mt5.ORDER_TYPE_BUY / ORDER_TYPE_SELL
+
+
+def timeframe_minutes(timeframe):
+    return _TIMEFRAME_MINUTES.get(timeframe, timeframe if timeframe < 16384 else 60)
+
+
+def estimate_volatility(closes):
+    """Desvio padrão dos log-retornos por barra (None se houver poucos dados)."""
+    closes = np.asarray(closes, dtype=np.float64)
+    closes = closes[np.isfinite(closes) & (closes > 0)]
+    if len(closes) < 3:
+        return None
+    sigma = float(np.std(np.diff(np.log(closes)), ddof=1))
+    return sigma if sigma > 0 else None
+
+
+def exposure(positions, contract_size, magic=None, order_type=None):
+    """(lucro atual, inclinação do P/L por unidade de preço) das posições filtradas."""
+    profit = 0.0
+    net_volume = 0.0
+    for p in positions:
+        if magic is not None and p.magic != magic:
+            continue
+        if order_type is not None and p.type != order_type:
+            continue
+        profit += p.profit
+        net_volume += p.volume if p.type == _BUY else -p.volume
+    return profit, net_volume * contract_size
+
+
+def barrier_price(value_now, slope, limit, bid):
+    """
+    Preço em que valor(bid) chega a 'limit' (vindo de cima).
+    Retorna (preço, direção): direção -1 se o limite é atingido com queda,
+    +1 com alta, 0 se já foi atingido; (None, None) se inatingível.
+    """
+    if value_now <= limit:
+        return bid, 0
+    if slope == 0:
+        return None, None
+    price = bid + (limit - value_now) / slope
+    if price <= 0:
+        return None, None
+    return price, (-1 if slope > 0 else 1)
+
+
+def build_barriers(positions, account, bid, contract_size, config):
+    """
+    Barreiras de preço de cada limite a partir do livro e da conta.
+    'account' precisa de equity e margin. Retorna {nome: (preço, direção)}.
+    """
+    main_magic = config['magic_number']
+    barriers = {}
+
+    robot_profit, robot_slope = exposure(positions, contract_size, magic=main_magic)
+    dd_threshold = config.get('floating_dd_stop_threshold', 0.0)
+    barriers['dd_stop'] = barrier_price(robot_profit, robot_slope, dd_threshold, bid)
+
+    buy_profit, buy_slope = exposure(positions, contract_size, magic=main_magic, order_type=_BUY)
+    # Trigger do hedge é estrito (<): a diferença é irrelevante num preço contínuo
+    barriers['hedge_trigger'] = barrier_price(buy_profit, buy_slope, config.get('hedge_trigger_profit_buy', -80.0), bid)
+
+    _, account_slope = exposure(positions, contract_size)
+    margin = account.margin
+    if margin > 0:
+        mf_perc = config.get('margin_free_perc', 0.5)
+        if mf_perc < 1:
+            # (equity - margem) / equity < X  <=>  equity < margem / (1 - X)
+            barriers['margin_free'] = barrier_price(account.equity, account_slope, margin / (1 - mf_perc), bid)
+        stop_out = config.get('risk_sim_stop_out_level', 50.0)
+        barriers['stop_out'] = barrier_price(account.equity, account_slope, margin * stop_out / 100, bid)
+
+    return barriers
+
+
+def _simulate_batch(args):
+    """
+    Um lote de caminhos. Recebe limiares em unidades de choque acumulado
+    (ln(barreira/preço)/sigma) e devolve, por barreira, o histograma do passo
+    do primeiro toque (o último índice conta os caminhos que não tocaram).
+    """
+    thresholds, directions, n_paths, n_steps, seed = args
+    rng = np.random.default_rng(seed)
+    shocks = np.cumsum(rng.standard_normal((n_paths, n_steps), dtype=np.float32), axis=1)
+
+    histograms = []
+    for threshold, direction in zip(thresholds, directions):
+        hit = shocks <= threshold if direction < 0 else shocks >= threshold
+        touched = hit.any(axis=1)
+        first = np.where(touched, hit.argmax(axis=1), n_steps)
+        histograms.append(np.bincount(first, minlength=n_steps + 1))
+    return histograms
+
+
+def simulate_hits(bid, sigma, barriers, n_steps, n_paths=100_000, batch_size=25_000, seed=None, executor=None):
+    """
+    Probabilidade de tocar cada barreira no horizonte e o passo médio do toque.
+
+    Args:
+        bid (float): Preço atual.
+        sigma (float): Volatilidade por passo (log-retorno).
+        barriers (dict): {nome: (preço, direção)} de build_barriers().
+        n_steps (int): Passos no horizonte.
+        executor: Pool opcional (concurrent.futures) para os lotes.
+
+    Returns:
+        dict: {nome: {"prob": p, "mean_steps": média dos passos até o toque (None se p = 0)}}
+    """
+    results = {}
+    active = []
+    for name, (price, direction) in barriers.items():
+        if price is None:
+            results[name] = {"prob": 0.0, "mean_steps": None}
+        elif direction == 0:
+            results[name] = {"prob": 1.0, "mean_steps": 0.0}
+        else:
+            active.append((name, np.log(price / bid) / sigma, direction))
+
+    if not active or n_steps <= 0:
+        return results
+
+    thresholds = [a[1] for a in active]
+    directions = [a[2] for a in active]
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-n_paths // batch_size)))
+    jobs = []
+    remaining = n_paths
+    for child in seeds:
+        size = min(batch_size, remaining)
+        remaining -= size
+        jobs.append((thresholds, directions, size, n_steps, child))
+
+    batches = executor.map(_simulate_batch, jobs) if executor else map(_simulate_batch, jobs)
+    totals = [np.zeros(n_steps + 1, dtype=np.int64) for _ in active]
+    for histograms in batches:
+        for total, histogram in zip(totals, histograms):
+            total += histogram
+
+    steps = np.arange(1, n_steps + 1)
+    for (name, _, _), total in zip(active, totals):
+        hits = int(total[:n_steps].sum())
+        results[name] = {
+            "prob": hits / n_paths,
+            "mean_steps": float((total[:n_steps] * steps).sum() / hits) if hits else None,
+        }
+    return results
+
+
+class RiskSimulator:
+    """
+    Roda a simulação em segundo plano a cada 'interval_seconds' com as
+    entradas mais recentes enviadas por update(); latest() devolve o último
+    resultado publicado.
+    """
+
+    def __init__(self, config, logger, interval_seconds=60, n_paths=100_000, batch_size=25_000,
+                 workers=0, horizon_minutes=240, steps_per_bar=1, seed=None):
+        self.config = config
+        self.logger = logger
+        self.interval_seconds = interval_seconds
+        self.n_paths = n_paths
+        self.batch_size = batch_size
+        self.workers = workers
+        self.horizon_minutes = horizon_minutes
+        self.steps_per_bar = steps_per_bar
+        self.seed = seed
+
+        self.contract_size = None  # preenchido pelo loop (mt5.symbol_info) na primeira vez
+        self._inputs = None
+        self._latest = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, logger):
+        return cls(
+            config, logger,
+            interval_seconds=config.get('risk_sim_interval_seconds', 60),
+            n_paths=config.get('risk_sim_paths', 100_000),
+            batch_size=config.get('risk_sim_batch_size', 25_000),
+            workers=config.get('risk_sim_workers', 0),
+            horizon_minutes=config.get('risk_sim_horizon_minutes', 240),
+            steps_per_bar=config.get('risk_sim_steps_per_bar', 1),
+            seed=config.get('risk_sim_seed'),
+        )
+
+    def update(self, positions, account, bid, closes):
+        """Entrega as entradas do ciclo (barato: só guarda referências)."""
+        with self._lock:
+            self._inputs = (tuple(positions or ()), account, bid, self.contract_size, closes)
+
+    def latest(self):
+        with self._lock:
+            return self._latest
+
+    def run_once(self, executor=None):
+        """Uma simulação com as entradas atuais. Retorna o resultado (ou None sem entradas)."""
+        with self._lock:
+            inputs = self._inputs
+        if inputs is None:
+            return None
+        positions, account, bid, contract_size, closes = inputs
+
+        bar_sigma = estimate_volatility(closes)
+        if bar_sigma is None or not bid or not contract_size:
+            return None
+
+        started = time.perf_counter()
+        minutes_per_step = timeframe_minutes(self.config['timeframe']) / self.steps_per_bar
+        sigma = bar_sigma / np.sqrt(self.steps_per_bar)
+        n_steps = max(1, int(self.horizon_minutes / minutes_per_step))
+
+        barriers = build_barriers(positions, account, bid, contract_size, self.config)
+        hits = simulate_hits(bid, sigma, barriers, n_steps, self.n_paths, self.batch_size, self.seed, executor)
+
+        result = {
+            "computed_at": time.time(),
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "horizon_minutes": self.horizon_minutes,
+            "sigma_per_bar": bar_sigma,
+            "barriers": {
+                name: {
+                    "price": barriers[name][0],
+                    "prob": hit["prob"],
+                    "minutes": None if hit["mean_steps"] is None else hit["mean_steps"] * minutes_per_step,
+                }
+                for name, hit in hits.items()
+            },
+        }
+        with self._lock:
+            self._latest = result
+        return result
+
+    def _run(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        try:
+            while not self._stop.is_set():
+                try:
+                    result = self.run_once(executor)
+                    if result:
+                        self.logger.info(f"[RISCO] {format_risk(result)}")
+                except Exception as e:
+                    self.logger.error(f"[RISCO] Falha na simulação: {e}", exc_info=True)
+                self._wake.wait(self.interval_seconds)
+                self._wake.clear()
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="risk-simulator", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def format_risk(result):
+    parts = []
+    for name in BARRIERS:
+        barrier = result["barriers"].get(name)
+        if barrier is None:
+            continue
+        minutes = "-" if barrier["minutes"] is None else f"{barrier['minutes']:.0f}min"
+        parts.append(f"{name}: {barrier['prob']:.1%} ({minutes})")
+    return (
+        f"Horizonte {result['horizon_minutes']}min, {result['elapsed_ms']:.0f} ms | " + " | ".join(parts)
+    )
+
+
+def risk_metrics(result):
+    """
+    Campos planos para a análise do ciclo (log/Excel). Sempre as mesmas
+    colunas, com None enquanto não houver resultado.
+    """
+    barriers = result["barriers"] if result else {}
+    metrics = {}
+    for name in BARRIERS:
+        barrier = barriers.get(name)
+        prob = None if barrier is None else round(barrier["prob"], 4)
+        minutes = None if barrier is None or barrier["minutes"] is None else round(barrier["minutes"], 1)
+        metrics[f"risk_{name}_prob"] = prob
+        metrics[f"risk_{name}_minutes"] = minutes
+    return metrics
@@ -3,6 +3,7 @@ import numpy as np
 import random
 import MetaTrader5 as mt5
 from .mt5_order import place_order
+from .order_planner import coalesce_orders, preflight_plan, sub_lot_comment
 
 # Variável global para controle de IDs (se necessário)
 trade_id_counter = 0
@@ -56,24 +57,37 @@ def new_sell_trades(analise, config, logger, symbol):
         logger=logger
     )
     
+    # Plano de ordens cortado à margem livre antes de qualquer envio
+    plan = [
+        {"order_type": mt5.ORDER_TYPE_SELL, "volume": mf_config["volume"], "profit_points": tp, "stop_points": sl}
+        for tp, sl in tp_sl_list
+    ]
+    plan = coalesce_orders(symbol, plan, config, logger)
+    plan = preflight_plan(symbol, plan, config, logger)
+    if not plan:
+        logger.warning("Nenhuma SELL cabe na margem livre atual. Nenhuma ordem enviada.")
+        return []
+
     # Cria e executa ordens no MT5
     new_trades = []
     successful_orders = 0
     
-    for i, (tp, sl) in enumerate(tp_sl_list):
+    for i, order in enumerate(plan):
+        tp, sl = order["profit_points"], order["stop_points"]
         trade_id_counter += 1
         
-        logger.info(f"Abrindo SELL {i+1}/{total_orders} - TP: {tp}, SL: {sl}, Volume: {mf_config['volume']}")
+        logger.info(f"Abrindo SELL {i+1}/{len(plan)} - TP: {tp}, SL: {sl}, Volume: {order['volume']}")
         
         # Executa a ordem no MT5
         result = place_order(
             symbol=symbol,
             order_type=mt5.ORDER_TYPE_SELL,
-            volume=mf_config["volume"],
+            volume=order["volume"],
             magic_number=config["magic_number"],
             stop_points=sl,  # Usando SL calculado
             profit_points=tp,  # Usando TP calculado
-            logger=logger
+            logger=logger,
+            comment_suffix=sub_lot_comment(order)
         )
         
         if result:
@@ -138,25 +152,38 @@ def new_buy_trades(analise, config, logger, symbol):
         logger=logger
     )
     
+    # Plano de ordens cortado à margem livre antes de qualquer envio
+    plan = [
+        {"order_type": mt5.ORDER_TYPE_BUY, "volume": mf_config["volume"], "profit_points": tp, "stop_points": sl}
+        for tp, sl in tp_sl_list
+    ]
+    plan = coalesce_orders(symbol, plan, config, logger)
+    plan = preflight_plan(symbol, plan, config, logger)
+    if not plan:
+        logger.warning("Nenhuma BUY cabe na margem livre atual. Nenhuma ordem enviada.")
+        return []
+
     # Cria e executa ordens no MT5
     new_trades = []
     successful_orders = 0
     
-    for i, (tp, sl) in enumerate(tp_sl_list):
+    for i, order in enumerate(plan):
+        tp, sl = order["profit_points"], order["stop_points"]
         trade_id_counter += 1
         
-        logger.info(f"Abrindo BUY {i+1}/{total_orders} - TP: {tp}, SL: {sl}, Volume: {mf_config['volume']}")
+        logger.info(f"Abrindo BUY {i+1}/{len(plan)} - TP: {tp}, SL: {sl}, Volume: {order['volume']}")
         
         # --- LÓGICA INVERTIDA ---
         # Executa a ordem de COMPRA (BUY) no MT5
         result = place_order(
             symbol=symbol,
             order_type=mt5.ORDER_TYPE_BUY, # Alterado para BUY
-            volume=mf_config["volume"],
+            volume=order["volume"],
             magic_number=config["magic_number"],
             stop_points=sl,
             profit_points=tp,
-            logger=logger
+            logger=logger,
+            comment_suffix=sub_lot_comment(order)
         )
         
         if result:
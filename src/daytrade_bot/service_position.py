@@ -1,5 +1,6 @@
 import MetaTrader5 as mt5
-import time
+from . import clock
+from .bot_config import with_overrides
 # from mt5_order import close_position
 
 def check_positions_condition(
@@ -47,7 +48,7 @@ def check_positions_condition(
             return True, ultima_verificacao_target_down
 
         if price_current < min_price_open - target_down:
-            agora = time.time()
+            agora = clock.time()
             if agora - ultima_verificacao_target_down >= target_down_interval:
                 ultima_verificacao_target_down = agora
                 return True, ultima_verificacao_target_down
@@ -58,7 +59,7 @@ def check_positions_condition(
             return True, ultima_verificacao_target_down
 
         if price_current > max_price_open + target_down:
-            agora = time.time()
+            agora = clock.time()
             if agora - ultima_verificacao_target_down >= target_down_interval:
                 ultima_verificacao_target_down = agora
                 return True, ultima_verificacao_target_down
@@ -95,13 +96,17 @@ def adjust_volume_by_balance(config, balance, logger):
     Ajusta o volume de trading baseado no saldo da conta.
     
     Args:
-        config: Dicionário de configuração que será modificado
+        config: Configuração atual (BotConfig ou dict; não é alterada)
         balance: Saldo atual da conta (deve ser >= 0)
+
+    Returns:
+        Nova configuração com volume e alvos em dólar recalculados
+        (a própria 'config' se o saldo for inválido).
     """    
     # Validação mais completa
     if not isinstance(balance, (int, float)) or balance < 0:
         logger.error(f"Saldo inválido: {balance}")
-        return
+        return config
 
         
  # Usando next() para encontrar o primeiro threshold que atende a condição
@@ -114,10 +119,13 @@ def adjust_volume_by_balance(config, balance, logger):
     
     volume = next((vol for threshold, vol in volume_levels if balance >= threshold), 0.01)
     
-    config['volume'] = volume
-    config["target_up_dollars"] = config['target_up_pts'] * config['point']
-    config["target_down_dollars"] =  config['target_down_pts'] * config['point']
-    config["trigger_profit_dollars"]  = (config['volume'] / config['point']) * (config['profit_points'] * config['point']) / 2
+    return with_overrides(
+        config,
+        volume=volume,
+        target_up_dollars=config['target_up_pts'] * config['point'],
+        target_down_dollars=config['target_down_pts'] * config['point'],
+        trigger_profit_dollars=(volume / config['point']) * (config['profit_points'] * config['point']) / 2,
+    )
     
 # >= 250 volume 0.04
 # >= 150 and < 250 -> VOLUME 0.03
@@ -1,50 +1,128 @@
-from datetime import datetime, timedelta
+import heapq
+import json
+import os
+from bisect import bisect_right
+from datetime import timedelta
+from . import clock
 from .threshold_config import ThresholdConfig
 
 class ThresholdManager:
-    def __init__(self, thresholds):
+    """
+    Limites de quantidade de ordens por lado com cooldown.
+
+    Os cooldowns ficam num min-heap de expirações medidas em relógio monotônico
+    (imune a ajustes do relógio do sistema). Cada verificação só descarta as
+    expirações vencidas no topo do heap e faz uma busca binária nos limites do
+    lado: O(log n) por chamada, em vez de varrer todos os thresholds.
+    """
+
+    def __init__(self, thresholds, state_file=None, monotonic=clock.monotonic, wall_time=clock.time):
         self.thresholds = sorted(thresholds, key=lambda x: x.max_order)
-        self.active_cooldowns = {}  # {threshold_index: expiration_time}
+        self.active_cooldowns = {}  # {threshold_index: expiração (monotônico)}
         self.order_counters = {'buy': 0, 'sell': 0}
-        self.last_reset_time = datetime.now()
-        
+        self.state_file = state_file
+        self._monotonic = monotonic
+        self._wall_time = wall_time
+        self.last_reset_time = clock.fromtimestamp(wall_time())
+
+        self._heap = []  # [(expiração, threshold_index)]
+        self._active_by_type = {'buy': 0, 'sell': 0}
+
+        # Índices dos thresholds de cada lado ('both' entra nos dois), já ordenados por max_order
+        self._by_type = {'buy': [], 'sell': []}
+        for i, threshold in enumerate(self.thresholds):
+            for side in self._sides(threshold.order_type):
+                self._by_type[side].append(i)
+        self._limits_by_type = {
+            side: [self.thresholds[i].max_order for i in indexes]
+            for side, indexes in self._by_type.items()
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """Cria o gerenciador a partir de config['order_thresholds'] (lista de dicts)."""
+        thresholds = [
+            ThresholdConfig(
+                t['max_order'],
+                t['order_type'],
+                t.get('order_decrease', 1),
+                t.get('time_wait', 60),
+                t.get('cooldown_reset', True),
+            )
+            for t in config.get('order_thresholds', [])
+        ]
+        return cls(thresholds, state_file=config.get('threshold_state_file'))
+
+    @staticmethod
+    def _sides(order_type):
+        return ('buy', 'sell') if order_type == 'both' else (order_type,)
+
+    def _expire(self, now):
+        """Remove do topo do heap os cooldowns vencidos."""
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, index = heapq.heappop(self._heap)
+            # Entrada obsoleta (o cooldown foi reagendado depois)
+            if self.active_cooldowns.get(index) != expires_at:
+                continue
+            del self.active_cooldowns[index]
+            for side in self._sides(self.thresholds[index].order_type):
+                self._active_by_type[side] -= 1
+
+    def _start_cooldown(self, index, expires_at):
+        if index not in self.active_cooldowns:
+            for side in self._sides(self.thresholds[index].order_type):
+                self._active_by_type[side] += 1
+        self.active_cooldowns[index] = expires_at
+        heapq.heappush(self._heap, (expires_at, index))
+
     def check_thresholds(self, order_type, current_count):
         """Verifica se algum limite foi atingido e aplica ações"""
         actions = []
-        
-        for i, threshold in enumerate(self.thresholds):
-            if (threshold.order_type == order_type or 
-                threshold.order_type == 'both'):
-                
-                # Verifica se está em cooldown para este threshold
-                if i in self.active_cooldowns:
-                    if datetime.now() < self.active_cooldowns[i]:
-                        continue  # Ainda em cooldown, pula verificação
-                    else:
-                        del self.active_cooldowns[i]  # Cooldown expirado
-                
-                # Verifica se atingiu o limite
-                if current_count >= threshold.max_order:
-                    action = self._apply_threshold_action(threshold, i, current_count)
-                    actions.append(action)
-                    
-                    # Se configurado para reset, zera contador após ação
-                    if threshold.cooldown_reset:
-                        self.order_counters[order_type] = 0
-                        
+        self._expire(self._monotonic())
+
+        # Thresholds com max_order <= current_count (prefixo da lista ordenada)
+        reached = bisect_right(self._limits_by_type.get(order_type, []), current_count)
+
+        for i in self._by_type.get(order_type, [])[:reached]:
+            if i in self.active_cooldowns:
+                continue  # Ainda em cooldown, pula verificação
+
+            threshold = self.thresholds[i]
+            action = self._apply_threshold_action(threshold, i, current_count)
+            actions.append(action)
+
+            # Se configurado para reset, zera contador após ação
+            if threshold.cooldown_reset:
+                self.order_counters[order_type] = 0
+
+        if actions:
+            self.save_state()
         return actions
-    
+
+    def is_blocked(self, order_type):
+        """True se há algum cooldown ativo para o lado (O(log n) amortizado)."""
+        self._expire(self._monotonic())
+        return self._active_by_type.get(order_type, 0) > 0
+
+    def seconds_until_next_expiry(self):
+        """Segundos até o próximo cooldown vencer, ou None se não houver."""
+        self._expire(self._monotonic())
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self._monotonic())
+
     def _apply_threshold_action(self, threshold, threshold_index, current_count):
         """Aplica a ação do threshold e inicia cooldown"""
-        
+
         # Calcula redução (não permite negativo)
         reduction = min(threshold.order_decrease, current_count)
         new_count = current_count - reduction
-        
+
         # Configura cooldown
-        cooldown_end = datetime.now() + timedelta(minutes=threshold.time_wait)
-        self.active_cooldowns[threshold_index] = cooldown_end
-        
+        wait_seconds = threshold.time_wait * 60
+        self._start_cooldown(threshold_index, self._monotonic() + wait_seconds)
+        cooldown_end = clock.fromtimestamp(self._wall_time()) + timedelta(seconds=wait_seconds)
+
         return {
             'threshold_triggered': threshold.max_order,
             'order_type': threshold.order_type,
@@ -52,12 +130,84 @@ class ThresholdManager:
             'new_count': new_count,
             'cooldown_until': cooldown_end,
             'wait_time_minutes': threshold.time_wait
-        }        
+        }
+
+    # ------------------------------------------------------------------
+    #  Persistência (cooldowns sobrevivem a um restart)
+    # ------------------------------------------------------------------
+    def save_state(self):
+        """Grava os cooldowns ativos como horário de parede (epoch) no state_file."""
+        if not self.state_file:
+            return
+
+        now_mono = self._monotonic()
+        now_wall = self._wall_time()
+        cooldowns = [
+            {
+                'max_order': self.thresholds[i].max_order,
+                'order_type': self.thresholds[i].order_type,
+                'until': now_wall + (expires_at - now_mono),
+            }
+            for i, expires_at in self.active_cooldowns.items()
+            if expires_at > now_mono
+        ]
+        with open(self.state_file, 'w') as f:
+            json.dump({'cooldowns': cooldowns, 'order_counters': self.order_counters}, f, indent=4)
+
+    def load_state(self):
+        """Restaura os cooldowns do state_file, descontando o tempo em que o robô ficou parado."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+
+        with open(self.state_file, 'r') as f:
+            state = json.load(f)
+
+        now_mono = self._monotonic()
+        now_wall = self._wall_time()
+        index_of = {(t.max_order, t.order_type): i for i, t in enumerate(self.thresholds)}
+
+        for cooldown in state.get('cooldowns', []):
+            i = index_of.get((cooldown['max_order'], cooldown['order_type']))
+            remaining = cooldown['until'] - now_wall
+            if i is not None and remaining > 0:
+                self._start_cooldown(i, now_mono + remaining)
+
+        self.order_counters.update(state.get('order_counters', {}))
+
+
+def enforce_order_thresholds(manager, order_type, positions, config, logger):
+    """
+    Aplica os limites de quantidade de ordens de um lado ('buy' ou 'sell').
+    Chamado a cada ciclo; retorna True se novas entradas desse lado devem ser bloqueadas.
+    """
+    actions = manager.check_thresholds(order_type, len(positions))
+
+    for action in actions:
+        logger.warning(
+            f"[THRESHOLD] Limite de {action['threshold_triggered']} ordens {order_type.upper()} atingido. "
+            f"Cooldown de {action['wait_time_minutes']} min até {action['cooldown_until']:%H:%M:%S}."
+        )
+
+    # Vários limites no mesmo ciclo somam as reduções: as piores posições são
+    # escolhidas uma única vez, sem repetir tickets entre os limites
+    reduction = sum(action['reduction_applied'] for action in actions)
+    if config.get('order_thresholds_close_worst', False) and reduction > 0:
+        from .drawdown_manager import get_worst_positions_to_close
+        from .mt5_order import close_position
+
+        for position in get_worst_positions_to_close(positions, min(reduction, len(positions))):
+            logger.info(
+                f"[THRESHOLD] Fechando ticket {position.ticket} (lucro {position.profit:.2f}) "
+                f"para reduzir a quantidade de ordens."
+            )
+            close_position(position, logger)
+
+    return manager.is_blocked(order_type)
 
 # Configuração como você definiu
 thresholds_config = [
     ThresholdConfig(8, 'buy', 1, 120),
-    ThresholdConfig(13, 'buy', 1, 120), 
+    ThresholdConfig(13, 'buy', 1, 120),
     ThresholdConfig(18, 'buy', 2, 120),
     ThresholdConfig(10, 'sell', 1, 90),   # Exemplo para sell
 ]
@@ -67,16 +217,15 @@ thresholds_config = [
 # # Simulação de uso
 # def process_order_flow(order_type, current_orders):
 #     actions = manager.check_thresholds(order_type, current_orders)
-    
+
 #     for action in actions:
 #         print(f"⚡ Threshold {action['threshold_triggered']} atingido!")
 #         print(f"📉 Reduzindo {action['reduction_applied']} ordem(ns)")
 #         print(f"🕒 Cooldown: {action['wait_time_minutes']}min")
 #         print(f"🎯 Novas ordens ativas: {action['new_count']}")
-        
+
 #     return actions
 
 # # Exemplo de execução
 # process_order_flow('buy', 8)  # Dispara primeiro threshold
 # process_order_flow('buy', 13) # Dispara segundo threshold (se não estiver em cooldown)
-
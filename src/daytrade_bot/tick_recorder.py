@@ -0,0 +1,202 @@
+# tick_recorder.py
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import MetaTrader5 as mt5
+
+from .mmap_store import MmapTable
+
+# Registro gravado por tick (44 bytes, sem padding)
+TICK_DTYPE = np.dtype([
+    ("time_msc", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("volume", "<u8"),
+    ("flags", "<u4"),
+])
+
+MS_PER_DAY = 86_400_000
+
+
+def tick_file_path(folder, symbol, day):
+    """Arquivo de ticks de um símbolo em um dia (UTC). 'day' é date/datetime."""
+    return os.path.join(folder, f"{symbol}_{day.strftime('%Y%m%d')}.ticks")
+
+
+def open_tick_file(folder, symbol, day):
+    """
+    Abre o arquivo de ticks de um dia somente para leitura (zero-copy).
+    Pode ser usado por outros processos enquanto o robô está gravando.
+    """
+    return MmapTable(tick_file_path(folder, symbol, day), TICK_DTYPE, readonly=True)
+
+
+def slice_ticks(table, start_msc=None, end_msc=None):
+    """Ticks com start_msc <= time_msc < end_msc (busca binária na coluna de tempo)."""
+    return table.slice_by("time_msc", start_msc, end_msc)
+
+
+def _day_of(time_msc):
+    return datetime.fromtimestamp(int(time_msc) // 1000, tz=timezone.utc).date()
+
+
+class TickRecorder:
+    """
+    Grava os ticks vistos pelo robô em arquivos mapeados, um por símbolo por dia.
+
+    O caminho principal é o poll(): busca com mt5.copy_ticks_from tudo o que
+    chegou desde o último tick gravado e anexa o array inteiro de uma vez,
+    então o custo por tick é só a cópia de memória (nenhum objeto Python por tick).
+
+    Args:
+        symbol (str): Símbolo monitorado.
+        folder (str): Pasta dos arquivos .ticks.
+        initial_capacity (int): Ticks pré-alocados por arquivo diário.
+        batch_size (int): Máximo de ticks por chamada a copy_ticks_from.
+        logger: Logger opcional.
+    """
+
+    def __init__(self, symbol, folder="ticks", initial_capacity=262144, batch_size=100000, logger=None):
+        self.symbol = symbol
+        self.folder = folder
+        self.initial_capacity = initial_capacity
+        self.batch_size = batch_size
+        self.logger = logger
+
+        self._day = None
+        self._table = None
+        self._last_msc = None
+        self._last_msc_dupes = 0
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        return cls(
+            config["symbol"],
+            folder=config.get("tick_recorder_folder", "ticks"),
+            initial_capacity=config.get("tick_recorder_initial_capacity", 262144),
+            batch_size=config.get("tick_recorder_batch_size", 100000),
+            logger=logger,
+        )
+
+    # ------------------------------------------------------------ arquivos
+    def _table_for(self, day):
+        if day != self._day:
+            if self._table is not None:
+                self._table.close()
+            self._table = MmapTable(
+                tick_file_path(self.folder, self.symbol, day),
+                TICK_DTYPE,
+                initial_capacity=self.initial_capacity,
+            )
+            self._day = day
+        return self._table
+
+    def _resume(self, time_msc):
+        """Retoma do último tick já gravado no arquivo do dia (após restart)."""
+        table = self._table_for(_day_of(time_msc))
+        last = table.last("time_msc")
+        if last is not None:
+            self._last_msc = int(last)
+            self._last_msc_dupes = table.count_equal_at_end("time_msc", last)
+
+    # ------------------------------------------------------------- escrita
+    def append(self, ticks):
+        """
+        Anexa um array estruturado de ticks (ex: retorno de copy_ticks_from),
+        ordenado por time_msc. Divide o lote na virada do dia UTC.
+        Ticks já gravados (mesmo time_msc do último registro) são ignorados.
+        """
+        if ticks is None or len(ticks) == 0:
+            return 0
+
+        times = ticks["time_msc"]
+
+        if self._last_msc is not None:
+            # Pula o que já foi gravado: tudo antes do último tempo e as
+            # repetições exatas do último milissegundo.
+            skip = int(np.searchsorted(times, self._last_msc, side="left"))
+            same = int(np.searchsorted(times, self._last_msc, side="right")) - skip
+            skip += min(same, self._last_msc_dupes)
+            ticks = ticks[skip:]
+            times = times[skip:]
+            if len(ticks) == 0:
+                return 0
+
+        days = times // MS_PER_DAY
+        cuts = np.flatnonzero(np.diff(days)) + 1
+        written = 0
+        for chunk in np.split(ticks, cuts):
+            table = self._table_for(_day_of(chunk["time_msc"][0]))
+            written += table.append(chunk)
+
+        last = int(times[-1])
+        if last == self._last_msc:
+            self._last_msc_dupes += int(np.count_nonzero(times == last))
+        else:
+            self._last_msc = last
+            self._last_msc_dupes = int(len(times) - np.searchsorted(times, last, side="left"))
+        return written
+
+    def record_tick(self, tick):
+        """Grava um único tick de mt5.symbol_info_tick (caminho alternativo ao poll)."""
+        if tick is None:
+            return False
+        if self._last_msc is not None and tick.time_msc <= self._last_msc:
+            return False
+
+        table = self._table_for(_day_of(tick.time_msc))
+        table.append_row((tick.time_msc, tick.bid, tick.ask, tick.last, tick.volume, tick.flags))
+        self._last_msc = tick.time_msc
+        self._last_msc_dupes = 1
+        return True
+
+    def poll(self):
+        """
+        Busca no terminal todos os ticks desde o último gravado e anexa ao arquivo.
+        Retorna a quantidade de ticks gravados.
+        """
+        if self._last_msc is None:
+            tick = mt5.symbol_info_tick(self.symbol)
+            if not tick:
+                if self.logger:
+                    self.logger.error(f"[TICKS] Não foi possível obter o tick de {self.symbol}.")
+                return 0
+            self._resume(tick.time_msc)
+            if self._last_msc is None:
+                # Primeiro uso do dia: começa a partir do tick atual
+                return int(self.record_tick(tick))
+
+        total = 0
+        while True:
+            ticks = mt5.copy_ticks_from(
+                self.symbol, int(self._last_msc // 1000), self.batch_size, mt5.COPY_TICKS_ALL
+            )
+            if ticks is None:
+                if self.logger:
+                    self.logger.error(f"[TICKS] copy_ticks_from falhou para {self.symbol}: {mt5.last_error()}")
+                break
+
+            written = self.append(ticks)
+            total += written
+            # Lote cheio: pode haver mais ticks pendentes no terminal
+            if written == 0 or len(ticks) < self.batch_size:
+                break
+
+        if total and self.logger:
+            self.logger.debug(f"[TICKS] {total} tick(s) gravados para {self.symbol}.")
+        return total
+
+    # ------------------------------------------------------------- leitura
+    def slice(self, start_msc=None, end_msc=None):
+        """Ticks do dia corrente no intervalo [start_msc, end_msc)."""
+        if self._table is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        return slice_ticks(self._table, start_msc, end_msc)
+
+    def close(self):
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+            self._day = None
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import daytrade_bot.bar_archive as ba
+from daytrade_bot import mmap_store
+from daytrade_bot.mmap_store import MmapTable
+
+
+def make_rates(times, close=2400.0):
+    rates = np.zeros(len(times), dtype=ba.RATES_DTYPE)
+    rates["time"] = times
+    rates["close"] = close
+    return rates
+
+
+def test_sync_backfills_then_fetches_only_delta(tmp_path, monkeypatch):
+    """Primeiro sync baixa a janela inteira; os seguintes só o delta."""
+    calls = []
+    server = {"rates": make_rates([600, 1200, 1800])}
+
+    def fake_copy_rates_range(symbol, timeframe, start, end):
+        calls.append((start, end))
+        rates = server["rates"]
+        return rates[(rates["time"] >= start) & (rates["time"] <= end)]
+
+    monkeypatch.setattr(ba.mt5, "copy_rates_range", fake_copy_rates_range, raising=False)
+
+    archive = ba.BarArchive("XAUUSD", 10, folder=str(tmp_path), initial_capacity=2, backfill_hours=1)
+    assert archive.sync(1800) == 3
+    assert calls[-1] == (1800 - 3600, 1800)
+
+    # Última barra ainda em formação é reescrita, barra nova é anexada
+    server["rates"] = np.concatenate([make_rates([600, 1200]), make_rates([1800, 2400], close=2401.0)])
+    assert archive.sync(2400) == 1
+    assert calls[-1] == (1800, 2400)
+
+    bars = archive.read(1200, 2400)
+    assert list(bars["time"]) == [1200, 1800, 2400]
+    assert list(bars["close"]) == [2400.0, 2401.0, 2401.0]
+    assert archive.covers(-1800)
+
+    reader = ba.open_bar_file(str(tmp_path), "XAUUSD", 10)
+    assert len(reader) == 4
+    archive.close()
+
+
+def test_header_version_is_checked_and_v1_files_upgraded(tmp_path):
+    path = tmp_path / "old.bin"
+    table = MmapTable(path, np.dtype([("time", "<i8")]), initial_capacity=4)
+    table.append(np.array([(1,), (2,)], dtype=table.dtype))
+    table._header["version"] = 1  # Cabeçalho gravado antes de 'origin' existir
+    table._header["origin"] = 12345
+    table.close()
+
+    assert MmapTable(path, table.dtype, readonly=True).origin == 0
+    upgraded = MmapTable(path, table.dtype)
+    assert int(upgraded._header["version"][0]) == mmap_store._VERSION
+    assert upgraded.origin == 0 and len(upgraded) == 2
+    upgraded._header["version"] = 99
+    upgraded.close()
+
+    with pytest.raises(ValueError):
+        MmapTable(path, table.dtype, readonly=True)
+
+
+def test_two_handles_on_one_file_follow_each_others_growth(tmp_path):
+    """Robôs BUY e SELL no mesmo arquivo: quem não cresceu remapeia e nunca encolhe o arquivo."""
+    dtype = np.dtype([("time", "<i8")])
+    path = tmp_path / "shared.bin"
+    a = MmapTable(path, dtype, initial_capacity=4)
+    b = MmapTable(path, dtype)
+
+    a.append(np.array([(t,) for t in range(20)], dtype=dtype))
+    assert b.last("time") == 19
+
+    size = path.stat().st_size
+    b.append(np.array([(t,) for t in range(20, 60)], dtype=dtype))
+    assert path.stat().st_size >= size
+    assert a.last("time") == 59 and a.view()["time"].tolist() == list(range(60))
+    b.replace_last(np.array([(99,)], dtype=dtype)[0])
+    assert a.last("time") == 99
+    a.close()
+    b.close()
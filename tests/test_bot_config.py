@@ -0,0 +1,84 @@
+import json
+import logging
+
+import pytest
+
+import daytrade_bot.bot_config as bc
+
+logger = logging.getLogger("test_bot_config")
+
+BASE = {
+    "symbol": "XAUUSD", "magic_number": 777, "point": 0.01, "volume": 0.01,
+    "profit_points": 1400, "stop_points": 6000, "timeframe": 10,
+    "order_thresholds": [{"max_order": 8, "order_type": "buy"}],
+}
+
+
+def test_mapping_access_and_central_defaults():
+    config = bc.BotConfig(BASE)
+    assert config["symbol"] == config.symbol == "XAUUSD"
+    # Padrão central vale mesmo quando o módulo passa outro
+    assert config.get("hedge_cooldown_minutes", 600) == bc.DEFAULTS["hedge_cooldown_minutes"]
+    # Campo opcional sem padrão: o padrão local continua valendo
+    assert config.get("max_position_duration_minutes", 30) == 30
+    assert config.get("chave_extra", "x") == "x"
+    assert config["order_thresholds"][0]["max_order"] == 8
+
+
+def test_validation_reports_all_errors():
+    with pytest.raises(bc.ConfigError) as exc:
+        bc.BotConfig({**BASE, "magic_number": "777", "volume": True, "symbol": None} | {"timeframe": 1.5})
+    message = str(exc.value)
+    assert "magic_number" in message and "volume" in message and "timeframe" in message
+
+    values = dict(BASE)
+    del values["point"]
+    with pytest.raises(bc.ConfigError, match="point"):
+        bc.BotConfig(values)
+
+
+def test_config_is_frozen_and_overrides_make_copies():
+    config = bc.BotConfig(BASE)
+    with pytest.raises(AttributeError):
+        config.volume = 0.02
+    with pytest.raises(TypeError):
+        config["volume"] = 0.02
+    with pytest.raises(TypeError):
+        config["order_thresholds"][0]["max_order"] = 1
+
+    hedge = bc.with_overrides(config, volume=0.05, magic_number=778)
+    assert isinstance(hedge, bc.BotConfig)
+    assert (hedge.volume, hedge.magic_number, config.volume) == (0.05, 778, 0.01)
+    assert bc.with_overrides(dict(BASE), volume=0.05)["volume"] == 0.05
+
+    plain = config.copy()
+    plain["order_thresholds"][0]["max_order"] = 1
+    assert config["order_thresholds"][0]["max_order"] == 8
+
+
+def test_watcher_reloads_only_valid_changes(tmp_path, monkeypatch):
+    path = tmp_path / "config_buy.local.json"
+    path.write_text(json.dumps(BASE), encoding="utf-8")
+    monkeypatch.setattr(bc, "config_path", lambda base_name: path)
+
+    now = [0.0]
+    current = bc.BotConfig.load("config_buy")
+    watcher = bc.ConfigWatcher("config_buy", current, logger, interval_seconds=5, clock=lambda: now[0])
+    assert watcher.poll() is None
+
+    path.write_text(json.dumps({**BASE, "volume": 0.02, "extra": 1}), encoding="utf-8")
+    now[0] = 1.0
+    assert watcher.poll() is None  # Dentro do intervalo: nem faz stat
+    now[0] = 6.0
+    reloaded = watcher.poll()
+    assert reloaded.volume == 0.02
+    assert current.changed_fields(reloaded) == ["extra", "volume"]
+
+    # Arquivo inválido ou campo que exige reinício: mantém a config atual
+    path.write_text("{ invalido", encoding="utf-8")
+    now[0] = 12.0
+    assert watcher.poll() is None
+    path.write_text(json.dumps({**BASE, "symbol": "EURUSD"}), encoding="utf-8")
+    now[0] = 18.0
+    assert watcher.poll() is None
+    assert watcher.current is reloaded
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from daytrade_bot import clock
+from daytrade_bot.fake_mt5 import FakeMT5
+from daytrade_bot.service_position import check_positions_condition
+from daytrade_bot.tick_recorder import TICK_DTYPE
+
+
+def test_simulated_clock_drives_module_time():
+    sim = clock.SimulatedClock(start=1000.0)
+    with clock.use(sim):
+        assert clock.time() == clock.monotonic() == 1000.0
+        clock.sleep(60)
+        assert clock.time() == 1060.0
+        assert clock.now().timestamp() == 1060.0
+    assert clock.time() != 1060.0  # Relógio real de volta
+
+
+def test_target_down_cooldown_follows_installed_clock():
+    class Logger:
+        def info(self, msg): pass
+
+    class Position:
+        type, price_open, price_current = 0, 2400.0, 2390.0
+
+    sim = clock.SimulatedClock(start=10_000.0)
+    with clock.use(sim):
+        ok, last = check_positions_condition([Position()], 0, 5.0, 5.0, Logger(), 0, 600)
+        assert ok and last == 10_000.0
+        sim.sleep(599)
+        assert check_positions_condition([Position()], 0, 5.0, 5.0, Logger(), last, 600)[0] is False
+        sim.sleep(1)
+        assert check_positions_condition([Position()], 0, 5.0, 5.0, Logger(), last, 600)[0] is True
+
+
+def test_replay_source_feeds_ticks_until_exhausted():
+    sim = clock.SimulatedClock(start=100.0)
+    fake = FakeMT5(clock=sim.time)
+    ticks = np.zeros(3, dtype=TICK_DTYPE)
+    ticks["time_msc"] = [100_500, 101_000, 103_000]
+    ticks["bid"] = [2400.0, 2401.0, 2399.0]
+    ticks["ask"] = ticks["bid"] + 0.2
+    sim.on_advance = fake.replay_ticks(ticks)
+
+    sim.sleep(1)
+    assert (fake.bid, fake.ask) == (2401.0, 2401.2)
+    sim.sleep(5)
+    assert fake.bid == 2399.0
+    with pytest.raises(clock.ReplayFinished):
+        sim.sleep(1)
@@ -0,0 +1,54 @@
+import logging
+
+from daytrade_bot.cycle_budget import ENTRY, REPORTING, RISK, CycleBudget, admit, pending
+
+logger = logging.getLogger("test_cycle_budget")
+
+
+def make(**kwargs):
+    now = [0.0]
+    budget = CycleBudget(budget_seconds=10, entry_share=0.7, reporting_share=0.5,
+                         clock=lambda: now[0], logger=logger, **kwargs)
+    return now, budget
+
+
+def test_low_priority_tasks_are_shed_when_budget_runs_out():
+    now, budget = make()
+    budget.start()
+    now[0] += 4
+    assert budget.admit("excel", REPORTING)
+    now[0] += 2  # 6s de 10s: acabou a fatia de REPORTING
+    assert not budget.admit("excel", REPORTING)
+    assert budget.admit("new_entries", ENTRY)
+    now[0] += 6  # Estourou o orçamento
+    assert not budget.admit("new_entries", ENTRY)
+    assert budget.admit("low_margin", RISK)
+    budget.finish()
+
+    assert budget.shed == {"excel": 1, "new_entries": 1}
+    assert budget.overruns == 1
+    assert pending(budget, "excel")
+
+    budget.start()  # Ciclo com folga: a tarefa adiada roda e sai da fila
+    assert budget.admit("excel", REPORTING)
+    assert not pending(budget, "excel")
+    budget.finish()
+    assert budget.stats()["pending"] == ["new_entries"]
+
+
+def test_task_deferred_too_long_is_forced():
+    now, budget = make(max_defer_cycles=2)
+    results = []
+    for _ in range(3):
+        budget.start()
+        now[0] += 9
+        results.append(budget.admit("equity_alert", REPORTING))
+        budget.finish()
+    assert results == [False, False, True]
+    assert budget.forced == {"equity_alert": 1}
+    assert budget.shed == {"equity_alert": 2}
+
+
+def test_disabled_budget_admits_everything():
+    assert admit(None, "excel", REPORTING)
+    assert not pending(None, "excel")
@@ -0,0 +1,53 @@
+import logging
+import os
+import time
+
+from daytrade_bot.cycle_profiler import CycleProfiler, run_cycle
+
+logger = logging.getLogger("test_cycle_profiler")
+
+
+def slow_cycle(seconds):
+    time.sleep(seconds)
+    return "ok"
+
+
+def files(folder, extension):
+    return sorted(name for name in os.listdir(folder) if name.endswith(extension))
+
+
+def test_every_nth_cycle_is_profiled(tmp_path):
+    profiler = CycleProfiler(folder=str(tmp_path), every_n_cycles=2, slow_cycle_ms=0, logger=logger)
+
+    assert run_cycle(profiler, slow_cycle, 0) == "ok"
+    assert files(tmp_path, ".pstats") == []
+
+    run_cycle(profiler, slow_cycle, 0)
+    (name,) = files(tmp_path, ".pstats")
+    assert name.startswith("cycle_000002_")
+
+
+def test_slow_cycle_dumps_collapsed_stacks(tmp_path):
+    profiler = CycleProfiler(folder=str(tmp_path), every_n_cycles=0, slow_cycle_ms=50,
+                             sample_interval_ms=5, logger=logger)
+
+    run_cycle(profiler, slow_cycle, 0)       # rápido: nada gravado
+    run_cycle(profiler, slow_cycle, 0.15)    # lento
+
+    (name,) = files(tmp_path, ".collapsed")
+    with open(tmp_path / name, encoding="utf-8") as f:
+        content = f.read()
+    assert "slow_cycle" in content
+
+
+def test_files_are_rotated(tmp_path):
+    profiler = CycleProfiler(folder=str(tmp_path), every_n_cycles=1, slow_cycle_ms=0, max_files=3, logger=logger)
+    for _ in range(6):
+        run_cycle(profiler, slow_cycle, 0)
+    assert len(files(tmp_path, ".pstats")) == 3
+
+
+def test_disabled_profiler_runs_cycle_directly(monkeypatch):
+    monkeypatch.delenv("DAYTRADE_PROFILE", raising=False)
+    assert CycleProfiler.from_config({}, logger) is None
+    assert run_cycle(None, slow_cycle, 0) == "ok"
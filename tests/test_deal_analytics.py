@@ -0,0 +1,56 @@
+import numpy as np
+
+from daytrade_bot.deal_analytics import position_lifecycles
+from daytrade_bot.fake_mt5 import FakeMT5
+
+T0 = 1_700_000_000
+
+
+def send(fake, order_type, volume, **extra):
+    return fake.order_send({"action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": volume,
+                            "type": order_type, "magic": 7, **extra})
+
+
+def test_lifecycle_joins_entry_partial_exit_and_tp():
+    now = [T0]
+    fake = FakeMT5(clock=lambda: now[0])
+    fake.set_price(2400.0, spread=0.2)
+    ticket = send(fake, fake.ORDER_TYPE_BUY, 0.02, sl=2390.0, tp=2410.0).order
+    fake.order_send({"action": fake.TRADE_ACTION_SLTP, "position": ticket, "sl": 2395.0, "tp": 2405.0})
+
+    now[0] += 600
+    fake.set_price(2398.0)
+    send(fake, fake.ORDER_TYPE_SELL, 0.01, position=ticket)  # Parcial
+    now[0] += 600
+    fake.set_price(2405.5)                                   # TP modificado
+
+    bars = np.zeros(3, dtype=[("time", "<i8"), ("high", "<f8"), ("low", "<f8")])
+    bars["time"] = [T0, T0 + 600, T0 + 1200]
+    bars["high"] = [2401.0, 2402.0, 2406.0]
+    bars["low"] = [2399.0, 2396.5, 2400.0]
+
+    life = position_lifecycles(fake.deals, fake.history_orders, bars, contract_size=100)
+    row = life.loc[ticket]
+    assert row["status"] == "closed" and row["n_closes"] == 2
+    assert row["holding_seconds"] == 1200
+    assert row["exit_reason"] == "tp"
+    assert row["open_price"] == 2400.2
+    assert np.isclose(row["realized_pl"], (2398.0 - 2400.2) + (2405.5 - 2400.2))
+    assert row["initial_tp"] == 2410.0 and row["exit_level"] == 2405.0 and row["sl_tp_modified"]
+    assert np.isclose(row["mfe"], 2406.0 - 2400.2) and np.isclose(row["mae"], 2400.2 - 2396.5)
+    assert np.isclose(row["mae_cash"], row["mae"] * 0.02 * 100)
+
+
+def test_close_by_and_open_positions():
+    fake = FakeMT5(clock=lambda: T0)
+    fake.set_price(2400.0, spread=0.2)
+    buy = send(fake, fake.ORDER_TYPE_BUY, 0.01).order
+    sell = send(fake, fake.ORDER_TYPE_SELL, 0.01).order
+    still_open = send(fake, fake.ORDER_TYPE_BUY, 0.01).order
+    fake.order_send({"action": fake.TRADE_ACTION_CLOSE_BY, "position": buy, "position_by": sell})
+
+    life = position_lifecycles(fake.deals)
+    assert life.loc[buy, "exit_reason"] == life.loc[sell, "exit_reason"] == "close_by"
+    assert life.loc[still_open, "status"] == "open"
+    assert np.isnan(life.loc[still_open, "holding_seconds"])
+    assert position_lifecycles([]).empty
@@ -0,0 +1,56 @@
+from daytrade_bot.fake_mt5 import FakeMT5
+
+
+def make_fake():
+    fake = FakeMT5(balance=10000.0, leverage=100, clock=lambda: 1_700_000_000.0)
+    fake.set_price(2400.0, spread=0.2)
+    return fake
+
+
+def deal(fake, order_type, volume=0.01, **extra):
+    return fake.order_send({
+        "action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": volume,
+        "type": order_type, "magic": 1, **extra,
+    })
+
+
+def test_open_and_close_updates_balance_and_history():
+    fake = make_fake()
+    result = deal(fake, fake.ORDER_TYPE_BUY)
+    assert result.retcode == fake.TRADE_RETCODE_DONE
+    assert result.price == 2400.2
+
+    fake.set_price(2401.2)
+    (position,) = fake.positions_get(symbol="XAUUSD")
+    assert position.profit == 1.0
+
+    close = deal(fake, fake.ORDER_TYPE_SELL, position=position.ticket)
+    assert close.retcode == fake.TRADE_RETCODE_DONE
+    assert fake.positions_get() == ()
+    assert fake.account_info().balance == 10001.0
+    entries = [d.entry for d in fake.history_deals_get(0, 2_000_000_000)]
+    assert entries == [fake.DEAL_ENTRY_IN, fake.DEAL_ENTRY_OUT]
+
+
+def test_no_money_when_margin_is_not_enough():
+    fake = make_fake()
+    # 1 lote de XAUUSD a 2400 com alavancagem 100 exige 2400 de margem
+    assert deal(fake, fake.ORDER_TYPE_BUY, volume=5.0).retcode == fake.TRADE_RETCODE_NO_MONEY
+    assert fake.positions_get() == ()
+
+
+def test_stop_loss_and_pending_orders_trigger_on_price_moves():
+    fake = make_fake()
+    deal(fake, fake.ORDER_TYPE_BUY, sl=2395.0)
+    fake.order_send({
+        "action": fake.TRADE_ACTION_PENDING, "symbol": "XAUUSD", "volume": 0.01,
+        "type": fake.ORDER_TYPE_SELL_STOP, "price": 2396.0, "magic": 2,
+    })
+    assert len(fake.orders_get()) == 1
+
+    fake.set_price(2394.0)
+
+    (hedge,) = fake.positions_get()
+    assert hedge.type == fake.ORDER_TYPE_SELL
+    assert fake.orders_get() == ()
+    assert any(d.reason == fake.DEAL_REASON_SL for d in fake.deals)
@@ -32,3 +32,36 @@ def test_manage_active_hedge_close_by_drawdown(monkeypatch):
     result = hm.manage_active_hedge(state, trade, 2450.0, now, config, logger)
     assert called["closed"] is True
     assert result["hedge_manager_active"] is False
+
+
+def test_trailing_moves_server_side_sl_in_steps(monkeypatch):
+    import daytrade_bot.mt5_order as mt5_order
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    logger = type("L", (), {"info": lambda *a, **k: None, "error": lambda *a, **k: None})
+    fake = FakeMT5(balance=10000.0)
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(hm, "mt5", fake)
+    monkeypatch.setattr(mt5_order, "mt5", fake)
+    ticket = fake.open_position(1, 0.02, price_open=2400.0, magic=2, sl=2414.0)
+    config = {"hedge_close_drawdown_cash": 10.0, "hedge_trailing_step_points": 50}
+
+    def hedge():
+        return fake.positions_get(ticket=ticket)[0]
+
+    # Sem lucro suficiente (ask 2400.2 + 5.00 >= abertura): SL original mantido
+    assert hm.trail_hedge_stop(hedge(), config, logger) is False
+
+    # 10.00 de drawdown com 0.02 lote = 5.00 de preço acima do ask
+    fake.set_price(2390.0)
+    assert hm.trail_hedge_stop(hedge(), config, logger) is True
+    assert hedge().sl == 2395.2
+
+    fake.set_price(2389.8)  # Melhora menor que o passo (0.50)
+    assert hm.trail_hedge_stop(hedge(), config, logger) is False
+    fake.set_price(2391.0)  # O SL nunca afrouxa
+    assert hm.trail_hedge_stop(hedge(), config, logger) is False
+
+    fake.set_price(2395.1)  # ask 2395.3 >= SL: a corretora fecha com lucro
+    assert fake.positions_get(ticket=ticket) == ()
+    assert fake.account_info().balance > 10000.0
@@ -46,3 +46,41 @@ def test_trigger_opens_hedge(monkeypatch, logger):
     assert called["opened"] is True
     assert result["hedge_manager_active"] is True
     assert result["active_hedge_trade_id"] == 123456
+
+
+def test_trigger_price_solves_buy_profit_crossing():
+    # 0.03 lote BUY (contrato 100): -3.00 por 1.00 de queda; de -20 até -80 faltam 20.00
+    buy_metrics = {"profit_buy": -20.0, "open_buy": 2, "volume_buy": 0.03}
+    price, direction = hm.hedge_trigger_price(buy_metrics, 2400.0, 100.0, {"hedge_trigger_profit_buy": -80.0})
+    assert (round(price, 6), direction) == (2380.0, -1)
+
+    crossed = {"profit_buy": -90.0, "open_buy": 2, "volume_buy": 0.03}
+    assert hm.hedge_trigger_price(crossed, 2400.0, 100.0, {"hedge_trigger_profit_buy": -80.0}) == (2400.0, 0)
+
+
+def test_prearmed_stop_activates_hedge_on_fill(monkeypatch, logger):
+    import daytrade_bot.mt5_order as mt5_order
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    fake = FakeMT5(balance=10000.0)
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(hm, "mt5", fake)
+    monkeypatch.setattr(mt5_order, "mt5", fake)
+
+    config = {"magic_number": 1, "hedge_magic_number": 2, "hedge_trigger_profit_buy": -80.0,
+              "hedge_sell_volume": 0.02, "hedge_sell_sl_pts": 1400, "hedge_trigger_max_open_buys": 2}
+    fake.open_position(0, 0.03, price_open=2400.2, magic=1)
+    buys = [p for p in fake.positions_get() if p.magic == 1]
+    now = datetime.now(timezone.utc)
+
+    state, crossed = hm.arm_hedge_stop({"hedge_manager_active": False}, hm.calculate_buy_metrics(buys),
+                                       2400.0, now, config, logger, "XAUUSD")
+    (stop,) = fake.orders_get()
+    assert crossed is False
+    assert (stop.type, round(stop.price_open, 2), stop.sl, stop.magic) == (fake.ORDER_TYPE_SELL_STOP, 2373.53, 2387.53, 2)
+
+    fake.set_price(2370.0)
+    state = hm.activate_filled_hedge_stop(state, fake.positions_get(), logger)
+    assert state["hedge_manager_active"] is True
+    assert state["active_hedge_trade_id"] == stop.ticket
+    assert state["armed_hedge_order"] is None
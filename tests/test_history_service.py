@@ -0,0 +1,125 @@
+import threading
+import time
+
+from daytrade_bot import history_service
+from daytrade_bot.fake_mt5 import FakeMT5
+from daytrade_bot.history_service import HistoryService
+
+T0 = 1_700_000_000.0
+
+
+class CountingFake(FakeMT5):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.history_calls = 0
+        self.slow = 0.0
+
+    def history_deals_get(self, *args, **kwargs):
+        self.history_calls += 1
+        time.sleep(self.slow)
+        return super().history_deals_get(*args, **kwargs)
+
+
+def make(monkeypatch):
+    now = [T0]
+    fake = CountingFake(clock=lambda: now[0])
+    fake.set_price(2400.0)
+    monkeypatch.setattr(history_service, "mt5", fake)
+    service = HistoryService(max_age_seconds=5, prefetch_seconds=7200, clock=lambda: now[0])
+    return now, fake, service
+
+
+def trade(fake, now, seconds):
+    now[0] += seconds
+    ticket = fake.open_position(fake.ORDER_TYPE_BUY, 0.01, 2400.0, open_time=int(now[0]))
+    now[0] += 1
+    fake.order_send({"action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01,
+                     "type": fake.ORDER_TYPE_SELL, "position": ticket})
+
+
+def test_overlapping_windows_share_one_fetch(monkeypatch):
+    now, fake, service = make(monkeypatch)
+    trade(fake, now, -1800)
+    now[0] = T0
+
+    assert len(service.deals(T0 - 3600, T0)) == 1   # Busca inicial (com prefetch de 2h)
+    assert len(service.deals(T0 - 5400, T0)) == 1
+    assert len(service.deals(T0 - 600, T0)) == 0
+    assert fake.history_calls == 1
+
+    # Memorizado por janela e filtro até chegar deal novo
+    first = service.deals(T0 - 3600, T0, predicate=lambda d: d.entry == 1, key="out")
+    assert service.deals(T0 - 3600, T0, predicate=lambda d: d.entry == 1, key="out") is first
+
+
+def test_tail_refresh_fetches_only_new_deals(monkeypatch):
+    now, fake, service = make(monkeypatch)
+    service.deals(T0 - 3600, T0)
+    version = service.version
+
+    trade(fake, now, 1)
+    assert len(service.deals(T0 - 3600, now[0])) == 0  # Snapshot ainda novo (< 5s)
+    now[0] += 10
+    assert len(service.deals(T0 - 3600, now[0])) == 1  # O fechamento
+    assert service.version == version + 1 and fake.history_calls == 2
+
+    # Janela mais antiga que o snapshot: só o trecho que falta
+    service.deals(T0 - 10_800, now[0])
+    assert fake.history_calls == 3
+
+
+def test_concurrent_callers_see_one_request(monkeypatch):
+    _, fake, service = make(monkeypatch)
+    fake.slow = 0.05
+    threads = [threading.Thread(target=service.deals, args=(T0 - 3600, T0)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake.history_calls == 1
+
+
+def test_snapshot_is_capped_by_age_but_keeps_the_requested_window(monkeypatch):
+    now, fake, service = make(monkeypatch)
+    service.max_span_seconds = 3600
+    trade(fake, now, -1800)
+    now[0] = T0
+    assert len(service.deals(T0 - 3600, T0)) == 1
+
+    now[0] += 7200  # Atualização do final: o deal antigo passa do limite
+    assert service.deals(now[0] - 600, now[0]) == []
+    assert len(service._snapshots[history_service.DEALS].records) == 0
+    assert service._snapshots[history_service.DEALS].start == now[0] - 3600
+
+
+def test_merge_keeps_time_order():
+    snapshot = history_service._Snapshot("time")
+    record = lambda ticket, t: type("R", (), {"ticket": ticket, "time": t})()
+    snapshot.merge([record(2, 20), record(1, 10)])
+    snapshot.merge([record(3, 30), record(2, 20)])   # Final
+    snapshot.merge([record(0, 5)])                   # Início
+    snapshot.merge([record(4, 15)])                  # Meio
+    assert [r.ticket for r in snapshot.records] == [0, 1, 4, 2, 3]
+    assert snapshot.times.tolist() == [5, 10, 15, 20, 30]
+
+
+def test_history_callers_memoize_their_filters(monkeypatch):
+    import logging
+    from daytrade_bot import mt5_history
+
+    now, fake, _ = make(monkeypatch)
+    monkeypatch.setattr(mt5_history, "mt5", fake)
+    history_service.reset_service()
+    monkeypatch.setattr(history_service, "_service",
+                        HistoryService(max_age_seconds=5, prefetch_seconds=7200, clock=lambda: now[0]))
+    ticket = fake.open_position(fake.ORDER_TYPE_BUY, 0.01, 2390.0, open_time=int(now[0]))
+    fake.order_send({"action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01,
+                     "type": fake.ORDER_TYPE_SELL, "position": ticket})
+    config = {"history_service_enabled": True, "history_minutes_interval": 60}
+
+    first = mt5_history.get_profitable_closed_deals("XAUUSD", "BUY", config, logging.getLogger("test"))
+    (entry,) = history_service._service._memo.values()
+    second = mt5_history.get_profitable_closed_deals("XAUUSD", "BUY", config, logging.getLogger("test"))
+    assert len(first) == 1 and first == second
+    # A segunda chamada saiu da memória (a entrada não foi recalculada)
+    assert list(history_service._service._memo.values()) == [entry] and entry[1] is not second
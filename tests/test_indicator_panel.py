@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from daytrade_bot.fake_mt5 import FakeMT5
+from daytrade_bot.indicator_panel import add_panel_indicators, align_bars
+from daytrade_bot.pandas_aux import add_indicators
+
+CONFIG = {"indicators_ema_adx_active": True, "ema_period": 20, "adx_period": 14}
+
+
+def make_frames(count=5, bars=300):
+    fake = FakeMT5(clock=lambda: 1_700_000_000.0)
+    return {f"S{i}": pd.DataFrame(fake.make_rates(bars, seed=i, start_price=100.0 * (i + 1))) for i in range(count)}
+
+
+def test_panel_matches_add_indicators_per_symbol():
+    frames = make_frames()
+    frames["S4"] = frames["S4"].iloc[60:].reset_index(drop=True)  # Começa depois dos outros
+    expected = {symbol: df.copy() for symbol, df in frames.items()}
+    for df in expected.values():
+        add_indicators(df, CONFIG)
+
+    signals = add_panel_indicators(frames, CONFIG)
+
+    for symbol, df in frames.items():
+        for column in ("EMA_20", "ADX_14"):
+            np.testing.assert_allclose(df[column], expected[symbol][column], rtol=1e-9, equal_nan=True)
+        assert (df["trend_signal"] == expected[symbol]["trend_signal"]).all()
+        assert (df["trend_strength"] == expected[symbol]["trend_strength"]).all()
+        last = expected[symbol].iloc[-1]
+        assert signals[symbol]["trend_signal"] == last["trend_signal"]
+        assert np.isclose(signals[symbol]["ADX_14"], last["ADX_14"])
+
+
+def test_align_bars_fills_gaps_with_flat_bar():
+    a = {"time": [0, 60, 120], "open": [1, 2, 3], "high": [2, 3, 4], "low": [0, 1, 2], "close": [1.5, 2.5, 3.5]}
+    b = {"time": [60, 180], "open": [10, 12], "high": [11, 13], "low": [9, 11], "close": [10.5, 12.5]}
+    times, symbols, panel = align_bars({"A": pd.DataFrame(a), "B": pd.DataFrame(b)})
+
+    assert times.tolist() == [0, 60, 120, 180]
+    assert symbols == ["A", "B"]
+    assert np.isnan(panel["close"][0, 1])  # Antes da primeira barra de B
+    assert panel["high"][2, 1] == panel["low"][2, 1] == 10.5  # Barra parada no fechamento anterior
+    assert panel["close"][3, 0] == 3.5
+
+
+def test_disabled_indicators_leave_frames_untouched():
+    frames = make_frames(count=2, bars=50)
+    assert add_panel_indicators(frames, {"indicators_ema_adx_active": False}) is None
+    assert "EMA_20" not in frames["S0"]
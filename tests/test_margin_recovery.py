@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from daytrade_bot.margin_recovery import margin_needed, position_margins, select_recovery_set
+
+
+def test_winners_cover_the_need_without_realizing_losses():
+    margins = [100.0, 100.0, 300.0, 50.0]
+    profits = [-40.0, 5.0, 2.0, -1.0]
+    # A posição de maior margem no lucro cobre sozinha
+    assert select_recovery_set(margins, profits, 250.0).tolist() == [2]
+    assert sorted(select_recovery_set(margins, profits, 380.0).tolist()) == [1, 2]
+
+
+def test_single_cover_beats_greedy_when_cheaper():
+    # Guloso por razão pega as pequenas baratas e ainda precisa da cara; a média cobre sozinha
+    margins = [10.0, 10.0, 100.0, 95.0]
+    profits = [-0.5, -0.5, -100.0, -30.0]
+    assert select_recovery_set(margins, profits, 90.0).tolist() == [3]
+
+
+def test_no_need_or_impossible():
+    assert select_recovery_set([10.0], [-1.0], -5.0).size == 0
+    assert select_recovery_set([10.0, 20.0], [-1.0, -1.0], 31.0) is None
+
+
+def test_margins_are_scaled_to_account_margin():
+    positions = [SimpleNamespace(type=0, volume=0.02), SimpleNamespace(type=1, volume=0.01)]
+    margins = position_margins(positions, {0: 1000.0, 1: 1000.0}, account_margin=60.0)
+    assert np.allclose(margins, [40.0, 20.0])
+    assert margin_needed(1000.0, 300.0, 0.5) == 200.0
+
+
+def test_closing_a_hedged_leg_frees_nothing():
+    """Com hedge total (ratio 0), fechar o SELL aumentaria a margem: nunca é escolhido."""
+    positions = [SimpleNamespace(type=0, volume=0.01) for _ in range(3)] + [SimpleNamespace(type=1, volume=0.01)]
+    margins = position_margins(positions, {0: 1000.0, 1: 1000.0}, book=(0.03, 0.01), ratio=0.0)
+    assert np.allclose(margins, [10.0, 10.0, 10.0, 0.0])
+
+    profits = [-5.0, -6.0, -7.0, 50.0]
+    assert sorted(select_recovery_set(margins, profits, 15.0).tolist()) == [0, 1]
@@ -0,0 +1,115 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import daytrade_bot.market_feed as mf
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    # Leitor e escritor no mesmo processo: o bloco continua registrado no tracker
+    monkeypatch.setattr(mf, "_untrack", lambda shm: None)
+    name = f"dtb_test_{os.getpid()}"
+    writer = mf.MarketFeedWriter(name, "XAUUSD", max_positions=4)
+    reader = mf.MarketFeedReader(name, max_positions=4, max_age_seconds=60)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def make_position(ticket, profit):
+    return SimpleNamespace(
+        ticket=ticket, time=1, time_msc=1000, time_update=1, type=0, reason=3,
+        magic=777777, identifier=ticket, volume=0.01, price_open=2400.0, sl=0.0,
+        tp=2414.0, price_current=2401.0, swap=0.0, profit=profit,
+        symbol="XAUUSD", comment="14.0x60.0",
+    )
+
+
+def test_reader_sees_published_snapshot(feed):
+    """O leitor recebe tick, conta e posições publicados pelo feeder."""
+    writer, reader = feed
+    tick = SimpleNamespace(time=10, time_msc=10000, bid=2401.0, ask=2401.2, last=0.0, volume=0, flags=6)
+    account = SimpleNamespace(login=1, leverage=100, balance=1000.0, equity=1002.0, profit=2.0,
+                              margin=10.0, margin_free=992.0, margin_level=10020.0, currency="USD")
+
+    writer.publish(tick, account, [make_position(1, 1.0), make_position(2, 1.0)])
+    snap = reader.snapshot()
+
+    assert snap["seq"] % 2 == 0
+    assert int(snap["n_positions"]) == 2
+    assert mf._record_to_namespace(snap["tick"]).bid == 2401.0
+    assert mf._record_to_namespace(snap["positions"][1]).comment == "14.0x60.0"
+
+
+def test_reader_rejects_write_in_progress(feed):
+    """Com o contador ímpar (escrita em andamento) o leitor não aceita o bloco."""
+    writer, reader = feed
+    writer.publish(None, None, [])
+    writer.block["seq"] += 1
+
+    assert reader.snapshot() is None
+
+
+def test_positions_get_falls_back_to_terminal(monkeypatch):
+    """Sem feeder conectado, usa o terminal."""
+    monkeypatch.setattr(mf, "_reader", None)
+    monkeypatch.setattr(mf.mt5, "positions_get", lambda **kwargs: ("terminal",))
+
+    assert mf.positions_get("XAUUSD") == ("terminal",)
+
+
+def test_restarted_writer_restores_parity_and_layout(feed):
+    """Feeder que caiu no meio da escrita deixa 'seq' ímpar; o novo volta a paridade."""
+    writer, reader = feed
+    writer.block["seq"] += 1  # Queda no meio de publish()
+
+    restarted = mf.MarketFeedWriter(writer.shm.name, "XAUUSD", max_positions=4)
+    assert int(restarted.block["seq"]) % 2 == 0
+    restarted.publish(None, None, [make_position(1, 1.0)])
+    assert int(reader.snapshot()["n_positions"]) == 1
+    restarted.close(unlink=False)
+
+    bigger = mf.MarketFeedWriter(writer.shm.name, "XAUUSD", max_positions=64)
+    assert bigger.shm.size >= bigger.dtype.itemsize
+    bigger.publish(None, None, [make_position(i, 1.0) for i in range(64)])
+    bigger.close()
+
+
+def test_reader_with_other_layout_falls_back_to_terminal(feed, monkeypatch):
+    writer, _ = feed
+    config = {"market_feed_enabled": True, "market_feed_name": writer.shm.name, "symbol": "XAUUSD"}
+    logger = SimpleNamespace(info=lambda m: None, warning=lambda m: None, error=lambda m: None)
+
+    with pytest.raises(ValueError):
+        mf.MarketFeedReader(writer.shm.name, max_positions=512)
+    assert mf.connect_reader({**config, "market_feed_max_positions": 512}, logger) is False
+
+    # Leitor menor que o feeder (mesma página): livro maior que o bloco vai ao terminal
+    assert mf.connect_reader({**config, "market_feed_max_positions": 2}, logger) is True
+    try:
+        mf._reader.max_age_seconds = 60
+        monkeypatch.setattr(mf.mt5, "positions_get", lambda **kwargs: ("terminal",))
+        writer.publish(None, None, [make_position(i, 1.0) for i in range(3)])
+        assert mf.positions_get("XAUUSD") == ("terminal",)
+        writer.publish(None, None, [make_position(1, 1.0)])
+        assert [p.ticket for p in mf.positions_get("XAUUSD")] == [1]
+    finally:
+        mf.disconnect_reader()
+
+
+def test_feed_is_not_read_while_recording_mt5(feed, monkeypatch, tmp_path):
+    from daytrade_bot import mt5_gateway
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    writer, _ = feed
+    recorder = mt5_gateway.RecordingMT5(FakeMT5(), str(tmp_path / "dia.mt5log"))
+    monkeypatch.setattr(mf, "mt5", recorder)
+    config = {"market_feed_enabled": True, "market_feed_name": writer.shm.name, "symbol": "XAUUSD",
+              "market_feed_max_positions": 4}
+    logger = SimpleNamespace(info=lambda m: None, warning=lambda m: None)
+    try:
+        assert mf.connect_reader(config, logger) is False
+    finally:
+        recorder.close()
@@ -0,0 +1,71 @@
+import random
+
+from daytrade_bot import clock
+from daytrade_bot.fake_mt5 import FakeMT5
+from daytrade_bot.mt5_faults import DONE, FAILED, LOST_REPLY, REJECTED, FaultyMT5, latency_sampler
+
+
+def make(faults=None, disconnects=None):
+    sim = clock.SimulatedClock(start=1_700_000_000.0)
+    fake = FakeMT5(clock=sim.time)
+    fake.set_price(2400.0, spread=0.2)
+    faulty = FaultyMT5(fake, faults, disconnects, seed=1, clock=sim.time, delay=sim.advance)
+    return sim, fake, faulty
+
+
+def buy(mt5):
+    return mt5.order_send({
+        "action": mt5.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01,
+        "type": mt5.ORDER_TYPE_BUY, "magic": 1,
+    })
+
+
+def test_latency_distributions():
+    rng = random.Random(0)
+    assert latency_sampler(None, rng)() == 0.0
+    assert latency_sampler(2, rng)() == 2.0
+    uniform = latency_sampler({"dist": "uniform", "low": 1.0, "high": 2.0}, rng)
+    assert all(1.0 <= uniform() <= 2.0 for _ in range(100))
+    spike = latency_sampler({"dist": "spike", "base": 0.1, "spike": 5.0, "prob": 0.5}, rng)
+    assert {spike() for _ in range(100)} == {0.1, 5.0}
+
+
+def test_latency_advances_simulated_clock():
+    sim, _, faulty = make({"order_send": {"latency": 2.0}})
+    assert buy(faulty).retcode == faulty.TRADE_RETCODE_DONE
+    assert sim.time() == 1_700_000_002.0
+    faulty.positions_get()  # Sem latência configurada
+    assert sim.time() == 1_700_000_002.0
+
+
+def test_requote_and_lost_reply():
+    _, fake, faulty = make({"order_send": {"requote_rate": 1.0}})
+    assert buy(faulty).retcode == faulty.TRADE_RETCODE_REQUOTE
+    assert fake.positions_get() == ()
+
+    _, fake, faulty = make({"order_send": {"lost_reply_rate": 1.0}})
+    assert buy(faulty) is None
+    assert len(fake.positions_get()) == 1  # Executada no servidor mesmo assim
+    assert [e["outcome"] for e in faulty.order_events] == [LOST_REPLY]
+
+
+def test_disconnect_window_fails_calls_in_flight():
+    sim, fake, faulty = make({"order_send": {"latency": 5.0}}, [{"start": 3, "duration": 10}])
+    assert buy(faulty) is None  # Saiu antes da janela, chegou durante
+    assert faulty.last_error()[0] == faulty.RES_E_INTERNAL_FAIL_CONNECT
+    assert faulty.initialize() is False
+    assert fake.positions_get() == ()
+
+    sim.advance(10)
+    assert faulty.initialize() is True
+    assert buy(faulty).retcode == faulty.TRADE_RETCODE_DONE
+    assert [e["outcome"] for e in faulty.order_events] == [FAILED, DONE]
+
+
+def test_error_rate_returns_none_without_executing():
+    _, fake, faulty = make({"*": {"error_rate": 1.0}})
+    assert faulty.positions_get() is None
+    assert faulty.account_info() is None
+    assert buy(faulty) is None
+    assert fake.requests == []
+    assert REJECTED not in {e["outcome"] for e in faulty.order_events}
@@ -0,0 +1,68 @@
+import pytest
+
+from daytrade_bot import clock
+from daytrade_bot import mt5_gateway
+from daytrade_bot.fake_mt5 import FakeMT5
+
+
+def record_session(path):
+    now = [1_700_000_000.0]
+    fake = FakeMT5(clock=lambda: now[0])
+    fake.set_price(2400.0, spread=0.2)
+    fake.make_rates(50)
+    gateway = mt5_gateway.RecordingMT5(fake, str(path), flush_every=2, clock=lambda: now[0])
+
+    gateway.initialize(login=1, password="segredo", server="demo")
+    tick = gateway.symbol_info_tick("XAUUSD")
+    result = gateway.order_send({
+        "action": gateway.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01,
+        "type": gateway.ORDER_TYPE_BUY, "magic": 7, "comment": "teste",
+    })
+    now[0] += 60
+    positions = gateway.positions_get(symbol="XAUUSD")
+    rates = gateway.copy_rates_range("XAUUSD", gateway.TIMEFRAME_M10, 0, 2_000_000_000)
+    gateway.shutdown()
+    gateway.close()
+    return tick, result, positions, rates
+
+
+def test_replay_serves_recorded_responses(tmp_path):
+    path = tmp_path / "dia.mt5log"
+    tick, result, positions, rates = record_session(path)
+
+    replay = mt5_gateway.ReplayMT5(str(path))
+    assert replay.ORDER_TYPE_BUY == 0 and replay.TRADE_RETCODE_DONE == 10009
+    assert replay.initialize() is True
+    assert replay.symbol_info_tick("XAUUSD") == tick
+    replayed = replay.order_send({})
+    assert replayed.retcode == result.retcode and replayed.request.comment == "teste"
+    (position,) = replay.positions_get(symbol="XAUUSD")
+    assert position._asdict() == positions[0]._asdict()
+    assert (replay.copy_rates_range("XAUUSD", 10, 0, 0) == rates).all()
+    assert replay.clock.time() == 1_700_000_060.0
+
+    # O loop seguiria, mas a gravação só tem o encerramento
+    with pytest.raises(clock.ReplayFinished):
+        replay.account_info()
+    assert replay.shutdown() is None  # Depois do fim: terminal "desconectado"
+
+
+def test_credentials_are_not_recorded(tmp_path):
+    path = tmp_path / "dia.mt5log"
+    record_session(path)
+    _, calls = mt5_gateway.read_log(str(path))
+    assert calls[0][2] == "initialize"
+    assert calls[0][3] == () and calls[0][4] == {}
+    assert b"segredo" not in path.read_bytes()
+
+
+def test_strict_replay_detects_reordered_calls(tmp_path):
+    path = tmp_path / "dia.mt5log"
+    _, _, positions, _ = record_session(path)
+
+    with pytest.raises(mt5_gateway.ReplayMismatch):
+        mt5_gateway.ReplayMT5(str(path)).positions_get()
+
+    lenient = mt5_gateway.ReplayMT5(str(path), strict=False)
+    assert lenient.positions_get()[0].ticket == positions[0].ticket
+    assert lenient.remaining == 5
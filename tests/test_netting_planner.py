@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from daytrade_bot.netting_planner import CLOSE, CLOSE_BY, netted_volume, plan_close_by
+
+
+def pos(ticket, type, volume):
+    return SimpleNamespace(ticket=ticket, type=type, volume=volume)
+
+
+def describe(steps):
+    return [
+        (s[0], s[1].ticket, s[2].ticket, s[3]) if s[0] == CLOSE_BY else (s[0], s[1].ticket, s[2])
+        for s in steps
+    ]
+
+
+def test_identical_volumes_are_paired_first():
+    positions = [pos(1, 0, 0.03), pos(2, 0, 0.01), pos(3, 1, 0.01), pos(4, 1, 0.03)]
+    steps = plan_close_by(positions)
+
+    assert describe(steps) == [(CLOSE_BY, 1, 4, 0.03), (CLOSE_BY, 2, 3, 0.01)]
+
+
+def test_mismatched_volumes_use_partial_close_by_and_market_residual():
+    positions = [pos(1, 0, 0.05), pos(2, 1, 0.02), pos(3, 1, 0.01), pos(4, 0, 0.01)]
+    steps = plan_close_by(positions)
+
+    # 0.01 x 0.01 casa exato; 0.05 BUY é fechada em parte pela 0.02 SELL e o resto vai a mercado
+    assert describe(steps) == [(CLOSE_BY, 4, 3, 0.01), (CLOSE_BY, 1, 2, 0.02), (CLOSE, 1, 0.03)]
+    assert netted_volume(steps) == 0.03
+
+
+def test_one_sided_book_is_closed_at_market():
+    steps = plan_close_by([pos(1, 1, 0.02), pos(2, 1, 0.01)])
+    assert describe(steps) == [(CLOSE, 1, 0.02), (CLOSE, 2, 0.01)]
+
+
+def test_failed_close_by_falls_back_to_market_close(monkeypatch):
+    import logging
+
+    import daytrade_bot.mt5_order as mt5_order
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    fake = FakeMT5()
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(mt5_order, "mt5", fake)
+    send = fake.order_send
+
+    def order_send(request):
+        if request["action"] == fake.TRADE_ACTION_CLOSE_BY:
+            return fake._result(fake.TRADE_RETCODE_INVALID, request, comment="Close by disabled")
+        return send(request)
+
+    monkeypatch.setattr(fake, "order_send", order_send)
+    for order_type, volume in ((0, 0.03), (1, 0.01), (0, 0.02)):
+        fake.open_position(order_type, volume, 2400.0)
+    keep = fake.open_position(0, 0.01, 2400.0)  # Não escolhida: continua aberta
+
+    chosen = [p for p in fake.positions_get() if p.ticket != keep]
+    assert mt5_order.close_positions_netted(chosen, logging.getLogger("test"))
+    assert [p.ticket for p in fake.positions_get()] == [keep]
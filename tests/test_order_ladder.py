@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+
+import daytrade_bot.mt5_order as mt5_order
+import daytrade_bot.order_ladder as order_ladder
+from daytrade_bot.fake_mt5 import FakeMT5
+
+logger = logging.getLogger("test_order_ladder")
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeMT5(balance=10000.0)
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(mt5_order, "mt5", fake)
+    monkeypatch.setattr(order_ladder, "mt5", fake)
+    return fake
+
+
+def make_ladder(clock, down_interval=600):
+    return order_ladder.OrderLadder(
+        "XAUUSD", 0, 7, 0.01, target_up=5.0, target_down=9.5, stop_points=6000, profit_points=1400,
+        point=0.01, down_interval_seconds=down_interval, reprice_tolerance=0.1, clock=clock,
+    )
+
+
+def pending(fake):
+    return sorted((o.comment, o.type, o.price_open) for o in fake.orders_get(symbol="XAUUSD"))
+
+
+def test_levels_follow_the_book(fake):
+    fake.open_position(0, 0.01, price_open=2398.0, magic=7)
+    fake.open_position(0, 0.01, price_open=2402.0, magic=7)
+    ladder = make_ladder(lambda: 0.0)
+
+    assert ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger) is False
+    assert pending(fake) == [("ladder down", fake.ORDER_TYPE_BUY_LIMIT, 2388.5),
+                             ("ladder up", fake.ORDER_TYPE_BUY_STOP, 2407.0)]
+    (up,) = [o for o in fake.orders_get() if o.comment == "ladder up"]
+    assert (up.sl, up.tp) == (2347.0, 2421.0)
+
+    # Nova posição no topo: o BUY STOP é movido, não recriado
+    fake.open_position(0, 0.01, price_open=2404.0, magic=7)
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger)
+    assert pending(fake)[1] == ("ladder up", fake.ORDER_TYPE_BUY_STOP, 2409.0)
+    assert fake.orders_get(ticket=up.ticket)
+
+    # Entradas bloqueadas: a escada é cancelada
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), False, logger)
+    assert pending(fake) == []
+
+
+def test_down_level_waits_interval_after_fill(fake):
+    now = [0.0]
+    fake.open_position(0, 0.01, price_open=2400.0, magic=7)
+    ladder = make_ladder(lambda: now[0])
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger)
+
+    fake.set_price(2390.0)  # ask 2390.2 executa o BUY LIMIT (2390.5)
+    assert len(fake.positions_get()) == 2
+    now[0] = 60.0
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger)
+    assert [c for c, _, _ in pending(fake)] == ["ladder up"]
+
+    now[0] = 700.0
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger)
+    assert ("ladder down", fake.ORDER_TYPE_BUY_LIMIT, 2380.7) in pending(fake)
+
+
+def test_unreadable_orders_leave_entries_to_the_poll(fake, monkeypatch):
+    fake.open_position(0, 0.01, price_open=2400.0, magic=7)
+    monkeypatch.setattr(order_ladder, "get_pending_orders", lambda *args: None)
+    assert make_ladder(lambda: 0.0).sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger) is True
+
+
+def test_new_pendings_pass_margin_preflight_and_stop_cancels(fake, monkeypatch):
+    calls = []
+
+    def preflight(symbol, order_type, volume, config, log):
+        calls.append((order_type, volume))
+        return 0.01 if len(calls) == 1 else None  # Só a primeira cabe
+
+    monkeypatch.setattr(order_ladder, "preflight_volume", preflight)
+    fake.open_position(0, 0.02, price_open=2400.0, magic=7)
+    ladder = make_ladder(lambda: 0.0)
+    ladder.volume, ladder.config, ladder.logger = 0.02, {"margin_preflight_enabled": True}, logger
+
+    ladder.sync(fake.positions_get(), fake.symbol_info_tick("XAUUSD"), True, logger)
+    assert calls == [(0, 0.02), (0, 0.02)]
+    assert [o.volume_initial for o in fake.orders_get(symbol="XAUUSD")] == [0.01]
+
+    ladder.stop()
+    assert pending(fake) == []
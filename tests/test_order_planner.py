@@ -0,0 +1,170 @@
+import daytrade_bot.order_planner as op
+
+
+def margin_of(order_type, volume):
+    # 10.0 de margem por 0.01 lote
+    return round(volume * 1000, 8)
+
+
+def make_plan(n, volume=0.01):
+    return [{"order_type": 1, "volume": volume, "profit_points": 900, "stop_points": 1500} for _ in range(n)]
+
+
+def test_plan_fits_entirely():
+    accepted, rejected, used = op.fit_plan_to_margin(make_plan(3), 100.0, margin_of)
+    assert len(accepted) == 3
+    assert rejected == []
+    assert used == 30.0
+
+
+def test_plan_is_cut_before_sending():
+    """Só as ordens que cabem na margem livre são mantidas."""
+    accepted, rejected, used = op.fit_plan_to_margin(make_plan(5), 25.0, margin_of)
+    assert len(accepted) == 2
+    assert len(rejected) == 3
+    assert used == 20.0
+
+
+def test_last_order_is_trimmed_to_volume_step():
+    """A primeira ordem que não cabe tem o volume reduzido em múltiplos do passo."""
+    plan = make_plan(2, volume=0.05)
+    accepted, rejected, used = op.fit_plan_to_margin(plan, 83.0, margin_of)
+
+    assert [o["volume"] for o in accepted] == [0.05, 0.03]
+    assert accepted[1]["trimmed_from"] == 0.05
+    assert rejected == []
+
+
+def test_calc_margin_is_cached_per_price_bucket(monkeypatch):
+    calls = []
+
+    def fake_order_calc_margin(order_type, symbol, volume, price):
+        calls.append(price)
+        return volume * price
+
+    monkeypatch.setattr(op.mt5, "order_calc_margin", fake_order_calc_margin, raising=False)
+    op.clear_margin_cache()
+
+    op.calc_margin("XAUUSD", 1, 0.01, 2400.2, bucket_size=1.0)
+    op.calc_margin("XAUUSD", 1, 0.01, 2399.8, bucket_size=1.0)
+    op.calc_margin("XAUUSD", 1, 0.01, 2401.4, bucket_size=1.0)
+
+    assert calls == [2400.0, 2401.0]
+
+
+def test_identical_orders_are_coalesced_within_volume_max():
+    plan = make_plan(5) + [{"order_type": 1, "volume": 0.01, "profit_points": 1200, "stop_points": 1500}]
+    coalesced = op.coalesce_plan(plan, volume_max=0.03, volume_step=0.01)
+
+    assert [(o["volume"], o["lots"], o["profit_points"]) for o in coalesced] == [
+        (0.03, 3, 900), (0.02, 2, 900), (0.01, 1, 1200),
+    ]
+    assert all(o["lot_volume"] == 0.01 for o in coalesced)
+
+
+def test_coalesced_order_is_trimmed_in_whole_sub_lots():
+    plan = op.coalesce_plan(make_plan(5, volume=0.02))
+    accepted, rejected, _ = op.fit_plan_to_margin(plan, 65.0, margin_of)
+
+    assert (accepted[0]["volume"], accepted[0]["lots"], accepted[0]["trimmed_from"]) == (0.06, 3, 0.1)
+    assert rejected == []
+
+
+def test_sub_lots_round_trip_through_comment():
+    order = op.coalesce_plan(make_plan(4))[0]
+    comment = "9.0x15.0" + op.sub_lot_comment(order)
+
+    assert comment == "9.0x15.0 #4x0.01"
+    # Depois de um fechamento parcial o comentário não muda, só o volume
+    assert op.parse_sub_lots(comment, 0.03) == (3, 0.01)
+    assert op.parse_sub_lots("9.0x15.0", 0.05) == (1, 0.05)
+
+
+def test_hedge_against_open_book_is_not_blocked(monkeypatch):
+    """O SELL que cruza BUYs abertos só paga o acréscimo da margem hedgeada."""
+    import logging
+    from types import SimpleNamespace
+
+    from daytrade_bot import market_feed
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    fake = FakeMT5()
+    fake.set_price(2400.0, spread=0.2)
+    for _ in range(3):
+        fake.order_send({"action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": 0.01,
+                         "type": fake.ORDER_TYPE_BUY, "magic": 1})
+    info = fake.symbol_info("XAUUSD")._asdict()
+    monkeypatch.setattr(fake, "symbol_info", lambda symbol: SimpleNamespace(**info, margin_hedged=0.0))
+    monkeypatch.setattr(op, "mt5", fake)
+    monkeypatch.setattr(market_feed, "mt5", fake)
+    monkeypatch.setattr(market_feed, "account_info",
+                        lambda symbol: fake.account_info()._replace(margin_free=1.0))
+    op.clear_margin_cache()
+    config = {"margin_preflight_enabled": True}
+    logger = logging.getLogger("test")
+
+    # Hedge total (margin_hedged = 0): a exigência cai, então passa
+    assert op.preflight_volume("XAUUSD", fake.ORDER_TYPE_SELL, 0.03, config, logger) == 0.03
+    # Até 2x o livro a exigência não sobe; além disso o excedente não cabe
+    assert op.preflight_volume("XAUUSD", fake.ORDER_TYPE_SELL, 0.08, config, logger) == 0.06
+    assert op.preflight_volume("XAUUSD", fake.ORDER_TYPE_BUY, 0.01, config, logger) is None
+
+
+def test_unknown_margin_leaves_plan_unchecked():
+    assert op.fit_plan_to_margin(make_plan(3), 100.0, lambda order_type, volume: None) is None
+
+
+def test_order_that_frees_margin_is_accepted_with_negative_free_margin():
+    """Hedge que reduz a margem passa mesmo com a margem disponível já negativa."""
+    plan = [{"order_type": 0, "volume": 0.01}, {"order_type": 1, "volume": 0.01}]
+
+    def hedged_margin_of(order_type, volume):
+        return -5.0 if order_type == 0 else margin_of(order_type, volume)
+
+    accepted, rejected, used = op.fit_plan_to_margin(plan, -3.0, hedged_margin_of)
+
+    assert accepted == plan[:1]
+    assert rejected == plan[1:]
+    assert used == -5.0
+
+
+def test_preflight_sends_plan_when_terminal_cannot_compute_margin(monkeypatch):
+    import logging
+
+    from daytrade_bot import market_feed
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    fake = FakeMT5()
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(fake, "order_calc_margin", lambda *args: None)
+    monkeypatch.setattr(op, "mt5", fake)
+    monkeypatch.setattr(market_feed, "mt5", fake)
+    op.clear_margin_cache()
+    plan = make_plan(3)
+
+    assert op.preflight_plan("XAUUSD", plan, {"margin_preflight_enabled": True}, logging.getLogger("test")) == plan
+
+
+def test_close_sub_lots_after_partial_close(monkeypatch):
+    import logging
+
+    from daytrade_bot import mt5_order
+    from daytrade_bot.fake_mt5 import FakeMT5
+
+    fake = FakeMT5()
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(mt5_order, "mt5", fake)
+    logger = logging.getLogger("test")
+    ticket = fake.open_position(fake.ORDER_TYPE_BUY, 0.04, 2400.0, comment="9.0x15.0 #4x0.01")
+
+    def position():
+        return fake.positions_get(ticket=ticket)[0]
+
+    assert mt5_order.close_sub_lots(position(), 1, logger)
+    assert op.parse_sub_lots(position().comment, position().volume) == (3, 0.01)
+
+    # Pedido maior que o restante fecha só o que resta
+    assert mt5_order.close_sub_lots(position(), 2, logger)
+    assert op.parse_sub_lots(position().comment, position().volume) == (1, 0.01)
+    assert mt5_order.close_sub_lots(position(), 5, logger)
+    assert fake.positions_get(ticket=ticket) == ()
@@ -0,0 +1,89 @@
+import pytest
+
+from daytrade_bot import pnl_ledger
+from daytrade_bot.fake_mt5 import FakeMT5
+from daytrade_bot.pnl_ledger import PnlLedger, comment_tag
+
+T0 = 1_700_000_000.0  # 2023-11-14 22:13 UTC
+
+
+def make(monkeypatch):
+    now = [T0]
+    fake = FakeMT5(clock=lambda: now[0])
+    fake.set_price(2400.0, spread=0.2)
+    monkeypatch.setattr(pnl_ledger, "mt5", fake)
+    return now, fake, PnlLedger(":memory:")
+
+
+def send(fake, order_type, magic, comment, position=0, volume=0.01):
+    request = {
+        "action": fake.TRADE_ACTION_DEAL, "symbol": "XAUUSD", "volume": volume,
+        "type": order_type, "magic": magic, "comment": comment,
+    }
+    if position:
+        request["position"] = position
+    result = fake.order_send(request)
+    assert result.retcode == fake.TRADE_RETCODE_DONE
+    return result
+
+
+def test_comment_tag():
+    assert comment_tag("9.0x15.0") == "9.0x15.0"
+    assert comment_tag("9.0x15.0 #3x0.01") == "9.0x15.0"
+    assert comment_tag("Hedge #2x0.05") == "Hedge"
+    assert comment_tag(None) == ""
+
+
+def test_rollups_by_magic_side_and_tag(monkeypatch):
+    now, fake, ledger = make(monkeypatch)
+    send(fake, fake.ORDER_TYPE_BUY, 11, "9.0x15.0")
+    send(fake, fake.ORDER_TYPE_BUY, 11, "9.0x15.0 #2x0.01", volume=0.02)
+    send(fake, fake.ORDER_TYPE_SELL, 22, "Hedge")
+    buy_a, buy_b, hedge = fake.positions_get()
+
+    now[0] += 7200  # Vira o dia (UTC)
+    fake.set_price(2405.0, spread=0.2)
+    send(fake, fake.ORDER_TYPE_SELL, 11, "Close", position=buy_a.ticket)
+    send(fake, fake.ORDER_TYPE_SELL, 11, "Close", position=buy_b.ticket, volume=0.01)  # Parcial
+    send(fake, fake.ORDER_TYPE_BUY, 22, "Close", position=hedge.ticket)
+
+    assert ledger.sync(now[0]) == 6
+    assert ledger.sync(now[0]) == 0  # Sobreposição não duplica
+
+    rows = {(r["magic"], r["side"], r["tag"]): r for r in ledger.rollup(by=["magic", "side", "tag"])}
+    assert set(rows) == {(11, "BUY", "9.0x15.0"), (22, "SELL", "Hedge")}
+    buys = rows[(11, "BUY", "9.0x15.0")]
+    assert (buys["deals"], buys["closes"], buys["wins"]) == (4, 2, 2)
+    assert buys["volume"] == pytest.approx(0.02)
+    assert buys["net"] == pytest.approx(sum(d.profit + d.commission for d in fake.deals if d.magic == 11))
+    assert rows[(22, "SELL", "Hedge")]["net"] < 0
+
+    days = ledger.rollup(by=["day"])
+    assert [d["day"] for d in days] == ["2023-11-14", "2023-11-15"]
+    assert ledger.rollup(by=[], side="SELL", start_day="2023-11-15")[0]["closes"] == 1
+
+
+def test_incremental_sync_only_adds_new_deals(monkeypatch):
+    now, fake, ledger = make(monkeypatch)
+    send(fake, fake.ORDER_TYPE_BUY, 11, "9.0x15.0")
+    assert ledger.sync(now[0]) == 1
+
+    now[0] += 60
+    position = fake.positions_get()[0]
+    send(fake, fake.ORDER_TYPE_SELL, 11, "Close", position=position.ticket)
+    assert ledger.sync(now[0]) == 1
+
+    (row,) = ledger.rollup()
+    assert (row["side"], row["tag"], row["deals"], row["closes"]) == ("BUY", "9.0x15.0", 2, 1)
+    with pytest.raises(ValueError):
+        ledger.rollup(by=["ticket"])
+
+
+def test_sync_window_follows_server_time(monkeypatch):
+    """Deals com hora do servidor à frente do UTC local não ficam de fora."""
+    now, fake, _ = make(monkeypatch)
+    ledger = PnlLedger(":memory:", symbol="XAUUSD")
+    now[0] += 3 * 3600  # Servidor em UTC+3
+    send(fake, fake.ORDER_TYPE_BUY, 11, "9.0x15.0")
+
+    assert ledger.sync(now[0] - 3 * 3600) == 1
@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+from daytrade_bot.position_events import (
+    CLOSED, OPENED, SLTP_MODIFIED, VOLUME_CHANGED, PositionTracker,
+)
+from daytrade_bot.position_timer import PositionExpiryIndex
+
+
+def pos(ticket, profit=0.0, volume=0.01, sl=0.0, tp=0.0, magic=1, type=0, time=0):
+    return SimpleNamespace(ticket=ticket, profit=profit, volume=volume, sl=sl, tp=tp,
+                           magic=magic, type=type, time=time, price_open=2400.0, symbol="XAUUSD")
+
+
+def kinds(events):
+    return sorted((e.kind, e.ticket) for e in events)
+
+
+def test_diff_emits_lifecycle_events():
+    tracker = PositionTracker()
+    assert kinds(tracker.update([pos(1), pos(2)])) == [(OPENED, 1), (OPENED, 2)]
+
+    # Só o lucro mudou: nenhum evento
+    assert tracker.update([pos(1, profit=3.0), pos(2, profit=-1.0)]) == []
+
+    events = tracker.update([pos(1, volume=0.02, profit=3.0), pos(2, sl=2390.0), pos(3)])
+    assert kinds(events) == [(OPENED, 3), (SLTP_MODIFIED, 2), (VOLUME_CHANGED, 1)]
+
+    events = tracker.update([pos(3)])
+    assert kinds(events) == [(CLOSED, 1), (CLOSED, 2)]
+    assert len(tracker) == 1
+
+
+def test_aggregates_are_kept_incrementally():
+    tracker = PositionTracker()
+    tracker.update([pos(1, profit=5.0), pos(2, profit=-2.0, type=1), pos(3, profit=1.0, magic=2)])
+    tracker.update([pos(1, profit=7.0, volume=0.03), pos(2, profit=-4.0, type=1)])
+
+    assert tracker.aggregate(1, 0) == {"count": 1, "volume": 0.03, "profit": 7.0}
+    assert tracker.aggregate(magic=1) == {"count": 2, "volume": 0.04, "profit": 3.0}
+    assert tracker.aggregate(magic=2)["count"] == 0
+
+
+def test_failed_read_keeps_previous_snapshot():
+    tracker = PositionTracker()
+    tracker.update([pos(1)])
+    assert tracker.update(None) == []
+    assert 1 in tracker
+
+
+def test_subscribers_receive_only_matching_events():
+    tracker = PositionTracker()
+    received = []
+    tracker.subscribe(received.append, kinds=[CLOSED], predicate=lambda p: p.magic == 1)
+
+    tracker.update([pos(1), pos(2, magic=9)])
+    tracker.update([])
+    assert [(e.kind, e.ticket) for e in received] == [(CLOSED, 1)]
+
+
+def test_expiry_index_follows_events():
+    tracker = PositionTracker()
+    index = PositionExpiryIndex(max_duration_minutes=10)
+    tracker.subscribe(index.on_position_event)
+
+    tracker.update([pos(1, time=0), pos(2, time=300)])
+    tracker.update([pos(2, time=300)])
+
+    assert len(index) == 1
+    assert [p.ticket for p in index.pop_expired(10_000)] == [2]
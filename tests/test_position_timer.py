@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import daytrade_bot.position_timer as pt
+
+
+class MockLogger:
+    def info(self, msg): pass
+    def warning(self, msg): pass
+    def error(self, msg): pass
+
+
+def make_position(ticket, open_ts):
+    return SimpleNamespace(ticket=ticket, time=open_ts, symbol="XAUUSD", profit=0.0)
+
+
+def test_index_returns_only_expired_positions():
+    index = pt.PositionExpiryIndex(max_duration_minutes=10)
+    index.sync([make_position(1, 0), make_position(2, 300), make_position(3, 900)])
+
+    assert index.next_expiry() == 600
+    assert [p.ticket for p in index.pop_expired(1000)] == [1, 2]
+    assert index.next_expiry() == 1500
+
+
+def test_index_drops_closed_tickets():
+    index = pt.PositionExpiryIndex(max_duration_minutes=10)
+    index.sync([make_position(1, 0), make_position(2, 300)])
+    index.sync([make_position(2, 300)])
+
+    assert index.next_expiry() == 900
+    assert index.pop_expired(10_000)[0].ticket == 2
+
+
+def test_check_fetches_tick_once_and_closes_expired(monkeypatch):
+    calls = {"ticks": 0, "closed": []}
+
+    def fake_tick(symbol):
+        calls["ticks"] += 1
+        return SimpleNamespace(time=1000)
+
+    def fake_close(position, logger):
+        calls["closed"].append(position.ticket)
+        return True
+
+    monkeypatch.setattr(pt.mt5, "symbol_info_tick", fake_tick)
+    monkeypatch.setattr(pt, "close_position", fake_close)
+
+    config = {"close_positions_by_time_enabled": True, "max_position_duration_minutes": 10}
+    positions = [make_position(t, t * 100) for t in range(1, 8)]
+
+    closed = pt.check_and_close_positions_by_time(positions, config, MockLogger())
+
+    assert calls["ticks"] == 1
+    assert calls["closed"] == [1, 2, 3]
+    assert closed == 3
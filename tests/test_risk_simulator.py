@@ -0,0 +1,65 @@
+import logging
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+import daytrade_bot.risk_simulator as rs
+
+CONFIG = {
+    "magic_number": 1, "timeframe": 10, "floating_dd_stop_threshold": -150.0,
+    "hedge_trigger_profit_buy": -80.0, "margin_free_perc": 0.5, "risk_sim_stop_out_level": 50.0,
+}
+
+
+def pos(type, volume, profit, magic=1):
+    return SimpleNamespace(type=type, volume=volume, profit=profit, magic=magic)
+
+
+def test_thresholds_become_price_barriers():
+    # 0.10 lote BUY líquido do robô: 10 de P/L por 1.00 de preço (contrato 100)
+    positions = [pos(0, 0.15, -30.0), pos(1, 0.05, 10.0), pos(0, 0.10, 0.0, magic=9)]
+    account = SimpleNamespace(equity=1000.0, margin=400.0)
+    barriers = rs.build_barriers(positions, account, 2400.0, 100.0, CONFIG)
+
+    assert barriers["dd_stop"] == (2400.0 - 130.0 / 10.0, -1)
+    assert barriers["hedge_trigger"] == (2400.0 - 50.0 / 15.0, -1)
+    # Conta (slope 20/ponto): equity < 800 e equity <= 200
+    assert barriers["margin_free"] == (2390.0, -1)
+    assert barriers["stop_out"] == (2360.0, -1)
+
+
+def test_barrier_already_hit_or_unreachable():
+    assert rs.barrier_price(-200.0, 10.0, -150.0, 2400.0) == (2400.0, 0)
+    assert rs.barrier_price(0.0, 0.0, -150.0, 2400.0) == (None, None)
+    # Livro vendido: o limite é atingido com alta
+    assert rs.barrier_price(0.0, -10.0, -150.0, 2400.0) == (2415.0, 1)
+
+
+def test_hit_probability_matches_reflection_principle():
+    sigma, n_steps = 0.001, 400
+    barrier = 2400.0 * math.exp(-2 * sigma * math.sqrt(n_steps))
+    hits = rs.simulate_hits(2400.0, sigma, {"x": (barrier, -1)}, n_steps, n_paths=40_000,
+                            batch_size=10_000, seed=7)
+
+    # P(mínimo <= -2 desvios) = 2 * Phi(-2) ~ 0.0455 (a simulação discreta fica um pouco abaixo)
+    expected = 2 * 0.5 * math.erfc(2 / math.sqrt(2))
+    assert expected * 0.8 < hits["x"]["prob"] < expected * 1.05
+    assert 0 < hits["x"]["mean_steps"] <= n_steps
+
+
+def test_simulator_publishes_fixed_columns():
+    simulator = rs.RiskSimulator(CONFIG, logging.getLogger("test"), n_paths=5_000, batch_size=2_500, seed=1)
+    assert set(rs.risk_metrics(simulator.latest())) == {
+        f"risk_{name}_{field}" for name in rs.BARRIERS for field in ("prob", "minutes")
+    }
+
+    simulator.contract_size = 100.0
+    closes = 2400.0 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.002, 300)))
+    simulator.update([pos(0, 0.10, -50.0)], SimpleNamespace(equity=1000.0, margin=200.0), 2400.0, closes)
+    result = simulator.run_once()
+
+    metrics = rs.risk_metrics(result)
+    assert simulator.latest() is result
+    assert 0.0 <= metrics["risk_dd_stop_prob"] <= 1.0
+    assert metrics["risk_hedge_trigger_prob"] >= metrics["risk_dd_stop_prob"]
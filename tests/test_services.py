@@ -0,0 +1,73 @@
+import logging
+import threading
+from types import SimpleNamespace
+
+import daytrade_bot.bot_config as bc
+import daytrade_bot.main_manager_fm_buy_sell as mm
+
+logger = logging.getLogger("test_services")
+
+BASE = {
+    "symbol": "XAUUSD", "magic_number": 777, "point": 0.01, "volume": 0.01,
+    "profit_points": 1400, "stop_points": 6000, "timeframe": 10,
+}
+
+
+def simulator_threads():
+    return [t for t in threading.enumerate() if t.name == "risk-simulator"]
+
+
+def test_refresh_only_builds_stale_services():
+    config = bc.BotConfig({**BASE, "risk_sim_enabled": True, "cycle_budget_enabled": True})
+    services = mm.build_services(config, logger)
+    simulator = services['risk_simulator']
+    try:
+        new_config = bc.with_overrides(config, cycle_budget_seconds=5)
+        refreshed = mm.refresh_services(services, config, new_config, logger)
+
+        # O simulador não foi afetado: mesmo objeto, nenhuma thread extra
+        assert refreshed['risk_simulator'] is simulator
+        assert len(simulator_threads()) == 1
+        assert refreshed['cycle_budget'] is not services['cycle_budget']
+        assert refreshed['cycle_budget'].budget_seconds == 5
+        assert refreshed['position_tracker'] is services['position_tracker']
+    finally:
+        simulator.stop()
+
+
+def test_tracker_rebuild_resubscribes_every_subscriber():
+    config = bc.BotConfig({
+        **BASE, "close_positions_by_time_enabled": True, "max_position_duration_minutes": 30,
+        "hedge_manager_enabled": True, "hedge_trigger_prearm": True,
+    })
+    services = mm.build_services(config, logger)
+    refreshed = mm.refresh_services(services, config, bc.with_overrides(config, hedge_magic_number=900), logger)
+
+    tracker = refreshed['position_tracker']
+    assert tracker is not services['position_tracker']
+    assert refreshed['expiry_index'] is not services['expiry_index']
+
+    # Os assinantes recriados ouvem o tracker novo
+    tracker.update([SimpleNamespace(ticket=1, magic=777, type=0, volume=0.01, profit=0.0, sl=0.0, tp=0.0,
+                                    time=0, price_open=2400.0, symbol="XAUUSD")])
+    assert len(refreshed['expiry_index']) == 1
+    assert refreshed['hedge_stop_watcher'].pop_due()
+
+
+def test_buy_book_changes_make_the_hedge_check_due():
+    config = bc.BotConfig({**BASE, "hedge_manager_enabled": True, "hedge_trigger_prearm": True})
+    services = mm.build_services(config, logger)
+    tracker, watcher = services['position_tracker'], services['hedge_stop_watcher']
+
+    def buy(volume, magic=777):
+        return SimpleNamespace(ticket=1, magic=magic, type=0, volume=volume, profit=0.0, sl=0.0, tp=0.0,
+                               time=0, price_open=2400.0, symbol="XAUUSD")
+
+    tracker.update([buy(0.02)])
+    assert watcher.pop_due() and not watcher.pop_due()
+    tracker.update([buy(0.01)])  # Fechamento parcial move o nível do trigger
+    assert watcher.pop_due()
+    tracker.update([])
+    assert watcher.pop_due()
+    tracker.update([buy(0.01, magic=5)])  # Outro robô: nada muda
+    assert not watcher.pop_due()
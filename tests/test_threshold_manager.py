@@ -0,0 +1,89 @@
+import logging
+from types import SimpleNamespace
+
+from daytrade_bot import mt5_order
+from daytrade_bot.threshold_config import ThresholdConfig
+from daytrade_bot.threshold_manager import ThresholdManager, enforce_order_thresholds
+
+
+class FakeClock:
+    def __init__(self):
+        self.mono = 1000.0
+        self.wall = 1_700_000_000.0
+
+    def monotonic(self):
+        return self.mono
+
+    def time(self):
+        return self.wall
+
+    def advance(self, seconds):
+        self.mono += seconds
+        self.wall += seconds
+
+
+def make_manager(clock, state_file=None):
+    thresholds = [
+        ThresholdConfig(8, 'buy', 1, 120),
+        ThresholdConfig(13, 'buy', 1, 120),
+        ThresholdConfig(10, 'sell', 1, 90),
+        ThresholdConfig(20, 'both', 2, 30),
+    ]
+    return ThresholdManager(thresholds, state_file=state_file, monotonic=clock.monotonic, wall_time=clock.time)
+
+
+def test_only_reached_thresholds_trigger():
+    clock = FakeClock()
+    manager = make_manager(clock)
+
+    assert manager.check_thresholds('buy', 7) == []
+
+    actions = manager.check_thresholds('buy', 13)
+    assert [a['threshold_triggered'] for a in actions] == [8, 13]
+    assert manager.is_blocked('buy')
+    assert not manager.is_blocked('sell')
+
+
+def test_cooldown_expires_on_monotonic_clock():
+    clock = FakeClock()
+    manager = make_manager(clock)
+    manager.check_thresholds('sell', 10)
+
+    clock.advance(89 * 60)
+    assert manager.check_thresholds('sell', 10) == []
+    assert manager.seconds_until_next_expiry() == 60
+
+    clock.advance(60)
+    assert not manager.is_blocked('sell')
+    assert len(manager.check_thresholds('sell', 10)) == 1
+
+
+def test_cooldowns_survive_restart(tmp_path):
+    """Cooldown salvo continua valendo após restart, descontando o tempo parado."""
+    clock = FakeClock()
+    state_file = str(tmp_path / "thresholds.json")
+    manager = make_manager(clock, state_file)
+    manager.check_thresholds('buy', 8)
+
+    clock.advance(100 * 60)
+    clock.mono = 5.0  # Novo processo: relógio monotônico recomeça
+    restored = make_manager(clock, state_file)
+    restored.load_state()
+
+    assert restored.is_blocked('buy')
+    assert restored.seconds_until_next_expiry() == 20 * 60
+
+
+def test_triggered_thresholds_close_distinct_worst_positions(monkeypatch):
+    """Dois limites no mesmo ciclo fecham as 2 piores, não a pior duas vezes."""
+    closed = []
+    monkeypatch.setattr(mt5_order, "close_position", lambda position, logger: closed.append(position.ticket))
+    positions = [SimpleNamespace(ticket=t, profit=float(t)) for t in range(13)]
+
+    blocked = enforce_order_thresholds(
+        make_manager(FakeClock()), 'buy', positions, {'order_thresholds_close_worst': True},
+        logging.getLogger("test"),
+    )
+
+    assert blocked
+    assert closed == [0, 1]
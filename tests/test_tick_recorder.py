@@ -0,0 +1,61 @@
+from datetime import date
+
+import numpy as np
+
+from daytrade_bot.tick_recorder import (
+    TICK_DTYPE,
+    MS_PER_DAY,
+    TickRecorder,
+    open_tick_file,
+    slice_ticks,
+)
+
+DAY_MSC = 20000 * MS_PER_DAY  # 2024-10-04 00:00 UTC
+
+
+def make_ticks(times):
+    ticks = np.zeros(len(times), dtype=TICK_DTYPE)
+    ticks["time_msc"] = times
+    ticks["bid"] = 2400.0 + np.arange(len(times)) * 0.01
+    ticks["ask"] = ticks["bid"] + 0.2
+    return ticks
+
+
+def test_append_grows_and_slices(tmp_path):
+    """Deve crescer além da capacidade inicial e fatiar por tempo."""
+    recorder = TickRecorder("XAUUSD", folder=str(tmp_path), initial_capacity=4)
+    times = DAY_MSC + np.arange(10) * 100
+
+    assert recorder.append(make_ticks(times)) == 10
+
+    window = recorder.slice(DAY_MSC + 200, DAY_MSC + 500)
+    assert list(window["time_msc"]) == [DAY_MSC + 200, DAY_MSC + 300, DAY_MSC + 400]
+    recorder.close()
+
+
+def test_append_skips_already_recorded(tmp_path):
+    """Ticks repetidos (mesmo lote reenviado pelo terminal) não são gravados de novo."""
+    recorder = TickRecorder("XAUUSD", folder=str(tmp_path), initial_capacity=8)
+    recorder.append(make_ticks([DAY_MSC, DAY_MSC + 5, DAY_MSC + 5]))
+
+    written = recorder.append(make_ticks([DAY_MSC + 5, DAY_MSC + 5, DAY_MSC + 5, DAY_MSC + 9]))
+
+    assert written == 2
+    assert list(recorder.slice()["time_msc"]) == [DAY_MSC, DAY_MSC + 5, DAY_MSC + 5, DAY_MSC + 5, DAY_MSC + 9]
+    recorder.close()
+
+
+def test_split_by_day_and_read_from_other_process(tmp_path):
+    """Um arquivo por dia; leitores abrem em modo somente leitura sem cópia."""
+    recorder = TickRecorder("XAUUSD", folder=str(tmp_path))
+    recorder.append(make_ticks([DAY_MSC + MS_PER_DAY - 1, DAY_MSC + MS_PER_DAY, DAY_MSC + MS_PER_DAY + 1]))
+    recorder.close()
+
+    first = open_tick_file(str(tmp_path), "XAUUSD", date(2024, 10, 4))
+    second = open_tick_file(str(tmp_path), "XAUUSD", date(2024, 10, 5))
+
+    assert len(first) == 1
+    assert len(second) == 2
+    window = slice_ticks(second, DAY_MSC + MS_PER_DAY + 1)
+    assert isinstance(window, np.memmap)
+    assert window["time_msc"][0] == DAY_MSC + MS_PER_DAY + 1